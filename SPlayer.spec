@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('icon.ico', '.')],
-    hiddenimports=['PyQt5.QtCore', 'PyQt5.QtGui', 'PyQt5.QtWidgets', 'PyQt5.QtMultimedia', 'pygame', 'pygame.mixer', 'mutagen', 'mutagen.mp3', 'mutagen.flac', 'mutagen.wave', 'mutagen.id3', 'mutagen.easyid3', 'mutagen._util', 'mutagen._file'],
+    hiddenimports=['PyQt5.QtCore', 'PyQt5.QtGui', 'PyQt5.QtWidgets', 'PyQt5.QtMultimedia', 'PyQt5.QtNetwork', 'pygame', 'pygame.mixer', 'mutagen', 'mutagen.mp3', 'mutagen.flac', 'mutagen.wave', 'mutagen.id3', 'mutagen.easyid3', 'mutagen._util', 'mutagen._file', 'numpy'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,163 @@
+# generate_library.py - ساخت کتابخانه موسیقی مصنوعی برای بنچمارک‌ها
+#
+# استفاده:
+#   python benchmarks/generate_library.py <folder> --tracks 10000 --depth 3
+#
+# فایل‌ها کوتاه و کم‌حجم هستند ولی برای mutagen و pygame معتبرند:
+# WAV با ماژول wave، و MP3/FLAC/OGG با تگ و کاور داخلی.
+import os
+import sys
+import wave
+import zlib
+import struct
+import base64
+import random
+import argparse
+
+FORMATS = ("wav", "mp3", "flac", "ogg")
+
+# فریم MPEG-1 Layer III با بیت‌ریت 128kbps و 44.1kHz (بدون padding) ۴۱۷ بایت است
+MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+
+def make_png(size=64, color=(102, 126, 234)):
+    """یک تصویر PNG ساده بدون وابستگی به Qt"""
+    row = b"\x00" + bytes(color) * size
+    raw = row * size
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) +
+            chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+def write_wav(path, seconds=0.05, rate=44100):
+    with wave.open(path, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\x00\x00\x00\x00" * int(rate * seconds))
+
+
+def write_mp3(path, tags, art, frames=20):
+    from mutagen.id3 import ID3, TIT2, TPE1, TALB, APIC
+    with open(path, "wb") as f:
+        f.write(MP3_FRAME * frames)
+    id3 = ID3()
+    id3.add(TIT2(encoding=3, text=tags["title"]))
+    id3.add(TPE1(encoding=3, text=tags["artist"]))
+    id3.add(TALB(encoding=3, text=tags["album"]))
+    if art:
+        id3.add(APIC(encoding=3, mime="image/png", type=3, desc="", data=art))
+    id3.save(path)
+
+
+def write_flac(path, tags, art, rate=44100, seconds=3):
+    from mutagen.flac import FLAC, Picture
+    # STREAMINFO: بلوک‌ها، فریم‌ها، نرخ نمونه، کانال‌ها، عمق بیت و تعداد نمونه‌ها
+    info = struct.pack(">HH", 4096, 4096) + b"\x00" * 6
+    packed = (rate << 44) | (1 << 41) | (15 << 36) | (rate * seconds)
+    info += packed.to_bytes(8, "big") + b"\x00" * 16
+    with open(path, "wb") as f:
+        f.write(b"fLaC" + bytes([0x80]) + len(info).to_bytes(3, "big") + info)
+    audio = FLAC(path)
+    audio["title"] = tags["title"]
+    audio["artist"] = tags["artist"]
+    audio["album"] = tags["album"]
+    if art:
+        picture = Picture()
+        picture.type = 3
+        picture.mime = "image/png"
+        picture.data = art
+        audio.add_picture(picture)
+    audio.save()
+
+
+def write_ogg(path, tags, art, rate=44100, seconds=3):
+    from mutagen.ogg import OggPage
+    from mutagen.flac import Picture
+    from mutagen._vorbis import VCommentDict
+
+    identification = (b"\x01vorbis" + struct.pack("<IBIiii", 0, 2, rate, 0, 128000, 0) +
+                      bytes([0xB8, 0x01]))
+    comment = VCommentDict()
+    comment["title"] = tags["title"]
+    comment["artist"] = tags["artist"]
+    comment["album"] = tags["album"]
+    if art:
+        picture = Picture()
+        picture.type = 3
+        picture.mime = "image/png"
+        picture.data = art
+        comment["metadata_block_picture"] = base64.b64encode(picture.write()).decode("ascii")
+    comment_packet = b"\x03vorbis" + comment.write(framing=True)
+    setup_packet = b"\x05vorbis" + b"\x00" * 32
+
+    pages = []
+    for sequence, (packets, position) in enumerate((
+            ([identification], 0),
+            ([comment_packet, setup_packet], 0),
+            ([b"\x00" * 64], rate * seconds))):
+        page = OggPage()
+        page.serial = 1
+        page.sequence = sequence
+        page.position = position
+        page.packets = packets
+        page.first = sequence == 0
+        page.last = sequence == 2
+        pages.append(page.write())
+    with open(path, "wb") as f:
+        f.write(b"".join(pages))
+
+
+def generate_library(folder, tracks, depth=2, fanout=8, formats=FORMATS, art_ratio=0.5, seed=1):
+    """ساخت tracks فایل در درختی با عمق depth؛ لیست مسیرها را برمی‌گرداند"""
+    rng = random.Random(seed)
+    art = make_png()
+    words = ["love", "night", "dance", "blue", "moon", "river", "fire", "heart",
+             "sky", "dream", "road", "rain", "گل", "شب", "دریا", "باران"]
+    paths = []
+    for i in range(tracks):
+        parts = [f"d{level}_{(i // (fanout ** level)) % fanout}" for level in range(depth, 0, -1)]
+        directory = os.path.join(folder, *parts)
+        os.makedirs(directory, exist_ok=True)
+
+        fmt = formats[i % len(formats)]
+        path = os.path.join(directory, f"track{i:06d}.{fmt}")
+        tags = {
+            "title": " ".join(rng.choice(words) for _ in range(3)) + f" {i}",
+            "artist": f"Artist {i % 997}",
+            "album": f"Album {i % 4999}",
+        }
+        with_art = rng.random() < art_ratio
+        if fmt == "wav":
+            write_wav(path)
+        elif fmt == "mp3":
+            write_mp3(path, tags, art if with_art else None)
+        elif fmt == "flac":
+            write_flac(path, tags, art if with_art else None)
+        else:
+            write_ogg(path, tags, art if with_art else None)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ساخت کتابخانه موسیقی مصنوعی")
+    parser.add_argument("folder")
+    parser.add_argument("--tracks", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=2, help="عمق پوشه‌های تو در تو")
+    parser.add_argument("--fanout", type=int, default=8, help="تعداد زیرپوشه در هر سطح")
+    parser.add_argument("--formats", default=",".join(FORMATS))
+    args = parser.parse_args()
+
+    formats = tuple(f.strip() for f in args.formats.split(",") if f.strip())
+    paths = generate_library(args.folder, args.tracks, args.depth, args.fanout, formats)
+    print(f"{len(paths)} فایل در {args.folder} ساخته شد")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+# run_benchmarks.py - بنچمارک بدون نمایشگر و کارت صدا (offscreen / dummy)
+#
+# استفاده:
+#   python benchmarks/run_benchmarks.py --sizes 1000,10000,100000 --output results.json
+#   python benchmarks/run_benchmarks.py --sizes 1000 --compare results.json
+#
+# کتابخانه‌های مصنوعی در workdir ساخته و در اجراهای بعدی دوباره استفاده
+# می‌شوند. هر اندازه با پوشه خانه خالی اجرا می‌شود تا اسکن اول واقعاً سرد باشد.
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+
+# قبل از وارد کردن Qt و pygame
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from generate_library import generate_library, FORMATS
+
+# فرمت‌هایی که فایل مصنوعی آن‌ها با pygame قابل پخش است
+PLAYABLE = (".wav", ".mp3")
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+        return revision + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ensure_library(workdir, tracks, depth):
+    """کتابخانه tracks آهنگی؛ اگر قبلاً ساخته شده باشد دوباره ساخته نمی‌شود"""
+    folder = os.path.join(workdir, f"lib_{tracks}_d{depth}")
+    marker = os.path.join(folder, ".complete")
+    if os.path.exists(marker):
+        return folder, None
+    shutil.rmtree(folder, ignore_errors=True)
+    start = time.perf_counter()
+    generate_library(folder, tracks, depth=depth)
+    elapsed = time.perf_counter() - start
+    open(marker, "w").close()
+    return folder, elapsed
+
+
+def fresh_home(workdir, tracks, folder):
+    """پوشه خانه خالی با تنظیماتی که به کتابخانه مصنوعی اشاره می‌کند"""
+    home = os.path.join(workdir, f"home_{tracks}")
+    shutil.rmtree(home, ignore_errors=True)
+    app_data = os.path.join(home, ".simplemusicplayer")
+    os.makedirs(app_data)
+    with open(os.path.join(app_data, "player_settings.json"), "w", encoding="utf-8") as f:
+        # watcher خاموش است تا فقط خود اسکن اندازه‌گیری شود
+        json.dump({"library_roots": [folder], "watch_folder": False}, f)
+    os.environ["HOME"] = home
+    os.environ["USERPROFILE"] = home
+    return home
+
+
+def wait_until(app, condition, timeout):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        app.processEvents()
+        if time.perf_counter() > deadline:
+            raise TimeoutError("benchmark step timed out")
+        time.sleep(0.001)
+
+
+def time_calls(func, paths):
+    """میانگین زمان هر فراخوانی بر حسب میلی‌ثانیه"""
+    start = time.perf_counter()
+    for path in paths:
+        func(path)
+    return (time.perf_counter() - start) * 1000 / max(len(paths), 1)
+
+
+def sample_paths(paths, count):
+    """نمونه ثابت (seed ثابت) تا نتایج اجراهای مختلف قابل مقایسه باشند"""
+    if len(paths) <= count:
+        return list(paths)
+    return random.Random(count).sample(paths, count)
+
+
+def bench_size(app, args, tracks):
+    from music_player import MusicPlayer, LibraryScanner
+
+    folder, generate_s = ensure_library(args.workdir, tracks, args.depth)
+    fresh_home(args.workdir, tracks, folder)
+    result = {"tracks": tracks, "depth": args.depth}
+    if generate_s is not None:
+        result["generate_s"] = round(generate_s, 3)
+
+    player = MusicPlayer()
+    # راه‌اندازی خودکار پس از اولین رسم غیرفعال است؛ مراحل جداگانه اندازه‌گیری می‌شوند
+    player.startup_pending = False
+    player.show()
+    app.processEvents()
+    start = time.perf_counter()
+    player.init_audio()
+    result["audio_init_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    if not player.mixer_ready:
+        raise RuntimeError("audio backend failed to initialize")
+
+    # load_music_files: از شروع اسکن تا رسیدن همه آهنگ‌ها به لیست پخش
+    for name in ("scan_cold_s", "scan_warm_s"):
+        start = time.perf_counter()
+        player.load_music_files()
+        wait_until(app, lambda: player.scanner is None, args.timeout)
+        result[name] = round(time.perf_counter() - start, 3)
+    result["tracks_found"] = len(player.tracks)
+    result["scan_batch_size"] = LibraryScanner.BATCH_SIZE
+
+    # متادیتای تک فایل (مسیرهای بدون کش، همان توابع برنامه)
+    paths = sample_paths(list(player.tracks), args.samples)
+    result["samples"] = len(paths)
+    result["extract_metadata_ms"] = round(time_calls(player.extract_metadata, paths), 4)
+    result["get_audio_duration_ms"] = round(time_calls(player.get_audio_duration, paths), 4)
+    result["extract_album_art_ms"] = round(time_calls(player.extract_album_art, paths), 4)
+    for ext in FORMATS:
+        subset = [p for p in paths if p.endswith("." + ext)]
+        if subset:
+            result[f"extract_metadata_{ext}_ms"] = round(time_calls(player.extract_metadata, subset), 4)
+
+    # پر کردن لیست: همان دسته‌هایی که اسکنر به مدل می‌دهد، همراه با رسم view
+    store = player.tracks
+    rows = [(path, store.title(row), store.artist_name(row), store.album_name(row),
+             store.durations[row]) for row, path in enumerate(store)]
+    model = player.song_model
+    start = time.perf_counter()
+    model.clear()
+    for i in range(0, len(rows), LibraryScanner.BATCH_SIZE):
+        model.append_rows(rows[i:i + LibraryScanner.BATCH_SIZE])
+        app.processEvents()
+    player.song_list.viewport().repaint()
+    result["list_population_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    # تعویض آهنگ: next_song روی آهنگ‌های قابل پخش (به ترتیب نما)
+    playable = [row for row, path in enumerate(player.tracks) if path.endswith(PLAYABLE)]
+    switches = min(args.switches, len(playable) - 1)
+    if switches > 0:
+        model.set_filter(playable)
+        player.current_index = playable[0]
+        player.play_current_song()
+        app.processEvents()
+        start = time.perf_counter()
+        for _ in range(switches):
+            player.next_song()
+            app.processEvents()
+        result["track_switch_ms"] = round((time.perf_counter() - start) * 1000 / switches, 3)
+        result["track_switches"] = switches
+        model.set_filter(None)
+
+    player.close()
+    app.processEvents()
+    player.deleteLater()
+    return result
+
+
+def compare(results, baseline_path):
+    """چاپ تغییر هر عدد نسبت به یک فایل نتایج قبلی"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nمقایسه با {baseline_path} ({baseline['meta'].get('revision')})")
+    for size, values in results.items():
+        old_values = baseline["results"].get(size)
+        if not old_values:
+            continue
+        print(f"\n[{size}]")
+        for key, value in values.items():
+            old = old_values.get(key)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+                continue
+            if not key.endswith(("_s", "_ms")):
+                continue
+            change = f"{(value - old) / old * 100:+.1f}%" if old else "-"
+            print(f"  {key:32} {old:>12} -> {value:<12} {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بنچمارک Simple Music Player")
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--depth", type=int, default=3, help="عمق پوشه‌های کتابخانه مصنوعی")
+    parser.add_argument("--samples", type=int, default=200, help="تعداد فایل برای توابع متادیتا")
+    parser.add_argument("--switches", type=int, default=50, help="تعداد تعویض آهنگ")
+    parser.add_argument("--timeout", type=float, default=3600)
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "smp-benchmarks"))
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="فایل نتایج قبلی برای مقایسه")
+    args = parser.parse_args()
+    os.makedirs(args.workdir, exist_ok=True)
+
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+    app = QApplication(sys.argv)
+    # پنجره‌های پیام مودال در اجرای بدون نمایشگر برنامه را متوقف می‌کنند
+    for name in ("information", "warning", "critical"):
+        setattr(QMessageBox, name, staticmethod(lambda parent, title, text, *a: print(f"{title}: {text}")))
+
+    import PyQt5.QtCore
+    import mutagen
+    meta = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "qt": PyQt5.QtCore.QT_VERSION_STR,
+        "mutagen": mutagen.version_string,
+        "cpu_count": os.cpu_count(),
+    }
+
+    results = {}
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        print(f"== {size} آهنگ ==")
+        results[str(size)] = bench_size(app, args, size)
+        for key, value in results[str(size)].items():
+            print(f"  {key}: {value}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"\nنتایج در {args.output} ذخیره شد")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+# staging_bench.py - آزمایش کش محلی با یک پوشه کند به جای درایو شبکه
+#
+# استفاده:
+#   python benchmarks/staging_bench.py --tracks 12 --latency-ms 20 --mbps 40
+#
+# خواندن از پوشه مبدأ با تأخیر هر درخواست و پهنای باند محدود شبیه‌سازی
+# می‌شود؛ زمان کپی، زمان دسترسی به کپی محلی و درستی حذف LRU گزارش می‌شود.
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from generate_library import generate_library
+from staging import StagingCache
+
+
+class ThrottledFile:
+    """فایل فقط خواندنی با تأخیر ثابت برای هر read و سقف سرعت"""
+
+    def __init__(self, path, latency, bytes_per_second):
+        self.file = open(path, "rb")
+        self.latency = latency
+        self.bytes_per_second = bytes_per_second
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        time.sleep(self.latency + len(data) / self.bytes_per_second)
+        return data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.file.close()
+        return False
+
+
+def throttled_opener(latency, bytes_per_second):
+    def open_source(path, mode="rb"):
+        return ThrottledFile(path, latency, bytes_per_second)
+    return open_source
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بنچمارک کش محلی آهنگ‌ها")
+    parser.add_argument("--tracks", type=int, default=12)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--mbps", type=float, default=40, help="سرعت مبدأ (مگابیت بر ثانیه)")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "smp-staging"))
+    args = parser.parse_args()
+
+    remote = os.path.join(args.workdir, "remote")
+    local = os.path.join(args.workdir, "local")
+    shutil.rmtree(args.workdir, ignore_errors=True)
+    generate_library(remote, args.tracks, depth=1, formats=("mp3", "wav"))
+    paths = sorted(os.path.join(folder, name) for folder, _, files in os.walk(remote)
+                   for name in files)
+    sizes = {path: os.path.getsize(path) for path in paths}
+    opener = throttled_opener(args.latency_ms / 1000, args.mbps * 1_000_000 / 8)
+
+    # سقف حجم برای نصف آهنگ‌ها تا حذف LRU اتفاق بیفتد
+    budget = sum(sorted(sizes.values())[-(len(paths) // 2):])
+    cache = StagingCache(local, budget, open_source=opener)
+
+    start = time.perf_counter()
+    with opener(paths[0]) as f:
+        while f.read(64 * 1024):
+            pass
+    print(f"remote_read_ms (1 track): {(time.perf_counter() - start) * 1000:.1f}")
+
+    start = time.perf_counter()
+    for path in paths:
+        if cache.stage(path) is None:
+            print(f"stage failed: {path}")
+            return 1
+    elapsed = time.perf_counter() - start
+    print(f"stage_ms per track: {elapsed * 1000 / len(paths):.1f}")
+
+    start = time.perf_counter()
+    hits = [cache.get(path) for path in paths]
+    print(f"lookup_ms per track: {(time.perf_counter() - start) * 1000 / len(paths):.3f}")
+
+    # LRU: فقط آخرین آهنگ‌هایی که در سقف جا می‌شوند باقی مانده‌اند
+    kept = [path for path, hit in zip(paths, hits) if hit]
+    expected, total = [], 0
+    for path in reversed(paths):
+        if total + sizes[path] > budget:
+            break
+        expected.insert(0, path)
+        total += sizes[path]
+    print(f"kept {len(kept)}/{len(paths)} within {budget} bytes: "
+          f"{'ok' if kept == expected and cache.total_bytes <= budget else 'MISMATCH'}")
+
+    # pin شده‌ها حتی قدیمی‌ترین باشند حذف نمی‌شوند
+    cache.pin([kept[0]])
+    for path in paths[:len(paths) - len(kept)]:
+        cache.stage(path)
+    print(f"pinned copy kept: {'ok' if cache.get(kept[0]) else 'MISMATCH'}")
+
+    local_files = [name for name in os.listdir(local) if not name.endswith(".tmp")]
+    same = all(open(cache.get(p), "rb").read() == open(p, "rb").read()
+               for p in paths if cache.get(p))
+    print(f"local copies: {len(local_files)}, contents identical: {'ok' if same else 'MISMATCH'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
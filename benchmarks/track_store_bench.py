@@ -0,0 +1,118 @@
+# track_store_bench.py - حافظه هر آهنگ در لیست پخش: ساختار قبلی در برابر TrackStore
+#
+# استفاده:
+#   python benchmarks/track_store_bench.py --tracks 100000
+#
+# متادیتای مصنوعی در حافظه ساخته می‌شود (بدون فایل). مثل خواندن تگ‌ها با
+# mutagen، هر آهنگ رشته‌های جدای خودش را دارد. حافظه‌ای که پس از دور
+# انداختن دسته‌های ورودی باقی می‌ماند با tracemalloc اندازه‌گیری می‌شود.
+import os
+import gc
+import sys
+import random
+import argparse
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from track_store import TrackStore
+from search_index import SearchIndex
+from browse import BrowseIndex
+
+
+def synthetic_tracks(count, root):
+    """(path, title, artist, album, duration, added) شبیه یک کتابخانه واقعی"""
+    rng = random.Random(count)
+    tracks = []
+    artist = 0
+    while len(tracks) < count:
+        for album in range(rng.randrange(1, 8)):
+            for number in range(1, rng.randrange(8, 16)):
+                # رشته‌ها برای هر آهنگ از نو ساخته می‌شوند، مثل نتیجه تگ‌خوانی
+                folder = os.path.join(root, f"Artist {artist:04d}", f"Album {album} ({1990 + album})")
+                title = f"Track {number:02d} of album {album}" if rng.random() < 0.8 else None
+                name = f"{number:02d} - Song title number {number} by artist {artist}.mp3"
+                tracks.append((os.path.join(folder, name), title or name, f"Artist {artist:04d}",
+                               f"Album {album} ({1990 + album})", rng.uniform(120, 420),
+                               1_600_000_000 + rng.random() * 1e8))
+        artist += 1
+    return tracks[:count]
+
+
+def legacy_structures(tracks):
+    """ساختارهای قبلی: لیست مسیرها، dict مدت‌ها، تاپل ردیف‌های مدل،
+    مسیر ↔ شناسه در SearchIndex و dict گین‌ها"""
+    music_files = []
+    song_durations = {}
+    rows = []
+    ids = {}
+    paths = []
+    gains = {}
+    for path, title, artist, album, duration, added in tracks:
+        music_files.append(path)
+        song_durations[path] = duration
+        rows.append((title, artist, duration))
+        ids[path] = len(paths)
+        paths.append(path)
+        gains[path] = -6.5
+    return music_files, song_durations, rows, ids, paths, gains
+
+
+def store_structures(tracks):
+    store = TrackStore()
+    for path, title, artist, album, duration, added in tracks:
+        store.append(path, title, artist, album, duration)
+    for row in range(len(store)):
+        store.set_gain(row, -6.5)
+    store.row_of_id()
+    return store
+
+
+def indexes(tracks):
+    search, browse = SearchIndex(), BrowseIndex()
+    for track_id, (path, title, artist, album, duration, added) in enumerate(tracks):
+        search.add(track_id, path, title, artist, album)
+        browse.set(track_id, path, title, artist, album, duration, added)
+    return search, browse
+
+
+def measure(build, count, root):
+    """بایت‌هایی که نتیجه build پس از دور انداختن داده ورودی نگه می‌دارد"""
+    gc.collect()
+    tracemalloc.start()
+    tracks = synthetic_tracks(count, root)
+    result = build(tracks)
+    del tracks
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return retained, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بنچمارک حافظه TrackStore")
+    parser.add_argument("--tracks", type=int, default=100000)
+    parser.add_argument("--root", default=os.path.join(os.sep, "home", "user", "Music"))
+    args = parser.parse_args()
+
+    count = args.tracks
+    legacy, _ = measure(legacy_structures, count, args.root)
+    compact, store = measure(store_structures, count, args.root)
+    print(f"tracks: {count}, folders: {len(store.folders)}, shared strings: {len(store.strings)}")
+    print(f"legacy bytes/track: {legacy / count:.1f}")
+    print(f"track store bytes/track: {compact / count:.1f}  ({legacy / compact:.1f}x smaller)")
+    search_browse, _ = measure(indexes, count, args.root)
+    print(f"search + browse index bytes/track: {search_browse / count:.1f}")
+
+    tracks = synthetic_tracks(count, args.root)
+    # درستی: مسیرها و متادیتا همان ورودی هستند
+    same = all(store[row] == path and store.title(row) == title and
+               store.artist_name(row) == artist and abs(store.durations[row] - duration) < 1e-3
+               for row, (path, title, artist, album, duration, added) in enumerate(tracks))
+    print(f"round trip: {'ok' if same else 'MISMATCH'}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
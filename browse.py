@@ -0,0 +1,118 @@
+# browse.py - کلیدهای مرتب‌سازی و گروه‌بندی از پیش محاسبه شده برای نمایش کتابخانه
+import os
+import locale
+from array import array
+
+SORT_FIELDS = ("title", "artist", "duration", "added")
+GROUP_MODES = ("artist", "album", "folder")
+
+UNKNOWN = "ناشناس"
+
+
+def collation_key(text):
+    """کلید مقایسه وابسته به زبان سیستم (یک بار برای هر آهنگ محاسبه می‌شود)"""
+    text = (text or "").casefold()
+    try:
+        return locale.strxfrm(text)
+    except Exception:
+        return text
+
+
+class BrowseIndex:
+    """کلیدهای هر آهنگ بر اساس شناسه ثابت آن (همان شناسه SearchIndex)
+
+    ترتیب‌ها و گروه‌ها یک بار ساخته و تا تغییر بعدی کتابخانه نگه داشته
+    می‌شوند؛ تغییر نمای کاربر فقط یک آرایه شناسه را برمی‌گرداند.
+    """
+
+    def __init__(self):
+        # id -> (title_key, artist_key, album_key, folder, duration, added, artist, album)
+        self.keys = []
+        # هنرمند، آلبوم و پوشه تکراری‌اند؛ رشته و کلید مقایسه آن‌ها مشترک است
+        self.shared = {}
+        self.orders = {}
+        self.ranks = {}
+        self.groups = {}
+
+    def set(self, track_id, path, title, artist, album, duration, added):
+        if track_id >= len(self.keys):
+            self.keys.extend([None] * (track_id + 1 - len(self.keys)))
+        artist, artist_key = self._share(artist or UNKNOWN)
+        album, album_key = self._share(album or UNKNOWN)
+        folder = self._share(os.path.dirname(path))[0]
+        self.keys[track_id] = (collation_key(title), artist_key, album_key, folder,
+                               duration, added, artist, album)
+        self.invalidate()
+
+    def _share(self, text):
+        """(رشته مشترک، کلید مقایسه آن)"""
+        shared = self.shared.get(text)
+        if shared is None:
+            shared = self.shared[text] = (text, collation_key(text))
+        return shared
+
+    def remove(self, track_id):
+        if track_id < len(self.keys):
+            self.keys[track_id] = None
+            self.invalidate()
+
+    def clear(self):
+        self.__init__()
+
+    def invalidate(self):
+        if self.orders or self.groups:
+            self.orders.clear()
+            self.ranks.clear()
+            self.groups.clear()
+
+    def _sort_key(self, field):
+        if field == "title":
+            return lambda k: (k[0], k[1])
+        if field == "artist":
+            return lambda k: (k[1], k[2], k[0])
+        if field == "duration":
+            return lambda k: (k[4], k[0])
+        return lambda k: (k[5], k[0])
+
+    def order(self, field):
+        """شناسه همه آهنگ‌ها به ترتیب صعودی field"""
+        ids = self.orders.get(field)
+        if ids is None:
+            keys = self.keys
+            sort_key = self._sort_key(field)
+            ids = [i for i, k in enumerate(keys) if k is not None]
+            ids.sort(key=lambda i: sort_key(keys[i]))
+            self.orders[field] = ids
+        return ids
+
+    def rank(self, field):
+        """رتبه هر شناسه در ترتیب field؛ مرتب‌سازی زیرمجموعه‌ها با عدد صحیح"""
+        ranks = self.ranks.get(field)
+        if ranks is None:
+            ranks = array("l", [0]) * len(self.keys)
+            for position, track_id in enumerate(self.order(field)):
+                ranks[track_id] = position
+            self.ranks[field] = ranks
+        return ranks
+
+    def group_list(self, mode):
+        """[(نام گروه، [شناسه‌ها])] مرتب بر اساس نام گروه"""
+        groups = self.groups.get(mode)
+        if groups is None:
+            key_index, name_index = {"artist": (1, 6), "album": (2, 7), "folder": (3, 3)}[mode]
+            buckets = {}
+            for track_id, k in enumerate(self.keys):
+                if k is None:
+                    continue
+                bucket = buckets.get(k[key_index])
+                if bucket is None:
+                    bucket = buckets[k[key_index]] = (k[name_index], [])
+                bucket[1].append(track_id)
+            groups = [buckets[key] for key in sorted(buckets)]
+            self.groups[mode] = groups
+        return groups
+
+    def sorted_ids(self, ids, field, reverse=False):
+        """مرتب کردن یک زیرمجموعه با رتبه‌های از پیش محاسبه شده"""
+        ranks = self.rank(field)
+        return sorted(ids, key=ranks.__getitem__, reverse=reverse)
@@ -0,0 +1,239 @@
+# duplicates.py - یافتن آهنگ‌های تکراری با hash محتوای صوتی (بدون تگ‌ها)
+import os
+import mmap
+import struct
+import hashlib
+
+from library import track_sort_key
+
+# آهنگ‌هایی که مدتشان بیشتر از این فاصله دارد هرگز مقایسه نمی‌شوند
+DURATION_TOLERANCE = 0.5
+
+HASH_CHUNK = 1024 * 1024
+
+
+def _id3v2_end(mm, start=0):
+    """پایان تگ ID3v2 ابتدای فایل (یا start اگر تگی نباشد)"""
+    if mm[start:start + 3] != b"ID3" or len(mm) < start + 10:
+        return start
+    flags = mm[start + 5]
+    b = mm[start + 6:start + 10]
+    size = (b[0] << 21) | (b[1] << 14) | (b[2] << 7) | b[3]
+    return start + 10 + size + (10 if flags & 0x10 else 0)
+
+
+def _tail_tags_start(mm, start):
+    """ابتدای تگ‌های انتهای فایل (ID3v1 و APEv2)"""
+    end = len(mm)
+    while end - start >= 32:
+        if end - start >= 128 and mm[end - 128:end - 125] == b"TAG":
+            end -= 128
+        elif mm[end - 32:end - 24] == b"APETAGEX":
+            size, _, flags = struct.unpack("<III", mm[end - 20:end - 8])
+            end -= size + (32 if flags & 0x80000000 else 0)
+        else:
+            break
+    return max(end, start)
+
+
+def _flac_ranges(mm):
+    pos = _id3v2_end(mm)
+    if mm[pos:pos + 4] != b"fLaC":
+        return None
+    pos += 4
+    while pos + 4 <= len(mm):
+        header = mm[pos]
+        length = int.from_bytes(mm[pos + 1:pos + 4], "big")
+        pos += 4 + length
+        if header & 0x80:
+            break
+    return [(pos, _tail_tags_start(mm, pos))]
+
+
+def _riff_ranges(mm):
+    if mm[0:4] not in (b"RIFF", b"RIFX") or mm[8:12] != b"WAVE":
+        return None
+    order = "<" if mm[0:4] == b"RIFF" else ">"
+    pos = 12
+    while pos + 8 <= len(mm):
+        chunk_id = mm[pos:pos + 4]
+        size = struct.unpack(order + "I", mm[pos + 4:pos + 8])[0]
+        if chunk_id == b"data":
+            return [(pos + 8, min(pos + 8 + size, len(mm)))]
+        pos += 8 + size + (size & 1)
+    return None
+
+
+def _mp4_ranges(mm):
+    ranges = []
+    pos = 0
+    while pos + 8 <= len(mm):
+        size, kind = struct.unpack(">I4s", mm[pos:pos + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", mm[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = len(mm) - pos
+        if size < header:
+            return None
+        if kind == b"mdat":
+            ranges.append((pos + header, min(pos + size, len(mm))))
+        pos += size
+    return ranges or None
+
+
+def _ogg_pages(mm):
+    """(offset, header_size, body_size, granule) هر صفحه Ogg"""
+    pos = 0
+    while pos + 27 <= len(mm) and mm[pos:pos + 4] == b"OggS":
+        granule = struct.unpack("<q", mm[pos + 6:pos + 14])[0]
+        segments = mm[pos + 26]
+        header = 27 + segments
+        body = sum(mm[pos + 27:pos + header])
+        yield pos, header, body, granule
+        pos += header + body
+
+
+def _ogg_ranges(mm):
+    """بدنه صفحه‌های صوتی؛ صفحه‌های سرآیند (granule صفر) تگ‌ها را دارند
+
+    شماره و CRC صفحه‌ها با تغییر حجم تگ عوض می‌شوند، پس فقط بدنه‌ها hash می‌شوند.
+    """
+    ranges = [(pos + header, pos + header + body)
+              for pos, header, body, granule in _ogg_pages(mm) if granule != 0]
+    return ranges or None
+
+
+def _ogg_payload_size(mm):
+    """حجم صفحه‌های صوتی بدون خواندن همه آن‌ها (از اولین صفحه صوتی تا انتها)"""
+    for pos, _, _, granule in _ogg_pages(mm):
+        if granule != 0:
+            return len(mm) - pos
+    return None
+
+
+def audio_ranges(mm, ext):
+    """بازه‌های بایت صدای خام فایل بدون تگ‌ها؛ برای فرمت ناشناخته کل فایل"""
+    parsers = {".flac": _flac_ranges, ".wav": _riff_ranges, ".m4a": _mp4_ranges,
+               ".ogg": _ogg_ranges}
+    parser = parsers.get(ext)
+    ranges = parser(mm) if parser else None
+    if ranges is None:
+        start = _id3v2_end(mm)
+        ranges = [(start, _tail_tags_start(mm, start))]
+    return ranges
+
+
+def _open_mmap(file_path):
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def payload_size(file_path):
+    """حجم صدای خام بدون تگ‌ها (فقط سرآیندها خوانده می‌شوند) یا None"""
+    try:
+        mm = _open_mmap(file_path)
+        if mm is None:
+            return None
+        with mm:
+            ext = os.path.splitext(file_path)[1].lower()
+            if ext == ".ogg":
+                return _ogg_payload_size(mm)
+            return sum(end - start for start, end in audio_ranges(mm, ext))
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def hash_audio(file_path):
+    """hash محتوای صوتی (تغییر تگ‌ها روی آن اثر ندارد) یا None"""
+    try:
+        mm = _open_mmap(file_path)
+        if mm is None:
+            return None
+        with mm:
+            digest = hashlib.blake2b(digest_size=16)
+            view = memoryview(mm)
+            try:
+                for start, end in audio_ranges(mm, os.path.splitext(file_path)[1].lower()):
+                    for offset in range(start, end, HASH_CHUNK):
+                        digest.update(view[offset:min(offset + HASH_CHUNK, end)])
+            finally:
+                view.release()
+            return digest.hexdigest()
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def _candidates(tracks):
+    """مسیرهایی که آهنگ دیگری با فاصله مدت کمتر از DURATION_TOLERANCE دارند"""
+    ordered = sorted(tracks, key=lambda file_path: tracks[file_path][0])
+    durations = [tracks[file_path][0] for file_path in ordered]
+    candidates = []
+    for i, file_path in enumerate(ordered):
+        if (i > 0 and durations[i] - durations[i - 1] <= DURATION_TOLERANCE) or \
+                (i + 1 < len(ordered) and durations[i + 1] - durations[i] <= DURATION_TOLERANCE):
+            candidates.append(file_path)
+    return candidates
+
+
+def find_duplicates(library_index, roots, executor=None, cancelled=None):
+    """گروه‌های آهنگ تکراری (هر گروه لیست مرتب مسیرها)
+
+    مرحله‌ها: مدت از ایندکس (بدون خواندن فایل)، حجم صدای خام از سرآیندها و
+    در آخر hash کامل فقط برای هم‌حجم‌ها. حجم و hash در ایندکس ذخیره می‌شوند
+    تا اجرای بعدی فقط فایل‌های جدید یا تغییر کرده را بخواند.
+    """
+    tracks = {}
+    for root in roots:
+        tracks.update(library_index.load_fingerprints(root))
+    run_map = map if executor is None else executor.map
+
+    def compute(func, paths, batch=512):
+        """نتایج func برای paths به صورت دسته‌ای (برای لغو سریع) یا None اگر لغو شود"""
+        results = []
+        for i in range(0, len(paths), batch):
+            if cancelled is not None and cancelled.is_set():
+                return None
+            results.extend(run_map(func, paths[i:i + batch]))
+        return results
+
+    candidates = _candidates(tracks)
+    missing = [p for p in candidates if tracks[p][1] is None]
+    sizes = compute(payload_size, missing)
+    if sizes is None:
+        return []
+    library_index.store_fingerprints([(p, size, None) for p, size in zip(missing, sizes)
+                                      if size is not None])
+    for file_path, size in zip(missing, sizes):
+        tracks[file_path] = (tracks[file_path][0], size, None)
+    by_size = {}
+    for file_path in candidates:
+        size = tracks[file_path][1]
+        if size:
+            by_size.setdefault(size, []).append(file_path)
+
+    # فقط فایل‌های هم‌حجم کامل خوانده می‌شوند
+    same_size = [paths for paths in by_size.values() if len(paths) > 1]
+    missing = [p for paths in same_size for p in paths if tracks[p][2] is None]
+    hashes = compute(hash_audio, missing)
+    if hashes is None:
+        return []
+    library_index.store_fingerprints([(p, tracks[p][1], digest)
+                                      for p, digest in zip(missing, hashes) if digest is not None])
+    for file_path, digest in zip(missing, hashes):
+        tracks[file_path] = tracks[file_path][:2] + (digest,)
+
+    groups = []
+    for paths in same_size:
+        by_hash = {}
+        for file_path in paths:
+            digest = tracks[file_path][2]
+            if digest is not None:
+                by_hash.setdefault(digest, []).append(file_path)
+        groups.extend(sorted(same, key=track_sort_key)
+                      for same in by_hash.values() if len(same) > 1)
+    groups.sort(key=lambda group: track_sort_key(group[0]))
+    return groups
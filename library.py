@@ -0,0 +1,762 @@
+# library.py - ایندکس پایدار کتابخانه موسیقی (SQLite) و اسکن بدون Qt
+import os
+import re
+import sys
+import json
+import time
+import pickle
+import fnmatch
+import argparse
+import sqlite3
+import threading
+import base64
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# mutagen فقط هنگام اولین پارس فایل بارگذاری می‌شود (شروع سریع‌تر برنامه)
+
+
+SCHEMA_VERSION = 6
+
+AUDIO_EXTENSIONS = ['.mp3', '.wav', '.ogg', '.flac', '.m4a', '.aac']
+_AUDIO_SUFFIXES = frozenset(AUDIO_EXTENSIONS)
+
+DEFAULT_DURATION = 180
+
+UNKNOWN_ARTIST = "ناشناس"
+
+SNAPSHOT_FILE = "session_snapshot.pickle"
+
+# ایندکس‌ساز خط فرمان: دسته‌های بزرگ‌تر و چند فایل در هر پیام به پردازه‌ها
+INDEX_BATCH_SIZE = 4096
+INDEX_CHUNK_SIZE = 64
+
+# تعداد خواندن هم‌زمان پوشه‌ها؛ در درایو شبکه هر scandir یک رفت و برگشت است
+WALK_WORKERS = 8
+
+# نتیجه یک بار خواندن فایل؛ art فقط در صورت درخواست پر می‌شود
+TrackInfo = namedtuple("TrackInfo", "title artist album duration sample_rate has_art art gain")
+
+# کلید تگ‌ها در فرمت‌های مختلف: ID3، Vorbis/FLAC و MP4
+_ID3_KEYS = {"title": "TIT2", "artist": "TPE1", "album": "TALB"}
+_MP4_KEYS = {"title": "\xa9nam", "artist": "\xa9ART", "album": "\xa9alb"}
+
+# گین ReplayGain آهنگ؛ R128 (Opus) نسبت به -23 LUFS است و ۵ dB فاصله دارد
+_GAIN_KEYS = ("replaygain_track_gain", "----:com.apple.iTunes:replaygain_track_gain",
+              "----:com.apple.iTunes:REPLAYGAIN_TRACK_GAIN")
+
+
+def get_app_data_dir():
+    """پوشه داده‌های برنامه در پوشه کاربر"""
+    app_data = Path.home() / ".simplemusicplayer"
+    app_data.mkdir(exist_ok=True)
+    return app_data
+
+
+def _first_text(value):
+    """اولین مقدار متنی یک تگ (فریم ID3 یا لیست)"""
+    if value is None:
+        return None
+    if hasattr(value, "text"):
+        value = value.text
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _read_tags(tags):
+    """title, artist, album از هر نوع تگ mutagen"""
+    if tags is None:
+        return None, None, None
+    from mutagen.mp4 import MP4Tags
+    if hasattr(tags, "getall"):
+        keys = _ID3_KEYS
+    elif isinstance(tags, MP4Tags):
+        keys = _MP4_KEYS
+    else:
+        keys = {"title": "title", "artist": "artist", "album": "album"}
+    return tuple(_first_text(tags.get(keys[name])) for name in ("title", "artist", "album"))
+
+
+def _read_gain(tags):
+    """گین تگ ReplayGain بر حسب dB یا None"""
+    if tags is None:
+        return None
+    value = None
+    if hasattr(tags, "getall"):
+        for frame in tags.getall("TXXX"):
+            if frame.desc.lower() == "replaygain_track_gain":
+                value = _first_text(frame)
+                break
+    else:
+        for key in _GAIN_KEYS:
+            raw = tags.get(key)
+            if raw:
+                raw = raw[0] if isinstance(raw, list) else raw
+                value = raw.decode("utf-8", "replace") if isinstance(raw, bytes) else str(raw)
+                break
+        else:
+            r128 = _first_text(tags.get("r128_track_gain"))
+            if r128 is not None:
+                try:
+                    return int(r128) / 256 + 5.0
+                except ValueError:
+                    return None
+    if not value:
+        return None
+    try:
+        return float(value.split()[0])
+    except (ValueError, IndexError):
+        return None
+
+
+def _find_art(audio):
+    """داده کاور داخل فایل (بایت‌های تصویر) یا None"""
+    pictures = getattr(audio, "pictures", None)
+    if pictures:
+        return pictures[0].data
+    tags = audio.tags
+    if tags is None:
+        return None
+    if hasattr(tags, "getall"):
+        frames = tags.getall("APIC")
+        return frames[0].data if frames else None
+    covers = tags.get("covr")
+    if covers:
+        return bytes(covers[0])
+    blocks = tags.get("metadata_block_picture")
+    if blocks:
+        from mutagen.flac import Picture
+        try:
+            return Picture(base64.b64decode(blocks[0])).data
+        except Exception:
+            return None
+    return None
+
+
+def probe_track(file_path, with_art=False):
+    """خواندن همه اطلاعات لازم یک فایل با یک بار پارس mutagen
+
+    برای فایل‌های خراب یا ناشناخته مدت پیش‌فرض برگردانده می‌شود.
+    """
+    import mutagen
+    try:
+        audio = mutagen.File(file_path)
+    except Exception:
+        audio = None
+    if audio is None:
+        return TrackInfo(None, None, None, DEFAULT_DURATION, 0, False, None, None)
+    
+    info = audio.info
+    duration = getattr(info, "length", 0) or DEFAULT_DURATION
+    sample_rate = getattr(info, "sample_rate", 0) or 0
+    try:
+        title, artist, album = _read_tags(audio.tags)
+    except Exception:
+        title = artist = album = None
+    try:
+        art = _find_art(audio)
+    except Exception:
+        art = None
+    try:
+        gain = _read_gain(audio.tags)
+    except Exception:
+        gain = None
+    return TrackInfo(title, artist, album, duration, sample_rate,
+                     art is not None, art if with_art else None, gain)
+
+
+def probe_file(file_path):
+    """اطلاعات یک فایل برای ایندکس: (title, artist, album, duration, has_art, gain)
+
+    تابع سطح ماژول است تا در ProcessPoolExecutor هم قابل استفاده باشد.
+    """
+    track = probe_track(file_path)
+    title = track.title or os.path.basename(file_path)
+    artist = track.artist or UNKNOWN_ARTIST
+    return title, artist, track.album or "", track.duration, track.has_art, track.gain
+
+
+def resolve_tracks(items, cached, probe, executor=None, cancelled=None, chunksize=1):
+    """تبدیل (path, trusted) به ردیف‌های لیست پخش و رکوردهای جدید ایندکس
+
+    trusted یعنی مسیر از ایندکس آمده (پوشه خوانده نشده است)، ولی حجم و زمان
+    تغییر آن باز هم بررسی می‌شود: تغییر تگ در جا زمان پوشه را عوض نمی‌کند.
+    ورودی‌های ایندکس استفاده شده از cached حذف می‌شوند؛ فایل trusted که دیگر
+    وجود ندارد در cached می‌ماند تا حذف شود.
+    """
+    results = [None] * len(items)
+    pending = []
+    now = time.time()
+    for i, (file_path, trusted) in enumerate(items):
+        entry = cached.pop(file_path, None)
+        try:
+            st = os.stat(file_path)
+            size, mtime = st.st_size, st.st_mtime
+        except OSError:
+            if trusted and entry:
+                cached[file_path] = entry
+                continue
+            size, mtime = -1, 0
+        if entry and entry[0] == size and entry[1] == mtime:
+            results[i] = (file_path,) + entry[2:6] + (entry[7],)
+        else:
+            pending.append((i, file_path, size, mtime, entry[7] if entry else now))
+    
+    changed = []
+    paths = [item[1] for item in pending]
+    probed = executor.map(probe, paths, chunksize=chunksize) if executor else map(probe, paths)
+    for (i, file_path, size, mtime, added), probed_info in zip(pending, probed):
+        if cancelled is not None and cancelled.is_set():
+            break
+        title, artist, album, duration, has_art, gain = probed_info
+        results[i] = (file_path, title, artist, album, duration, added)
+        changed.append((file_path, size, mtime, title, artist, album, duration, int(has_art),
+                        added, gain))
+    return [r for r in results if r is not None], changed
+
+
+def is_audio_file(name):
+    dot = name.rfind(".")
+    return dot > 0 and name[dot:].lower() in _AUDIO_SUFFIXES
+
+
+def track_sort_key(path):
+    """کلید ترتیب لیست پخش؛ همان ترتیب پیمایش پوشه‌ها با نام‌های مرتب"""
+    folder, name = os.path.split(path)
+    return folder.split(os.sep), name
+
+
+def normalize_roots(roots):
+    """ریشه‌های کتابخانه: مطلق، بدون تکرار و بدون ریشه‌ای که داخل ریشه دیگر است
+
+    ریشه‌ها به ترتیب مسیر مرتب می‌شوند تا ترتیب پیمایش با track_sort_key یکی باشد.
+    """
+    result = []
+    for root in sorted({os.path.abspath(r) for r in roots if r}, key=lambda p: p.split(os.sep)):
+        if result and root.startswith(os.path.join(result[-1], "")):
+            continue
+        result.append(root)
+    return result
+
+
+def normalize_excludes(patterns):
+    """الگوهای حذف بدون فاصله و خالی، با / و مرتب (برای مقایسه با اسکن قبلی)"""
+    return sorted({p.strip().replace("\\", "/") for p in patterns if p.strip()})
+
+
+def compile_excludes(patterns):
+    """تابع (path, name) -> bool برای الگوهای glob حذف، یا None اگر الگویی نباشد
+
+    الگوی بدون / با نام فایل یا پوشه مقایسه می‌شود (مثل *.tmp یا Podcasts) و
+    الگوی دارای / با کل مسیر (مثل */Samples/*).
+    """
+    flags = re.IGNORECASE if os.name == "nt" else 0
+    names, paths = [], []
+    for pattern in normalize_excludes(patterns):
+        (paths if "/" in pattern else names).append(fnmatch.translate(pattern))
+    if not names and not paths:
+        return None
+    match_name = re.compile("|".join(names), flags).match if names else None
+    match_path = re.compile("|".join(paths), flags).match if paths else None
+    
+    def excluded(path, name):
+        if match_name is not None and match_name(name):
+            return True
+        return match_path is not None and match_path(path.replace(os.sep, "/")) is not None
+    return excluded
+
+
+def excluded_below(excluded, path, root):
+    """آیا فایل path یا یکی از پوشه‌های آن زیر root با الگوهای حذف مطابقت دارد؟"""
+    if excluded is None:
+        return False
+    while len(path) > len(root):
+        if excluded(path, os.path.basename(path)):
+            return True
+        path = os.path.dirname(path)
+    return False
+
+
+def iter_library_dirs(roots, known_dirs=None, cancelled=None, exclude=(), executor=None):
+    """پیمایش پوشه‌ها به ترتیب مرتب؛ خروجی (dir, mtime, files)
+
+    roots یک مسیر یا لیستی از ریشه‌ها است. اگر زمان تغییر یک پوشه با
+    known_dirs یکی باشد محتوای آن خوانده نمی‌شود و files برابر None است
+    (فایل‌ها از ایندکس برداشته می‌شوند).
+    
+    با executor هر پوشه بلافاصله پس از خواندن پوشه والد در پس‌زمینه خوانده
+    می‌شود و چند ریشه و شاخه هم‌زمان پیش می‌روند؛ ترتیب خروجی تغییر نمی‌کند.
+    لینک‌های نمادین پوشه دنبال می‌شوند: پوشه‌ای که جد خودش باشد (حلقه) و
+    پوشه‌ای که قبلاً از مسیر دیگری دیده شده کنار گذاشته می‌شوند.
+    """
+    if isinstance(roots, str):
+        roots = [roots]
+    known_dirs = known_dirs or {}
+    excluded = compile_excludes(exclude)
+    children = {}
+    for d in known_dirs:
+        parent = os.path.dirname(d)
+        if parent != d:
+            children.setdefault(parent, []).append(d)
+    
+    def schedule(path, ancestors):
+        future = executor.submit(list_dir, path, ancestors) if executor else None
+        return path, ancestors, future
+    
+    def list_dir(path, ancestors):
+        if cancelled is not None and cancelled.is_set():
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        identity = (st.st_dev, st.st_ino)
+        if identity in ancestors:
+            return None
+        ancestors = ancestors | {identity}
+        
+        if known_dirs.get(path) == st.st_mtime:
+            files = None
+            subdirs = children.get(path, [])
+            if excluded is not None:
+                subdirs = [d for d in subdirs if not excluded(d, os.path.basename(d))]
+        else:
+            files, subdirs = [], []
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if excluded is not None and excluded(entry.path, entry.name):
+                            continue
+                        try:
+                            if entry.is_dir():
+                                subdirs.append(entry.path)
+                            elif is_audio_file(entry.name):
+                                files.append(entry.path)
+                        except OSError:
+                            pass
+            except OSError:
+                return None
+            files.sort(key=os.path.basename)
+        subdirs.sort(key=os.path.basename)
+        return identity, st.st_mtime, files, [schedule(d, ancestors) for d in subdirs]
+    
+    seen = set()
+    stack = [schedule(root, frozenset()) for root in reversed(roots)]
+    while stack:
+        if cancelled is not None and cancelled.is_set():
+            return
+        path, ancestors, future = stack.pop()
+        listing = future.result() if future else list_dir(path, ancestors)
+        if listing is None:
+            continue
+        identity, mtime, files, subdirs = listing
+        if identity in seen:
+            continue
+        seen.add(identity)
+        yield path, mtime, files
+        stack.extend(reversed(subdirs))
+
+
+def settings_library_roots(settings):
+    """ریشه‌های کتابخانه از تنظیمات؛ last_folder نسخه‌های قبلی به لیست تبدیل می‌شود"""
+    roots = settings.get("library_roots")
+    if roots is None:
+        last_folder = settings.get("last_folder")
+        roots = [last_folder] if last_folder else []
+    return list(roots)
+
+
+def load_snapshot(path):
+    """لیست پخش ذخیره شده جلسه قبل: (roots, [(path, title, artist, album, duration, added)])"""
+    try:
+        with open(path, "rb") as f:
+            roots, tracks = pickle.load(f)
+        return roots, tracks
+    except Exception:
+        return None, []
+
+
+def save_snapshot(path, roots, tracks):
+    """ذخیره اتمی لیست پخش برای نمایش فوری در اجرای بعدی"""
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump((roots, tracks), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"خطا در ذخیره لیست پخش: {e}")
+
+
+def _subtree_range(folder):
+    """(prefix, upper) برای جستجوی بازه‌ای مسیرهای زیر folder روی کلید اصلی
+
+    SQLite متن را با بایت‌های UTF-8 مقایسه می‌کند و کاراکترهای بیرون از BMP
+    (مثل ایموجی) بعد از U+FFFF می‌آیند؛ پس مرز بالا کاراکتر بعد از جداکننده
+    است که هیچ مسیر زیر folder به آن نمی‌رسد.
+    """
+    prefix = os.path.join(folder, "")
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _split_gains(rows):
+    gains = {path: gain for path, gain in rows if gain is not None}
+    missing = [path for path, gain in rows if gain is None]
+    return gains, missing
+
+
+class LibraryIndex:
+    """ایندکس فایل‌های موسیقی بر اساس مسیر، حجم و زمان تغییر
+
+    فقط فایل‌های جدید یا تغییر کرده دوباره با mutagen خوانده می‌شوند.
+    """
+
+    def __init__(self, db_path=None):
+        if db_path is None:
+            db_path = get_app_data_dir() / "library.db"
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            # ایندکس فقط کش است؛ با تغییر ساختار از نو ساخته می‌شود
+            self.conn.execute("DROP TABLE IF EXISTS tracks")
+            self.conn.execute("DROP TABLE IF EXISTS dirs")
+            self.conn.execute("DROP TABLE IF EXISTS meta")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tracks (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                title TEXT,
+                artist TEXT,
+                album TEXT,
+                duration REAL NOT NULL,
+                has_art INTEGER NOT NULL DEFAULT 0,
+                added REAL NOT NULL DEFAULT 0,
+                gain REAL,
+                payload INTEGER,
+                audio_hash TEXT
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.commit()
+
+    def load_folder(self, folder):
+        """همه رکوردهای زیر یک پوشه: {path: (size, mtime, title, artist, album, duration, has_art, added)}"""
+        # جستجوی بازه‌ای روی کلید اصلی، بدون پیمایش کل جدول
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT path, size, mtime, title, artist, album, duration, has_art, added "
+                "FROM tracks WHERE path >= ? AND path < ?",
+                _subtree_range(folder),
+            ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def load_dirs(self, folder):
+        """زمان تغییر ذخیره شده پوشه‌های زیر folder (خود folder هم شامل است)"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT path, mtime FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                (folder,) + _subtree_range(folder),
+            ).fetchall()
+        return dict(rows)
+
+    def store_dirs(self, dirs):
+        """ذخیره زمان تغییر پوشه‌ها: {path: mtime}"""
+        if not dirs:
+            return
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO dirs (path, mtime) VALUES (?, ?)", dirs.items())
+            self.conn.commit()
+
+    def remove_dirs(self, paths):
+        """حذف پوشه‌ها و همه زیرپوشه‌های آن‌ها از ایندکس پوشه‌ها"""
+        if not paths:
+            return
+        with self._lock:
+            for path in paths:
+                self.conn.execute(
+                    "DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                    (path,) + _subtree_range(path))
+            self.conn.commit()
+
+    def load_meta(self, key):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def store_meta(self, key, value):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            self.conn.commit()
+
+    def store(self, records):
+        """ذخیره یا به‌روزرسانی رکوردها: [(path, size, mtime, title, artist, album, duration, has_art, added, gain)]
+
+        زمان افزودن یک فایل موجود با به‌روزرسانی آن تغییر نمی‌کند. gain از تگ
+        فایل است (یا None تا بعداً تحلیل شود). اثر انگشت محتوای فایل تغییر
+        کرده پاک می‌شود.
+        """
+        if not records:
+            return
+        with self._lock:
+            self.conn.executemany(
+                "INSERT INTO tracks "
+                "(path, size, mtime, title, artist, album, duration, has_art, added, gain) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, "
+                "mtime = excluded.mtime, title = excluded.title, "
+                "artist = excluded.artist, album = excluded.album, "
+                "duration = excluded.duration, has_art = excluded.has_art, "
+                "gain = excluded.gain, payload = NULL, audio_hash = NULL",
+                records,
+            )
+            self.conn.commit()
+
+    def load_gains(self, folder):
+        """(گین‌های معلوم, مسیرهای بدون گین) آهنگ‌های زیر یک پوشه"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT path, gain FROM tracks WHERE path >= ? AND path < ?",
+                _subtree_range(folder),
+            ).fetchall()
+        return _split_gains(rows)
+
+    def load_path_gains(self, paths):
+        """(گین‌های معلوم, مسیرهای بدون گین) فقط برای مسیرهای داده شده"""
+        rows = []
+        with self._lock:
+            for start in range(0, len(paths), 500):
+                chunk = paths[start:start + 500]
+                rows.extend(self.conn.execute(
+                    f"SELECT path, gain FROM tracks WHERE path IN ({', '.join('?' * len(chunk))})",
+                    chunk).fetchall())
+        return _split_gains(rows)
+
+    def store_gains(self, gains):
+        """ذخیره گین‌های تحلیل شده: [(path, gain)]"""
+        if not gains:
+            return
+        with self._lock:
+            self.conn.executemany("UPDATE tracks SET gain = ? WHERE path = ?",
+                                  [(gain, path) for path, gain in gains])
+            self.conn.commit()
+
+    def load_fingerprints(self, folder):
+        """{path: (duration, payload, audio_hash)} آهنگ‌های زیر یک پوشه"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT path, duration, payload, audio_hash FROM tracks "
+                "WHERE path >= ? AND path < ?",
+                _subtree_range(folder),
+            ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def store_fingerprints(self, fingerprints):
+        """ذخیره حجم صدای خام و hash آن: [(path, payload, audio_hash)]"""
+        if not fingerprints:
+            return
+        with self._lock:
+            self.conn.executemany("UPDATE tracks SET payload = ?, audio_hash = ? WHERE path = ?",
+                                  [(size, digest, path) for path, size, digest in fingerprints])
+            self.conn.commit()
+
+    def remove(self, paths):
+        """حذف رکورد فایل‌هایی که دیگر وجود ندارند"""
+        if not paths:
+            return
+        with self._lock:
+            self.conn.executemany("DELETE FROM tracks WHERE path = ?", [(p,) for p in paths])
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class LibraryScan:
+    """اسکن کامل ریشه‌های کتابخانه و به‌روزرسانی ایندکس (مشترک بین برنامه و ایندکس‌ساز)
+
+    فهرست پوشه‌هایی که زمان تغییرشان با ایندکس یکی است دوباره خوانده نمی‌شود.
+    on_batch برای هر دسته (path, title, artist, album, duration, added) به
+    ترتیب پیمایش صدا زده می‌شود. probe و executor باید با هم سازگار باشند
+    (برای ProcessPoolExecutor یک تابع سطح ماژول مثل probe_file).
+    """
+
+    def __init__(self, roots, library_index, probe, executor=None, cancelled=None,
+                 on_batch=None, batch_size=200, chunksize=1, snapshot_path=None, exclude=()):
+        self.roots = normalize_roots([roots] if isinstance(roots, str) else roots)
+        self.exclude = list(exclude)
+        self.library_index = library_index
+        self.probe = probe
+        self.executor = executor
+        self.cancelled = cancelled or threading.Event()
+        self.on_batch = on_batch
+        self.batch_size = batch_size
+        self.chunksize = chunksize
+        self.snapshot_path = snapshot_path
+        self.tracks = []
+        self.dirs = {}
+        self.parsed = 0
+
+    def run(self):
+        cached, known_dirs = {}, {}
+        for root in self.roots:
+            cached.update(self.library_index.load_folder(root))
+            known_dirs.update(self.library_index.load_dirs(root))
+        cached_by_dir = {}
+        for file_path in cached:
+            cached_by_dir.setdefault(os.path.dirname(file_path), []).append(file_path)
+        # فایل‌های ایندکس با الگوهای حذف اسکن قبلی انتخاب شده‌اند؛ اگر الگوها
+        # عوض شده باشند همه پوشه‌ها دوباره فهرست می‌شوند (فایل‌های بدون تغییر
+        # دوباره خوانده نمی‌شوند)
+        exclude_key = "\n".join(normalize_excludes(self.exclude))
+        unchanged_dirs = known_dirs
+        if self.library_index.load_meta("exclude") != exclude_key:
+            unchanged_dirs = {}
+        
+        batch = []
+        with ThreadPoolExecutor(max_workers=WALK_WORKERS, thread_name_prefix="scandir") as walker:
+            for folder, mtime, files in iter_library_dirs(self.roots, unchanged_dirs,
+                                                          self.cancelled, self.exclude, walker):
+                self.dirs[folder] = mtime
+                if files is None:
+                    # پوشه تغییر نکرده: فهرست فایل‌ها از ایندکس (هر فایل stat می‌شود)
+                    files = sorted(cached_by_dir.get(folder, []), key=os.path.basename)
+                    batch.extend((file_path, True) for file_path in files)
+                else:
+                    batch.extend((file_path, False) for file_path in files)
+                if len(batch) >= self.batch_size:
+                    self.process_batch(batch, cached)
+                    batch = []
+        if batch and not self.cancelled.is_set():
+            self.process_batch(batch, cached)
+        if self.cancelled.is_set():
+            return
+        
+        # فایل‌ها و پوشه‌هایی که دیگر پیدا نشدند از ایندکس حذف می‌شوند
+        self.library_index.remove(list(cached))
+        self.library_index.remove_dirs([d for d in known_dirs if d not in self.dirs])
+        self.library_index.store_dirs(self.dirs)
+        self.library_index.store_meta("exclude", exclude_key)
+        if self.snapshot_path:
+            save_snapshot(self.snapshot_path, self.roots, self.tracks)
+
+    def process_batch(self, items, cached):
+        """خواندن متادیتای یک دسته؛ فقط فایل‌های جدید یا تغییر کرده پردازش می‌شوند"""
+        results, changed = resolve_tracks(items, cached, self.probe, self.executor,
+                                          self.cancelled, self.chunksize)
+        self.library_index.store(changed)
+        if self.cancelled.is_set():
+            return
+        self.parsed += len(changed)
+        self.tracks.extend(results)
+        if self.on_batch is not None:
+            self.on_batch(results)
+
+
+def build_index(roots, jobs=None, db_path=None, snapshot_path=None, report=None, exclude=()):
+    """ساخت یا تازه کردن ایندکس ریشه‌های کتابخانه با چند پردازه (بدون Qt)"""
+    from concurrent.futures import ProcessPoolExecutor
+    library_index = LibraryIndex(db_path)
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            scan = LibraryScan(roots, library_index, probe_file, executor,
+                               on_batch=report, batch_size=INDEX_BATCH_SIZE,
+                               chunksize=INDEX_CHUNK_SIZE, snapshot_path=snapshot_path,
+                               exclude=exclude)
+            scan.run()
+    finally:
+        library_index.close()
+    return scan
+
+
+def index_main(argv=None):
+    """python music_player.py --index <folder> [<folder> ...] --jobs N"""
+    parser = argparse.ArgumentParser(prog="music_player.py",
+                                     description="ساخت ایندکس کتابخانه بدون رابط گرافیکی")
+    parser.add_argument("--index", metavar="FOLDER", nargs="+", required=True,
+                        help="ریشه‌های کتابخانه")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="تعداد پردازه‌ها")
+    parser.add_argument("--exclude", metavar="GLOB", action="append",
+                        help="الگوی حذف (پیش‌فرض: الگوهای تنظیمات برنامه)")
+    parser.add_argument("--db", help="مسیر فایل ایندکس (پیش‌فرض: پوشه داده برنامه)")
+    parser.add_argument("--duplicates", action="store_true",
+                        help="پس از ایندکس، گروه‌های آهنگ تکراری چاپ شوند")
+    args = parser.parse_args(argv)
+    
+    roots = normalize_roots(args.index)
+    missing = [root for root in roots if not os.path.isdir(root)]
+    if missing:
+        print(f"پوشه یافت نشد: {', '.join(missing)}")
+        return 1
+    
+    settings = {}
+    if args.db is None:
+        app_data = get_app_data_dir()
+        try:
+            with open(app_data / "player_settings.json", encoding="utf-8") as f:
+                settings = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if not isinstance(settings, dict):
+            settings = {}
+    exclude = args.exclude if args.exclude is not None else settings.get("exclude_patterns", [])
+    
+    # snapshot فقط وقتی نوشته می‌شود که همین ریشه‌ها، کتابخانه فعلی برنامه باشند
+    snapshot_path = None
+    if settings and normalize_roots(settings_library_roots(settings)) == roots:
+        snapshot_path = str(get_app_data_dir() / SNAPSHOT_FILE)
+    
+    start = time.perf_counter()
+    count = 0
+    
+    def report(results):
+        nonlocal count
+        count += len(results)
+        print(f"\r{count} آهنگ...", end="", flush=True)
+    
+    scan = build_index(roots, args.jobs, args.db, snapshot_path, report, exclude)
+    elapsed = time.perf_counter() - start
+    print(f"\r{len(scan.tracks)} آهنگ در {len(scan.dirs)} پوشه، "
+          f"{scan.parsed} فایل پارس شد ({elapsed:.1f} ثانیه، {args.jobs} پردازه)")
+    if args.duplicates:
+        from duplicates import find_duplicates
+        library_index = LibraryIndex(args.db)
+        try:
+            with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+                groups = find_duplicates(library_index, roots, executor)
+        finally:
+            library_index.close()
+        for group in groups:
+            print()
+            print("\n".join(group))
+        print(f"\n{len(groups)} گروه تکراری")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(index_main())
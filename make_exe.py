@@ -52,6 +52,7 @@ def main():
         "PyQt5.QtGui",
         "PyQt5.QtWidgets",
         "PyQt5.QtMultimedia",
+        "PyQt5.QtNetwork",
         "pygame",
         "pygame.mixer",
         "mutagen",
@@ -62,6 +63,7 @@ def main():
         "mutagen.easyid3",
         "mutagen._util",
         "mutagen._file",
+        "numpy",
     ]
     
     for imp in hidden_imports:
@@ -1,56 +1,1058 @@
 # music_player.py - Simple Music Player (نسخه نهایی با ذخیره تنظیمات)
 import os
 import sys
-import json
+import time
+
+# زمان شروع پردازش برای --startup-benchmark
+STARTUP_TIME = time.perf_counter()
+
+if __name__ == "__main__":
+    # اجرای دوم: فایل‌ها به نمونه در حال اجرا فرستاده می‌شوند، قبل از وارد کردن Qt
+    import single_instance
+    if single_instance.forward(sys.argv[1:]):
+        sys.exit(0)
+
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import compress
 from pathlib import Path
-from PyQt5.QtWidgets import *
-from PyQt5.QtCore import *
-from PyQt5.QtGui import *
-import pygame
-import mutagen
-from mutagen.mp3 import MP3
-from mutagen.flac import FLAC
-from mutagen.wave import WAVE
-from mutagen.id3 import ID3
-from mutagen.easyid3 import EasyID3
+from PyQt5.QtWidgets import (QAbstractItemView, QApplication, QComboBox, QFileDialog,
+                             QFrame, QHBoxLayout, QInputDialog, QLabel, QLineEdit, QListView,
+                             QMainWindow, QMenu, QMessageBox, QPushButton, QShortcut, QSlider,
+                             QVBoxLayout, QWidget)
+from PyQt5.QtCore import (QAbstractListModel, QEvent, QFileSystemWatcher, QModelIndex,
+                          QObject, QRunnable, QStringListModel, QThreadPool, QTimer, Qt,
+                          pyqtSignal)
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+from PyQt5.QtGui import (QBrush, QColor, QFont, QIcon, QImage, QKeySequence, QLinearGradient,
+                         QPainter, QPen, QPixmap)
+from library import (LibraryIndex, LibraryScan, probe_track, probe_file, resolve_tracks,
+                     iter_library_dirs, normalize_roots, get_app_data_dir, compile_excludes,
+                     excluded_below, settings_library_roots, load_snapshot, index_main,
+                     AUDIO_EXTENSIONS, SNAPSHOT_FILE, WALK_WORKERS, is_audio_file, track_sort_key)
+from search_index import SearchIndex
+from browse import BrowseIndex
+from playlists import PlaylistStore, parse_m3u, write_m3u, playlist_name
+from settings_store import SettingsStore
+from tracing import tracer, traced
+from waveform import WaveformCache, compute_peaks, HAVE_NUMPY
+from replaygain import analyze_gain
+from staging import StagingCache, is_remote_path
+from duplicates import find_duplicates
+from play_queue import PlayQueue, REPEAT_OFF, REPEAT_ALL, REPEAT_ONE
+from track_store import TrackStore
+import single_instance
+
+ALBUM_ART_SIZE = 200
+
+# جابجایی‌های پشت سر هم (کشیدن نوار، نگه داشتن کلید) حداکثر یک بار در این بازه
+SEEK_THROTTLE_MS = 150
+
+# بدون رویداد پایان pygame، شروع آهنگ صف شده از برگشتن get_pos تشخیص داده
+# می‌شود؛ عقب‌تر بودن از مقدار انتظار تا این حد فقط لرزش بافر صدا است
+POS_DROP_MS = 250
+
+# بررسی فایل‌های تغییر کرده در جا با بازگشت به پنجره، حداکثر یک بار در این بازه (ثانیه)
+FILE_CHECK_INTERVAL = 60
+
+# کارهای طولانی کل کتابخانه (تحلیل گین، تکراری‌ها، بررسی فایل‌ها) در استخر
+# جدا با این تعداد ترد اجرا می‌شوند تا ساعت‌ها ترد استخر اصلی را نگیرند
+BACKGROUND_THREADS = 2
+
+# حداقل ترد استخر اصلی: اسکن و کپی محلی بیشتر منتظر دیسک و شبکه هستند و
+# کاور و شکل موج باید همیشه ترد آزاد داشته باشند
+INTERACTIVE_THREADS = 4
+
+# تحلیل هم‌زمان بلندی صدا؛ هر کارگر یک آهنگ کامل را دیکد می‌کند
+GAIN_WORKERS = min(4, os.cpu_count() or 1)
+
+# توقف event loop بیشتر از این مقدار در trace ثبت می‌شود
+STALL_THRESHOLD_MS = 100
+
+# pygame (و پیام خوش‌آمد آن) در پس‌زمینه و پس از نمایش پنجره بارگذاری می‌شود
+pygame = None
+
+
+def load_audio_backend():
+    """وارد کردن pygame و راه‌اندازی mixer (در ترد پس‌زمینه صدا زده می‌شود)"""
+    global pygame
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame as module
+    module.mixer.init(frequency=44100, size=-16, channels=2, buffer=2048)
+    pygame = module
+
+
+def _file_arg(self, file_path, *args, **kwargs):
+    """مسیر فایل span برای متدهایی که اولین آرگومانشان مسیر است"""
+    return file_path
+
+
+def _current_file(self, *args, **kwargs):
+    return self.tracks[self.current_index]
+
+
+class PlaybackClock:
+    """موقعیت پخش بر اساس زمان یکنواخت سیستم به‌علاوه نقطه شروع
+
+    برخلاف get_pos پس از play(start=...) یا رسیدن آهنگ صف شده صفر نمی‌شود.
+    """
 
-class MusicPlayer(QMainWindow):
     def __init__(self):
+        self.offset = 0.0
+        self.started = None
+
+    def start(self, offset=0.0):
+        self.offset = offset
+        self.started = time.monotonic()
+
+    def pause(self):
+        self.offset = self.position()
+        self.started = None
+
+    def resume(self):
+        if self.started is None:
+            self.started = time.monotonic()
+
+    def stop(self):
+        self.offset = 0.0
+        self.started = None
+
+    def seek(self, position):
+        """جابجایی بدون تغییر حالت پخش یا مکث"""
+        self.offset = position
+        if self.started is not None:
+            self.started = time.monotonic()
+
+    def position(self):
+        if self.started is None:
+            return self.offset
+        return self.offset + (time.monotonic() - self.started)
+
+
+class ScannerSignals(QObject):
+    """سیگنال‌های اسکنر پس‌زمینه (QRunnable خودش سیگنال ندارد)"""
+    batch_ready = pyqtSignal(int, list)
+    finished = pyqtSignal(int, int, list)
+    changes_ready = pyqtSignal(list, list, list)
+
+
+class LibraryScanner(QRunnable):
+    """اسکن ریشه‌های کتابخانه در پس‌زمینه و ارسال نتایج به صورت دسته‌ای
+
+    هر دسته لیستی از (path, title, artist, album, duration, added) به ترتیب پیمایش است.
+    پوشه‌هایی که زمان تغییرشان با ایندکس یکی است دوباره خوانده نمی‌شوند.
+    """
+
+    BATCH_SIZE = 200
+    PARSE_WORKERS = 4
+
+    def __init__(self, generation, roots, library_index, probe, snapshot_path=None, exclude=()):
+        super().__init__()
+        self.generation = generation
+        self.roots = roots
+        self.exclude = exclude
+        self.library_index = library_index
+        self.probe = probe
+        self.snapshot_path = snapshot_path
+        self.cancelled = threading.Event()
+        self.signals = ScannerSignals()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        with tracer.span("scan", os.pathsep.join(self.roots)):
+            self.scan()
+
+    def scan(self):
+        emit_batch = lambda results: self.signals.batch_ready.emit(self.generation, results)
+        scan = LibraryScan(self.roots, self.library_index, self.probe,
+                           cancelled=self.cancelled, on_batch=emit_batch,
+                           batch_size=self.BATCH_SIZE, snapshot_path=self.snapshot_path,
+                           exclude=self.exclude)
+        try:
+            with ThreadPoolExecutor(max_workers=self.PARSE_WORKERS) as executor:
+                scan.executor = executor
+                scan.run()
+        except Exception as e:
+            print(f"خطا در اسکن کتابخانه: {e}")
+        finally:
+            if not self.cancelled.is_set():
+                self.signals.finished.emit(self.generation, len(scan.tracks), list(scan.dirs))
+
+
+class DirectoryUpdater(QRunnable):
+    """اعمال تغییرات چند پوشه (از QFileSystemWatcher) بدون اسکن کامل
+
+    خروجی: تغییر یا اضافه شده‌ها (path, title, artist, album, duration, added)،
+    مسیرهای حذف شده و پوشه‌های جدید برای اضافه کردن به watcher.
+    """
+
+    def __init__(self, folders, library_index, probe, exclude=()):
+        super().__init__()
+        self.folders = folders
+        self.library_index = library_index
+        self.probe = probe
+        self.exclude = exclude
+        self.signals = ScannerSignals()
+
+    def run(self):
+        updated, removed, new_dirs = [], [], []
+        excluded = compile_excludes(self.exclude)
+        try:
+            for folder in self.folders:
+                cached = self.library_index.load_folder(folder)
+                if not os.path.isdir(folder):
+                    removed.extend(cached)
+                    self.library_index.remove(list(cached))
+                    self.library_index.remove_dirs([folder])
+                    continue
+                
+                known_dirs = self.library_index.load_dirs(folder)
+                known_dirs.pop(folder, None)
+                dirs, listed, items = {}, set(), []
+                for current, mtime, files in iter_library_dirs(folder, known_dirs,
+                                                               exclude=self.exclude):
+                    dirs[current] = mtime
+                    if files is not None:
+                        listed.add(current)
+                        items.extend((file_path, False) for file_path in files)
+                        if current != folder and current not in known_dirs:
+                            new_dirs.append(current)
+                
+                present = {file_path for file_path, _ in items}
+                results, changed = resolve_tracks(items, dict(cached), self.probe)
+                changed_paths = {record[0] for record in changed}
+                updated.extend(r for r in results if r[0] in changed_paths)
+                gone = [p for p in cached if p not in present and
+                        (os.path.dirname(p) in listed or os.path.dirname(p) not in dirs
+                         or excluded_below(excluded, p, folder))]
+                removed.extend(gone)
+                
+                self.library_index.store(changed)
+                self.library_index.remove(gone)
+                self.library_index.remove_dirs([d for d in known_dirs if d not in dirs])
+                self.library_index.store_dirs(dirs)
+        except Exception as e:
+            print(f"خطا در به‌روزرسانی کتابخانه: {e}")
+        self.signals.changes_ready.emit(updated, removed, new_dirs)
+
+
+class FileChecker(QRunnable):
+    """بررسی حجم و زمان تغییر همه فایل‌های ایندکس شده بدون خواندن پوشه‌ها
+
+    ویرایش تگ در جا زمان تغییر پوشه را عوض نمی‌کند و QFileSystemWatcher فقط
+    پوشه‌ها را می‌پاید؛ این بررسی با بازگشت به پنجره چنین تغییراتی را پیدا می‌کند.
+    """
+
+    def __init__(self, roots, library_index, probe, exclude=()):
+        super().__init__()
+        self.roots = roots
+        self.library_index = library_index
+        self.probe = probe
+        self.exclude = exclude
+        self.cancelled = threading.Event()
+        self.signals = ScannerSignals()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        updated, removed = [], []
+        excluded = compile_excludes(self.exclude)
+        try:
+            for root in self.roots:
+                cached = self.library_index.load_folder(root)
+                # فایل‌هایی که حالا با الگوهای حذف مطابقت دارند مثل فایل حذف شده‌اند
+                items = [(file_path, True) for file_path in cached
+                         if not excluded_below(excluded, file_path, root)]
+                gone = dict(cached)
+                results, changed = resolve_tracks(items, gone, self.probe,
+                                                  cancelled=self.cancelled)
+                if self.cancelled.is_set():
+                    return
+                changed_paths = {record[0] for record in changed}
+                updated.extend(r for r in results if r[0] in changed_paths)
+                removed.extend(gone)
+                self.library_index.store(changed)
+                self.library_index.remove(list(gone))
+        except Exception as e:
+            print(f"خطا در بررسی فایل‌های کتابخانه: {e}")
+        if not self.cancelled.is_set():
+            self.signals.changes_ready.emit(updated, removed, [])
+
+
+class AlbumArtCache:
+    """کش کاورها: LRU در حافظه با سقف حجم + تصاویر کوچک آماده روی دیسک
+
+    کلید حافظه مسیر فایل است؛ کلید دیسک از مسیر، حجم و زمان تغییر ساخته
+    می‌شود تا با تغییر فایل، کاور قدیمی استفاده نشود.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, folder=None):
+        self.max_bytes = max_bytes
+        self.images = OrderedDict()
+        self.total_bytes = 0
+        self.folder = folder or (get_app_data_dir() / "art_cache")
+        self.folder.mkdir(exist_ok=True)
+
+    def get(self, file_path):
+        """QImage آماده (یا QImage خالی برای فایل بدون کاور) یا None"""
+        image = self.images.get(file_path)
+        if image is not None:
+            self.images.move_to_end(file_path)
+        return image
+
+    def put(self, file_path, image):
+        self.discard(file_path)
+        self.images[file_path] = image
+        self.total_bytes += image.byteCount()
+        while self.total_bytes > self.max_bytes and len(self.images) > 1:
+            _, old = self.images.popitem(last=False)
+            self.total_bytes -= old.byteCount()
+
+    def discard(self, file_path):
+        old = self.images.pop(file_path, None)
+        if old is not None:
+            self.total_bytes -= old.byteCount()
+
+    def disk_path(self, file_path):
+        """مسیر تصویر کوچک روی دیسک (در ترد کارگر صدا زده می‌شود)"""
+        try:
+            st = os.stat(file_path)
+            identity = f"{file_path}|{st.st_size}|{st.st_mtime}"
+        except OSError:
+            return None
+        digest = hashlib.sha1(identity.encode("utf-8", "surrogatepass")).hexdigest()
+        return str(self.folder / f"{digest}.jpg")
+
+
+class AlbumArtSignals(QObject):
+    loaded = pyqtSignal(int, str, QImage)
+
+
+class AlbumArtLoader(QRunnable):
+    """دیکد و کوچک کردن کاور در پس‌زمینه
+
+    QImage برخلاف QPixmap در تردهای دیگر قابل استفاده است.
+    """
+
+    def __init__(self, request_id, file_path, cache):
+        super().__init__()
+        self.request_id = request_id
+        self.file_path = file_path
+        self.cache = cache
+        self.signals = AlbumArtSignals()
+
+    @traced("album art decode", lambda self: self.file_path)
+    def run(self):
+        image = QImage()
+        try:
+            thumb_path = self.cache.disk_path(self.file_path)
+            if thumb_path and os.path.exists(thumb_path):
+                image = QImage(thumb_path)
+            else:
+                art_data = probe_track(self.file_path, with_art=True).art
+                if art_data:
+                    image = QImage.fromData(art_data)
+                    if not image.isNull():
+                        image = image.scaled(ALBUM_ART_SIZE, ALBUM_ART_SIZE,
+                                             Qt.KeepAspectRatioByExpanding,
+                                             Qt.SmoothTransformation)
+                        if thumb_path:
+                            image.save(thumb_path, "JPG", 90)
+        except Exception as e:
+            print(f"خطا در بارگذاری کاور: {e}")
+        self.signals.loaded.emit(self.request_id, self.file_path, image)
+
+
+class GainSignals(QObject):
+    gains_loaded = pyqtSignal(list, list, bool)
+    gains_ready = pyqtSignal(list)
+
+
+class GainLoader(QRunnable):
+    """خواندن گین‌های ایندکس: همه آهنگ‌های ریشه‌ها پس از اسکن، یا فقط paths
+
+    خروجی: (path, gain) رکوردها (None برای آهنگ بدون گین)، مسیرهای بدون گین
+    و اینکه بارگذاری کامل بوده است یا نه.
+    """
+
+    def __init__(self, library_index, roots=None, paths=None):
+        super().__init__()
+        self.library_index = library_index
+        self.roots = roots
+        self.paths = paths
+        self.signals = GainSignals()
+
+    def run(self):
+        gains, missing = {}, []
+        try:
+            if self.roots is not None:
+                for root in self.roots:
+                    root_gains, root_missing = self.library_index.load_gains(root)
+                    gains.update(root_gains)
+                    missing.extend(root_missing)
+            else:
+                gains, missing = self.library_index.load_path_gains(self.paths)
+        except Exception as e:
+            print(f"خطا در بارگذاری گین‌ها: {e}")
+            return
+        records = list(gains.items()) + [(file_path, None) for file_path in missing]
+        self.signals.gains_loaded.emit(records, missing, self.roots is not None)
+
+
+class GainAnalyzer(QRunnable):
+    """تحلیل بلندی آهنگ‌های بدون تگ ReplayGain در پس‌زمینه و ذخیره در ایندکس
+
+    فایل‌هایی که قابل تحلیل نیستند گین صفر می‌گیرند تا دوباره تحلیل نشوند.
+    مسیرهای تازه با add به همین تحلیل اضافه می‌شوند؛ وقتی صف خالی شود کار
+    تمام می‌شود و برای مسیرهای بعدی نمونه جدید لازم است.
+    """
+
+    BATCH_SIZE = 16
+
+    def __init__(self, paths, library_index):
+        super().__init__()
+        self.library_index = library_index
+        self.lock = threading.Lock()
+        self.pending = deque()
+        # مسیرهای منتظر یا در حال تحلیل، تا دوباره به صف نیایند
+        self.queued = set()
+        self.finished = False
+        self.cancelled = threading.Event()
+        self.signals = GainSignals()
+        self.add(paths)
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def add(self, paths):
+        """افزودن به صف؛ False یعنی تحلیل تمام شده است"""
+        with self.lock:
+            if self.finished:
+                return False
+            for file_path in paths:
+                if file_path not in self.queued:
+                    self.queued.add(file_path)
+                    self.pending.append(file_path)
+            return True
+
+    def clear(self):
+        """حذف مسیرهای منتظر (پس از اسکن کامل فهرست تازه جای آن‌ها را می‌گیرد)"""
+        with self.lock:
+            self.queued.difference_update(self.pending)
+            self.pending.clear()
+
+    def take(self):
+        with self.lock:
+            count = min(self.BATCH_SIZE, len(self.pending))
+            batch = [self.pending.popleft() for _ in range(count)]
+            if not batch:
+                self.finished = True
+            return batch
+
+    def analyze(self, file_path):
+        if self.cancelled.is_set():
+            return None
+        with tracer.span("replaygain analysis", file_path):
+            return analyze_gain(file_path, self.cancelled)
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=GAIN_WORKERS,
+                                thread_name_prefix="replaygain") as executor:
+            while not self.cancelled.is_set():
+                paths = self.take()
+                if not paths:
+                    break
+                gains = list(executor.map(self.analyze, paths))
+                if self.cancelled.is_set():
+                    break
+                self.flush([(file_path, round(gain, 2) if gain is not None else 0.0)
+                            for file_path, gain in zip(paths, gains)])
+                with self.lock:
+                    self.queued.difference_update(paths)
+        with self.lock:
+            self.finished = True
+
+    def flush(self, batch):
+        self.library_index.store_gains(batch)
+        self.signals.gains_ready.emit(batch)
+
+
+class StagingSignals(QObject):
+    staged = pyqtSignal(str, str)
+
+
+class StagingWorker(QRunnable):
+    """کپی محلی آهنگ فعلی و چند آهنگ بعدی به ترتیب پخش"""
+
+    def __init__(self, paths, cache):
+        super().__init__()
+        self.paths = paths
+        self.cache = cache
+        self.cancelled = threading.Event()
+        self.signals = StagingSignals()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        for file_path in self.paths:
+            if self.cancelled.is_set():
+                return
+            if self.cache.get(file_path) is not None:
+                # از قبل محلی است و playback_path همان را داده است
+                continue
+            with tracer.span("stage track", file_path):
+                local_path = self.cache.stage(file_path, self.cancelled)
+            if local_path is not None:
+                self.signals.staged.emit(file_path, local_path)
+
+
+class DuplicateSignals(QObject):
+    finished = pyqtSignal(list)
+
+
+class DuplicateFinder(QRunnable):
+    """یافتن آهنگ‌های تکراری در پس‌زمینه؛ hash فایل‌ها با چند ترد خوانده می‌شود"""
+
+    def __init__(self, roots, library_index):
+        super().__init__()
+        self.roots = roots
+        self.library_index = library_index
+        self.cancelled = threading.Event()
+        self.signals = DuplicateSignals()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    @traced("find duplicates")
+    def run(self):
+        try:
+            with ThreadPoolExecutor(max_workers=WALK_WORKERS,
+                                    thread_name_prefix="hash") as executor:
+                groups = find_duplicates(self.library_index, self.roots, executor,
+                                         self.cancelled)
+        except Exception as e:
+            print(f"خطا در یافتن آهنگ‌های تکراری: {e}")
+            groups = []
+        if not self.cancelled.is_set():
+            self.signals.finished.emit(groups)
+
+
+class OpenSignals(QObject):
+    opened = pyqtSignal(list, bool)
+
+
+class FileOpener(QRunnable):
+    """خواندن فایل‌ها و پوشه‌هایی که از خط فرمان یا اجرای دوم برنامه باز شده‌اند
+
+    پوشه‌ها با همان ترتیب لیست پخش باز می‌شوند؛ نتیجه مثل ردیف‌های اسکنر
+    (path, title, artist, album, duration, added) به ترتیب آرگومان‌ها است.
+    """
+
+    def __init__(self, paths, enqueue, probe):
+        super().__init__()
+        self.paths = paths
+        self.enqueue = enqueue
+        self.probe = probe
+        self.signals = OpenSignals()
+
+    def run(self):
+        tracks = []
+        now = time.time()
+        for file_path in self.expand():
+            try:
+                title, artist, album, duration, _, _ = self.probe(file_path)
+            except Exception as e:
+                print(f"خطا در خواندن {file_path}: {e}")
+                continue
+            tracks.append((file_path, title, artist, album, duration, now))
+        self.signals.opened.emit(tracks, self.enqueue)
+
+    def expand(self):
+        for path in self.paths:
+            if os.path.isdir(path):
+                found = [os.path.join(folder, name)
+                         for folder, _, names in os.walk(path)
+                         for name in names if is_audio_file(name)]
+                yield from sorted(found, key=track_sort_key)
+            elif os.path.isfile(path) and is_audio_file(path):
+                yield path
+
+
+class InstanceServer(QObject):
+    """گوش دادن به اجراهای بعدی برنامه (single_instance.forward)"""
+
+    files_received = pyqtSignal(list, bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.on_new_connection)
+        self.buffers = {}
+
+    def listen(self):
+        name = single_instance.server_name()
+        if self.server.listen(name):
+            return True
+        probe = QLocalSocket()
+        probe.connectToServer(name)
+        if probe.waitForConnected(200):
+            # نمونه دیگری (مثلاً با --trace) در حال اجراست؛ سوکت آن دست نمی‌خورد
+            probe.abort()
+            return False
+        # فایل سوکت از اجرای قبلی که درست بسته نشده مانده است
+        QLocalServer.removeServer(name)
+        return self.server.listen(name)
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self.buffers[socket] = b""
+            socket.readyRead.connect(lambda s=socket: self.on_ready_read(s))
+            socket.disconnected.connect(lambda s=socket: self.on_disconnected(s))
+
+    def on_ready_read(self, socket):
+        data = self.buffers.get(socket, b"") + bytes(socket.readAll())
+        if single_instance.END not in data:
+            self.buffers[socket] = data
+            return
+        self.buffers.pop(socket, None)
+        socket.disconnectFromServer()
+        message = single_instance.decode_message(data)
+        if message is not None:
+            self.files_received.emit(*message)
+
+    def on_disconnected(self, socket):
+        self.buffers.pop(socket, None)
+        socket.deleteLater()
+
+
+class WaveformSignals(QObject):
+    loaded = pyqtSignal(int, str, object)
+
+
+class WaveformLoader(QRunnable):
+    """محاسبه پیک‌های شکل موج در پس‌زمینه؛ با شروع آهنگ دیگر لغو می‌شود"""
+
+    def __init__(self, request_id, file_path, cache):
+        super().__init__()
+        self.request_id = request_id
+        self.file_path = file_path
+        self.cache = cache
+        self.cancelled = threading.Event()
+        self.signals = WaveformSignals()
+
+    @traced("waveform peaks", lambda self: self.file_path)
+    def run(self):
+        if self.cancelled.is_set():
+            return
+        try:
+            peaks = compute_peaks(self.file_path, cancelled=self.cancelled)
+        except Exception as e:
+            print(f"خطا در محاسبه شکل موج: {e}")
+            return
+        if peaks is None:
+            return
+        self.cache.store(self.file_path, peaks)
+        self.signals.loaded.emit(self.request_id, self.file_path, peaks)
+
+
+class WaveformSlider(QSlider):
+    """نوار پیشرفت با شکل موج آهنگ؛ بدون پیک‌ها همان QSlider معمولی است
+
+    شکل موج یک بار برای هر اندازه در دو pixmap (پخش شده و نشده) رسم می‌شود
+    و هر به‌روزرسانی پیشرفت فقط دو drawPixmap و یک دایره است.
+    """
+
+    HANDLE_RADIUS = 7
+
+    def __init__(self, orientation, parent=None):
+        super().__init__(orientation, parent)
+        self.setMinimumHeight(36)
+        self.peaks = None
+        self.pixmaps = None
+
+    def set_peaks(self, peaks):
+        self.peaks = peaks
+        self.pixmaps = None
+        self.update()
+
+    def resizeEvent(self, event):
+        self.pixmaps = None
+        super().resizeEvent(event)
+
+    def render_pixmaps(self):
+        import numpy as np
+        margin = self.HANDLE_RADIUS
+        width, height = max(self.width() - 2 * margin, 1), self.height()
+        mins, maxs = self.peaks
+        # هر ستون پیکسل بیشترین دامنه بازه خود را نشان می‌دهد
+        starts = np.arange(width) * len(maxs) // width
+        low = np.minimum.reduceat(mins.astype(np.int16), starts)
+        high = np.maximum.reduceat(maxs.astype(np.int16), starts)
+        loudest = max(int(high.max()), -int(low.min()), 1)
+        middle = height / 2
+        scale = (height / 2 - 2) / loudest
+        ys_top = middle - np.maximum(high, 1) * scale
+        ys_bottom = middle - np.minimum(low, -1) * scale
+
+        gradient = QLinearGradient(margin, 0, margin + width, 0)
+        gradient.setColorAt(0, QColor("#667eea"))
+        gradient.setColorAt(1, QColor("#764ba2"))
+        pixmaps = []
+        for brush in (QBrush(QColor(80, 80, 80, 153)), QBrush(gradient)):
+            pixmap = QPixmap(self.size())
+            pixmap.fill(Qt.transparent)
+            painter = QPainter(pixmap)
+            painter.setPen(QPen(brush, 1))
+            for x, top, bottom in zip(range(margin, margin + width), ys_top.tolist(),
+                                      ys_bottom.tolist()):
+                painter.drawLine(x, int(top), x, int(bottom))
+            painter.end()
+            pixmaps.append(pixmap)
+        self.pixmaps = pixmaps
+
+    def paintEvent(self, event):
+        if self.peaks is None:
+            super().paintEvent(event)
+            return
+        if self.pixmaps is None or self.pixmaps[0].size() != self.size():
+            self.render_pixmaps()
+        margin = self.HANDLE_RADIUS
+        span = max(self.maximum() - self.minimum(), 1)
+        x = margin + (self.width() - 2 * margin) * (self.value() - self.minimum()) // span
+        unplayed, played = self.pixmaps
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.drawPixmap(0, 0, unplayed)
+        painter.drawPixmap(0, 0, played, 0, 0, x, self.height())
+        painter.setPen(QPen(QColor("#667eea"), 3))
+        painter.setBrush(QColor("white"))
+        radius = self.HANDLE_RADIUS
+        painter.drawEllipse(x - radius, self.height() // 2 - radius, 2 * radius, 2 * radius)
+        painter.end()
+
+
+class SongListModel(QAbstractListModel):
+    """مدل لیست پخش روی TrackStore؛ متن هر ردیف فقط هنگام نمایش ساخته می‌شود
+
+    با جستجو یا مرتب‌سازی، visible لیست ردیف‌های نمایش داده شده به ترتیب
+    نمایش است و خود store دست نمی‌خورد. تغییرات store از طریق همین مدل
+    انجام می‌شود و شناسه آهنگ‌ها را برمی‌گرداند.
+    """
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.visible = None
+        self.view_pos = None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.store) if self.visible is None else len(self.visible)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        row = self.source_row(index.row())
+        store = self.store
+        minutes, secs = divmod(int(max(store.durations[row], 0)), 60)
+        return f"{store.title(row)} - {store.artist_name(row)}  [{minutes:02d}:{secs:02d}]"
+
+    def source_row(self, view_row):
+        return view_row if self.visible is None else self.visible[view_row]
+
+    def view_row(self, row):
+        """ردیف نمایشی یک ردیف اصلی، یا -1 اگر نمایش داده نشود"""
+        if self.visible is None:
+            return row
+        if self.view_pos is None:
+            self.view_pos = [-1] * len(self.store)
+            for position, source in enumerate(self.visible):
+                self.view_pos[source] = position
+        return self.view_pos[row] if 0 <= row < len(self.view_pos) else -1
+
+    def set_filter(self, rows):
+        """نمایش فقط ردیف‌های داده شده به همان ترتیب؛ None یعنی همه ردیف‌ها"""
+        self.beginResetModel()
+        self.visible = rows
+        self.view_pos = None
+        self.endResetModel()
+
+    # وقتی فیلتر فعال است، تغییرات ردیف‌ها بی‌صدا اعمال می‌شوند و
+    # فراخواننده پس از آن فیلتر را دوباره اعمال می‌کند.
+
+    def append_rows(self, tracks):
+        """افزودن (path, title, artist, album, duration) ها؛ لیست شناسه‌ها"""
+        if not tracks:
+            return []
+        if self.visible is not None:
+            return [self.store.append(*track) for track in tracks]
+        start = len(self.store)
+        self.beginInsertRows(QModelIndex(), start, start + len(tracks) - 1)
+        ids = [self.store.append(*track) for track in tracks]
+        self.endInsertRows()
+        return ids
+
+    def insert_row(self, row, *track):
+        if self.visible is not None:
+            return self.store.insert(row, *track)
+        self.beginInsertRows(QModelIndex(), row, row)
+        track_id = self.store.insert(row, *track)
+        self.endInsertRows()
+        return track_id
+
+    def remove_row(self, row):
+        if self.visible is not None:
+            return self.store.delete(row)
+        self.beginRemoveRows(QModelIndex(), row, row)
+        track_id = self.store.delete(row)
+        self.endRemoveRows()
+        return track_id
+
+    def update_row(self, row, *values):
+        track_id = self.store.update(row, *values)
+        view_row = self.view_row(row)
+        if view_row >= 0:
+            index = self.index(view_row)
+            self.dataChanged.emit(index, index)
+        return track_id
+
+    def clear(self):
+        self.beginResetModel()
+        self.store.clear()
+        self.visible = None
+        self.endResetModel()
+
+
+class ViewPaths:
+    """مسیر آهنگ‌ها به ترتیب نمای فعلی لیست پخش، بدون ساختن لیست جدا"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def __len__(self):
+        return self.model.rowCount()
+
+    def __getitem__(self, position):
+        return self.model.store[self.model.source_row(position)]
+
+
+class StallDetector(QObject):
+    """تشخیص توقف event loop: تایمر منظمی که دیرتر از موعد اجرا شود"""
+
+    INTERVAL = 50
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.last = 0
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(self.INTERVAL)
+        self.timer.timeout.connect(self.tick)
+
+    def start(self):
+        self.last = time.perf_counter_ns()
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def tick(self):
+        now = time.perf_counter_ns()
+        expected = self.last + self.INTERVAL * 1_000_000
+        if now - expected >= STALL_THRESHOLD_MS * 1_000_000:
+            tracer.record_stall(expected, now)
+        self.last = now
+
+
+class PerfOverlay(QLabel):
+    """نمایش آخرین عملیات کند و توقف‌های event loop روی پنجره (Ctrl+Shift+P)"""
+
+    LINES = 12
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setStyleSheet("background: rgba(0, 0, 0, 190); color: #66ff99; "
+                           "font-family: monospace; font-size: 11px; padding: 6px; "
+                           "border-radius: 6px;")
+        self.timer = QTimer(self)
+        self.timer.setInterval(500)
+        self.timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def start(self):
+        self.refresh()
+        self.show()
+        self.raise_()
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+        self.hide()
+
+    def refresh(self):
+        lines = [f"کند (≥{tracer.slow_ms} ms) و توقف‌ها:"]
+        for name, _, duration, _, path in reversed(list(tracer.slow)[-self.LINES:]):
+            label = f"{name}  {os.path.basename(path)}" if path else name
+            lines.append(f"{duration / 1_000_000:8.1f} ms  {label}")
+        if len(lines) == 1:
+            lines.append("  —")
+        self.setText("\n".join(lines))
+        self.adjustSize()
+        self.move(10, 10)
+
+
+class MusicPlayer(QMainWindow):
+    audio_ready = pyqtSignal(bool)
+
+    def __init__(self, startup_benchmark=False, trace_file=None):
         super().__init__()
         
+        # راه‌اندازی صدا پس از اولین نمایش پنجره انجام می‌شود
+        self.mixer_ready = False
+        self.end_events = False
+        self.play_when_ready = False
+        self.startup_pending = True
+        self.startup_benchmark = startup_benchmark
+        self.first_scan_done = False
+        self.first_paint_time = None
+        self.audio_ready.connect(self.on_audio_ready)
+        
+        # trace: با --trace از ابتدا فعال و هنگام بستن ذخیره می‌شود
+        self.trace_file = trace_file
+        self.stall_detector = StallDetector(self)
+        if tracer.enabled:
+            self.stall_detector.start()
+        
         # مسیر فایل تنظیمات
         self.settings_file = self.get_settings_path("player_settings.json")
-        self.settings = self.load_settings()
+        self.settings = SettingsStore(self.settings_file)
+        
+        # ایندکس پایدار کتابخانه (کش متادیتا)
+        self.library_index = LibraryIndex()
         
         # مسیر امن برای آیکون
         icon_path = self.get_resource_path("icon.ico")
         self.icon = QIcon(icon_path)
         self.setWindowIcon(self.icon)
         
-        # اول custom_music_folder را تعریف کنیم
-        self.custom_music_folder = self.settings.get("last_folder", "")
+        # ریشه‌های کتابخانه (last_folder نسخه‌های قبلی به لیست تبدیل می‌شود)
+        self.library_roots = settings_library_roots(self.settings)
+        self.exclude_patterns = self.settings.get("exclude_patterns", [])
         
+        # همه آهنگ‌های لیست پخش (مسیر، متادیتا و گین) در یک store ستونی
+        self.tracks = TrackStore()
         self.init_ui()
-        self.init_pygame()
-        self.music_files = []
         self.current_index = -1
         self.is_playing = False
         self.is_paused = False
-        self.volume = 0.7
-        self.song_durations = {}
         self.current_position = 0
         self.total_duration = 0
         self.seeking = False
+        # جابجایی throttle شده و فایلی که set_pos برایش کار نکرد (فقط با load)
+        self.seek_target = None
+        self.seek_reload_file = None
+        self.seek_timer = QTimer(self)
+        self.seek_timer.setSingleShot(True)
+        self.seek_timer.setInterval(SEEK_THROTTLE_MS)
+        self.seek_timer.timeout.connect(self.on_seek_timer)
+        self.scanner = None
+        self.scan_generation = 0
+        self.art_cache = AlbumArtCache()
+        self.art_request = 0
+        # شکل موج نوار پیشرفت (فقط اگر numpy نصب باشد)
+        self.waveform_cache = WaveformCache(get_app_data_dir() / "waveforms") if HAVE_NUMPY else None
+        self.waveform_request = 0
+        self.waveform_loader = None
+        
+        # ایندکس جستجو بر اساس شناسه آهنگ‌های TrackStore
+        self.search_index = SearchIndex()
+        # کلیدهای گروه‌بندی و مرتب‌سازی نمای کتابخانه (بر اساس همان شناسه‌ها)
+        self.browse = BrowseIndex()
+        self.view_timer = QTimer(self)
+        self.view_timer.setSingleShot(True)
+        self.view_timer.setInterval(300)
+        self.view_timer.timeout.connect(self.refresh_view)
+        
+        # لیست‌های پخش ذخیره شده؛ مسیرها با نگاشت مسیر → شناسه آهنگ حل می‌شوند
+        self.playlists = PlaylistStore(get_app_data_dir() / "playlists")
+        self.playlist_ids = {}
+        self.path_ids = None
+        
+        # پخش بدون فاصله: آهنگ بعدی از قبل در صف pygame قرار می‌گیرد
+        self.gapless = self.settings.get("gapless", True)
+        self.queued_file = None
+        # (get_pos, موقعیت clock) آخرین نمونه، برای تشخیص شروع آهنگ صف شده
+        self.music_pos_mark = (0, 0.0)
+        
+        # ترتیب پخش (shuffle، تکرار، صف کاربر و تاریخچه) روی نمای فعلی
+        self.play_queue = PlayQueue(ViewPaths(self.song_model))
+        self.play_queue.restore(self.settings.get("play_queue"))
+        self.update_order_buttons()
+        
+        # کپی محلی آهنگ‌های درایو شبکه: auto فقط مسیرهای شبکه، always همه، off خاموش
+        self.staging_mode = self.settings.get("staging", "auto")
+        self.staging_ahead = self.settings.get("staging_ahead", 3)
+        self.staging = None
+        if self.staging_mode != "off":
+            max_bytes = self.settings.get("staging_max_mb", 2048) * 1024 * 1024
+            self.staging = StagingCache(get_app_data_dir() / "staging", max_bytes)
+        self.staging_worker = None
+        
+        # آهنگ‌های تکراری: گروه‌ها (label, ids) و شناسه‌های پنهان از ترتیب پخش
+        self.hide_duplicates = self.settings.get("hide_duplicates", False)
+        self.duplicate_groups = None
+        self.hidden_ids = set()
+        self.duplicate_finder = None
         
-        # بارگذاری موسیقی
-        self.load_music_files()
+        # یکسان‌سازی بلندی صدا: گین هر آهنگ از ایندکس (تگ یا تحلیل قبلی)
+        self.replay_gain = self.settings.get("replay_gain", True)
+        self.missing_gains = []
+        self.gain_analyzer = None
+        self.background_pool = QThreadPool(self)
+        self.background_pool.setMaxThreadCount(BACKGROUND_THREADS)
+        pool = QThreadPool.globalInstance()
+        pool.setMaxThreadCount(max(pool.maxThreadCount(), INTERACTIVE_THREADS))
+        self.clock = PlaybackClock()
         
-        # بازیابی آخرین ترانه
-        last_song = self.settings.get("last_song", "")
-        if last_song and os.path.exists(last_song) and last_song in self.music_files:
-            self.current_index = self.music_files.index(last_song)
-            last_position = self.settings.get("last_position", 0)
-            self.current_position = last_position
+        # حالت watcher: تغییرات پوشه‌ها بدون اسکن کامل اعمال می‌شوند
+        self.watch_enabled = self.settings.get("watch_folder", True)
+        self.folder_watcher = QFileSystemWatcher(self)
+        self.folder_watcher.directoryChanged.connect(self.on_directory_changed)
+        self.folder_watcher.fileChanged.connect(self.on_file_changed)
+        self.changed_dirs = set()
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setSingleShot(True)
+        self.watch_timer.setInterval(1000)
+        self.watch_timer.timeout.connect(self.apply_directory_changes)
+        self.file_checker = None
+        self.last_file_check = time.monotonic()
+        
+        # آخرین ترانه وقتی در نتایج اسکن پیدا شود بازیابی می‌شود
+        self.restore_song = self.settings.get("last_song", "")
+        self.resume_file = None
+        self.resume_position = 0
+        
+        # لیست پخش جلسه قبل بلافاصله نمایش داده می‌شود؛ اسکن بعداً آن را تطبیق می‌دهد
+        self.snapshot_path = str(get_app_data_dir() / SNAPSHOT_FILE)
+        self.reconciling = False
+        self.pending_tracks = []
+        self.snapshot_tracks = []
+        self.load_session_snapshot()
+        # فایل‌های خط فرمان و اجراهای بعدی برنامه (open_paths) پس از اسکن باز می‌شوند
+        self.open_requests = []
+        
+        # اگر پنجره هیچ‌وقت رسم نشود (مثلاً مینیمایز)، راه‌اندازی باز هم انجام شود
+        QTimer.singleShot(500, self.finish_startup)
     
     def get_settings_path(self, filename):
         """مسیر فایل تنظیمات در پوشه کاربر"""
@@ -58,29 +1060,26 @@ class MusicPlayer(QMainWindow):
         app_data.mkdir(exist_ok=True)
         return str(app_data / filename)
     
-    def load_settings(self):
-        """بارگذاری تنظیمات از فایل"""
-        try:
-            if os.path.exists(self.settings_file):
-                with open(self.settings_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except:
-            pass
-        return {}
-    
+    @traced("save_settings")
     def save_settings(self):
-        """ذخیره تنظیمات در فایل"""
-        try:
-            settings = {
-                "last_folder": self.custom_music_folder,
-                "last_song": self.music_files[self.current_index] if 0 <= self.current_index < len(self.music_files) else "",
-                "last_position": self.current_position if self.is_playing else 0,
-                "volume": int(self.volume * 100)  # ذخیره به صورت عدد صحیح
-            }
-            with open(self.settings_file, 'w', encoding='utf-8') as f:
-                json.dump(settings, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"خطا در ذخیره تنظیمات: {e}")
+        """ثبت تنظیمات؛ نوشتن روی دیسک با تأخیر و در پس‌زمینه انجام می‌شود"""
+        has_song = 0 <= self.current_index < len(self.tracks)
+        if has_song and (self.is_playing or self.is_paused):
+            # موقعیت واقعی پخش، چه در حال پخش و چه مکث شده
+            self.current_position = self.clock.position()
+        self.settings.update({
+            "library_roots": self.library_roots,
+            "exclude_patterns": self.exclude_patterns,
+            "last_song": self.tracks[self.current_index] if has_song else self.restore_song,
+            "last_position": round(self.current_position, 1) if has_song else 0,
+            "volume": int(self.volume * 100),  # ذخیره به صورت عدد صحیح
+            "watch_folder": self.watch_enabled,
+            "gapless": self.gapless,
+            "replay_gain": self.replay_gain,
+            "staging": self.staging_mode,
+            "hide_duplicates": self.hide_duplicates,
+            "play_queue": self.play_queue.state()
+        })
         
     def get_resource_path(self, relative_path):
         """برای پشتیبانی از PyInstaller (exe) و اجرای عادی"""
@@ -105,29 +1104,36 @@ class MusicPlayer(QMainWindow):
                 color: #e0e0e0;
                 font-family: 'Segoe UI', sans-serif;
             }
-            QListWidget {
+            QListView {
                 background-color: rgba(30, 30, 30, 180);
                 border: none;
                 border-radius: 12px;
                 padding: 8px;
                 font-size: 14px;
                 color: #d0d0d0;
+                selection-background-color: #6a5acd;
+                selection-color: white;
             }
-            QListWidget::item {
-                padding: 12px 10px;
-                border-bottom: 1px solid rgba(80, 80, 80, 0.3);
+            QListView::item {
+                padding: 10px;
+            }
+            QLineEdit {
+                background-color: rgba(30, 30, 30, 180);
+                border: 1px solid rgba(100, 150, 255, 0.2);
                 border-radius: 8px;
-                margin: 2px 4px;
+                padding: 8px 12px;
+                font-size: 14px;
+                color: #e0e0e0;
             }
-            QListWidget::item:selected {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
-                    stop:0 #667eea, stop:1 #764ba2);
-                color: white;
-                font-weight: bold;
+            QLineEdit:focus {
+                border: 1px solid #667eea;
             }
-            QListWidget::item:hover {
-                background-color: rgba(100, 100, 150, 0.3);
+            QComboBox {
+                background-color: rgba(30, 30, 30, 180);
+                border: 1px solid rgba(100, 150, 255, 0.2);
                 border-radius: 8px;
+                padding: 6px 10px;
+                color: #e0e0e0;
             }
             QPushButton {
                 background-color: transparent;
@@ -216,10 +1222,12 @@ class MusicPlayer(QMainWindow):
         self.folder_path_label.setWordWrap(True)
         header_layout.addWidget(self.folder_path_label, 1)
         
-        self.folder_btn = QPushButton("📁 انتخاب پوشه")
+        self.folder_btn = QPushButton("📁 پوشه‌ها")
         self.folder_btn.setObjectName("folderButton")
-        self.folder_btn.setToolTip("انتخاب پوشه حاوی فایل‌های موسیقی")
-        self.folder_btn.clicked.connect(self.select_music_folder)
+        self.folder_btn.setToolTip("انتخاب، افزودن یا حذف پوشه‌های موسیقی")
+        self.folder_menu = QMenu(self)
+        self.folder_menu.aboutToShow.connect(self.build_folder_menu)
+        self.folder_btn.setMenu(self.folder_menu)
         header_layout.addWidget(self.folder_btn)
         
         layout.addLayout(header_layout)
@@ -259,6 +1267,12 @@ class MusicPlayer(QMainWindow):
         controls_layout = QHBoxLayout()
         controls_layout.addStretch()
         
+        self.shuffle_btn = QPushButton("🔀")
+        self.shuffle_btn.setCheckable(True)
+        self.shuffle_btn.setToolTip("پخش تصادفی")
+        self.shuffle_btn.clicked.connect(self.set_shuffle)
+        controls_layout.addWidget(self.shuffle_btn)
+        
         self.prev_btn = QPushButton("⏮")
         self.prev_btn.clicked.connect(self.prev_song)
         controls_layout.addWidget(self.prev_btn)
@@ -272,6 +1286,11 @@ class MusicPlayer(QMainWindow):
         self.next_btn.clicked.connect(self.next_song)
         controls_layout.addWidget(self.next_btn)
         
+        self.repeat_btn = QPushButton("🔁")
+        self.repeat_btn.setCheckable(True)
+        self.repeat_btn.clicked.connect(self.cycle_repeat)
+        controls_layout.addWidget(self.repeat_btn)
+        
         controls_layout.addStretch()
         layout.addLayout(controls_layout)
         
@@ -281,7 +1300,7 @@ class MusicPlayer(QMainWindow):
         self.current_time_label.setFont(QFont("Segoe UI", 12))
         progress_layout.addWidget(self.current_time_label)
         
-        self.progress_slider = QSlider(Qt.Horizontal)
+        self.progress_slider = WaveformSlider(Qt.Horizontal)
         self.progress_slider.setRange(0, 1000)
         self.progress_slider.sliderPressed.connect(self.start_seeking)
         self.progress_slider.sliderReleased.connect(self.end_seeking)
@@ -313,10 +1332,91 @@ class MusicPlayer(QMainWindow):
         bottom_layout.addWidget(self.status_label)
         layout.addLayout(bottom_layout)
         
+        # جستجو در کتابخانه
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("🔍 جستجو در عنوان، هنرمند، آلبوم یا نام فایل...")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.textChanged.connect(self.apply_view)
+        QShortcut(QKeySequence.Find, self, self.search_box.setFocus)
+        QShortcut(QKeySequence("Ctrl+Shift+P"), self, self.toggle_perf_overlay)
+        # جابجایی با کیبورد: ±۵ ثانیه و با Ctrl ±۳۰ ثانیه
+        QShortcut(QKeySequence(Qt.Key_Right), self, lambda: self.seek_relative(5))
+        QShortcut(QKeySequence(Qt.Key_Left), self, lambda: self.seek_relative(-5))
+        QShortcut(QKeySequence("Ctrl+Right"), self, lambda: self.seek_relative(30))
+        QShortcut(QKeySequence("Ctrl+Left"), self, lambda: self.seek_relative(-30))
+        QShortcut(QKeySequence(Qt.Key_Escape), self.search_box, self.search_box.clear,
+                  context=Qt.WidgetShortcut)
+        
+        # نمای کتابخانه: گروه‌بندی و مرتب‌سازی
+        browse_layout = QHBoxLayout()
+        browse_layout.addWidget(self.search_box, 1)
+        self.view_mode_combo = QComboBox()
+        for label, mode in (("همه آهنگ‌ها", None), ("هنرمند", "artist"),
+                            ("آلبوم", "album"), ("پوشه", "folder"), ("لیست پخش", "playlist"),
+                            ("تکراری‌ها", "duplicates")):
+            self.view_mode_combo.addItem(label, mode)
+        self.view_mode_combo.currentIndexChanged.connect(self.change_view_mode)
+        browse_layout.addWidget(self.view_mode_combo)
+        
+        self.sort_combo = QComboBox()
+        for label, field in (("ترتیب پوشه", None), ("عنوان", "title"), ("هنرمند", "artist"),
+                             ("مدت", "duration"), ("تاریخ افزودن", "added")):
+            self.sort_combo.addItem(label, field)
+        self.sort_combo.currentIndexChanged.connect(self.apply_view)
+        browse_layout.addWidget(self.sort_combo)
+        
+        self.sort_order_btn = QPushButton("⬆")
+        self.sort_order_btn.setCheckable(True)
+        self.sort_order_btn.setToolTip("ترتیب نزولی")
+        self.sort_order_btn.toggled.connect(self.toggle_sort_order)
+        browse_layout.addWidget(self.sort_order_btn)
+        
+        self.playlist_btn = QPushButton("📃")
+        self.playlist_btn.setToolTip("لیست‌های پخش M3U")
+        playlist_menu = QMenu(self)
+        playlist_menu.addAction("ذخیره نمای فعلی به عنوان لیست پخش...", self.save_view_as_playlist)
+        playlist_menu.addAction("وارد کردن M3U/M3U8...", self.import_playlist)
+        playlist_menu.addAction("صادر کردن نمای فعلی به M3U8...", self.export_playlist)
+        playlist_menu.addSeparator()
+        playlist_menu.addAction("حذف لیست پخش انتخاب شده", self.delete_playlist)
+        self.playlist_btn.setMenu(playlist_menu)
+        browse_layout.addWidget(self.playlist_btn)
+        
+        self.duplicates_btn = QPushButton("👥")
+        self.duplicates_btn.setToolTip("آهنگ‌های تکراری")
+        duplicates_menu = QMenu(self)
+        duplicates_menu.addAction("یافتن آهنگ‌های تکراری", self.show_duplicates)
+        self.hide_duplicates_action = duplicates_menu.addAction("پنهان کردن تکراری‌ها از ترتیب پخش")
+        self.hide_duplicates_action.setCheckable(True)
+        self.hide_duplicates_action.setChecked(self.settings.get("hide_duplicates", False))
+        self.hide_duplicates_action.toggled.connect(self.set_hide_duplicates)
+        self.duplicates_btn.setMenu(duplicates_menu)
+        browse_layout.addWidget(self.duplicates_btn)
+        layout.addLayout(browse_layout)
+        
         # لیست پخش
-        self.song_list = QListWidget()
-        self.song_list.itemDoubleClicked.connect(self.play_selected_song)
-        layout.addWidget(self.song_list, 2)
+        lists_layout = QHBoxLayout()
+        self.group_model = QStringListModel()
+        self.group_list = QListView()
+        self.group_list.setModel(self.group_model)
+        self.group_list.setUniformItemSizes(True)
+        self.group_list.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.group_list.setMaximumWidth(260)
+        self.group_list.hide()
+        self.group_list.selectionModel().currentChanged.connect(self.apply_view)
+        lists_layout.addWidget(self.group_list)
+        
+        self.song_model = SongListModel(self.tracks)
+        self.song_list = QListView()
+        self.song_list.setModel(self.song_model)
+        # ارتفاع یکسان ردیف‌ها: نمایش فقط ردیف‌های قابل مشاهده را محاسبه می‌کند
+        self.song_list.setUniformItemSizes(True)
+        self.song_list.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.song_list.doubleClicked.connect(self.play_selected_song)
+        self.song_list.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.song_list.customContextMenuRequested.connect(self.show_song_menu)
+        lists_layout.addWidget(self.song_list, 1)
+        layout.addLayout(lists_layout, 2)
         
         # بازیابی حجم از تنظیمات - تبدیل به int
         saved_volume = self.settings.get("volume", 70)
@@ -325,266 +1425,1292 @@ class MusicPlayer(QMainWindow):
         self.volume_slider.setValue(saved_volume)
         self.change_volume(saved_volume)
         
-        # تایمرها
+        # تایمرها: به‌روزرسانی نمایش فقط هنگام پخش و دیده شدن پنجره
         self.progress_timer = QTimer()
         self.progress_timer.timeout.connect(self.update_progress)
-        self.progress_timer.start(100)
+        self.progress_timer.setInterval(200)
         
-        self.end_check_timer = QTimer()
-        self.end_check_timer.timeout.connect(self.check_song_end)
-        self.end_check_timer.start(500)
+        # پایان آهنگ: یک تایمر تک‌مرحله‌ای برای زمان باقی‌مانده، نه نمونه‌برداری مداوم
+        self.end_timer = QTimer()
+        self.end_timer.setSingleShot(True)
+        self.end_timer.setTimerType(Qt.PreciseTimer)
+        self.end_timer.timeout.connect(self.check_song_end)
         
         # تایمر برای ذخیره خودکار تنظیمات
         self.save_timer = QTimer()
         self.save_timer.timeout.connect(self.save_settings)
         self.save_timer.start(30000)  # هر 30 ثانیه ذخیره شود
         
+        # overlay عملیات کند (پیش‌فرض پنهان)
+        self.perf_overlay = PerfOverlay(self)
+        
         # به‌روزرسانی نمایش مسیر پوشه (بعد از تنظیم همه چیز)
         QTimer.singleShot(100, self.update_folder_display)
 
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.first_paint_time is None:
+            self.first_paint_time = time.perf_counter()
+            # کارهای سنگین بعد از اولین رسم پنجره
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        """بارگذاری صدا در پس‌زمینه و شروع اسکن پس از نمایش پنجره"""
+        if not self.startup_pending:
+            return
+        self.startup_pending = False
+        self.audio_thread = threading.Thread(target=self.init_audio, name="audio-init", daemon=True)
+        self.audio_thread.start()
+        if not self.load_music_files(reconcile=bool(self.tracks)):
+            self.flush_open_requests()
+            self.first_scan_done = True
+            self.check_startup_benchmark()
+
+    def init_audio(self):
+        try:
+            load_audio_backend()
+            self.audio_ready.emit(True)
+        except Exception as e:
+            print(f"خطا در راه‌اندازی صدا: {e}")
+            self.audio_ready.emit(False)
+
+    def on_audio_ready(self, ok):
+        if not ok:
+            self.status_label.setText("خطا در راه‌اندازی صدا")
+            return
+        self.init_pygame()
+        self.mixer_ready = True
+        pygame.mixer.music.set_volume(self.volume)
+        self.start_gain_analysis()
+        if self.play_when_ready:
+            self.play_when_ready = False
+            self.play_pause()
+        self.check_startup_benchmark()
+
     def init_pygame(self):
-        pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=2048)
+        # رویداد پایان آهنگ؛ صف رویداد pygame به زیرسیستم display نیاز دارد
+        self.music_end_event = pygame.USEREVENT + 1
+        try:
+            pygame.display.init()
+            pygame.event.set_allowed(None)
+            pygame.event.set_allowed(self.music_end_event)
+            pygame.mixer.music.set_endevent(self.music_end_event)
+            self.end_events = True
+        except pygame.error:
+            self.end_events = False
 
-    def get_music_folder(self):
-        """دریافت پوشه موسیقی (پیش‌فرض یا انتخاب شده)"""
-        if self.custom_music_folder and os.path.exists(self.custom_music_folder):
-            return self.custom_music_folder
+    def check_startup_benchmark(self):
+        """گزارش زمان تا اولین رسم و تا آماده پخش شدن (--startup-benchmark)
+
+        اگر اسکن اول بدون آهنگ تمام شود (یا پوشه‌ای برای اسکن نباشد) کتابخانه
+        خالی گزارش می‌شود تا benchmark منتظر آهنگی نماند که نمی‌آید.
+        """
+        empty = self.first_scan_done and not self.tracks
+        if not (self.startup_benchmark and self.mixer_ready and (self.tracks or empty)):
+            return
+        self.startup_benchmark = False
+        playable = time.perf_counter()
+        first_paint = self.first_paint_time or playable
+        print(f"time-to-first-paint: {(first_paint - STARTUP_TIME) * 1000:.1f} ms")
+        if empty:
+            print(f"time-to-empty-library: {(playable - STARTUP_TIME) * 1000:.1f} ms")
+            print("tracks: 0 (no music found in the library folders)")
         else:
-            # پوشه پیش‌فرض ویندوز 11/10
-            music_folder = Path.home() / "Music"
-            if not music_folder.exists():
-                music_folder = Path(os.getenv('USERPROFILE') or Path.home()) / "Music"
-                music_folder.mkdir(parents=True, exist_ok=True)
-            return str(music_folder)
+            print(f"time-to-playable: {(playable - STARTUP_TIME) * 1000:.1f} ms")
+            print(f"tracks: {len(self.tracks)}")
+        QTimer.singleShot(0, self.close)
+
+    def load_session_snapshot(self):
+        """نمایش فوری لیست پخش و آهنگ جلسه قبل از روی snapshot"""
+        roots, tracks = load_snapshot(self.snapshot_path)
+        if not tracks or roots != self.get_music_folders():
+            return
+        self.snapshot_tracks = tracks
+        self.on_scan_batch(self.scan_generation, tracks)
+        if 0 <= self.current_index < len(self.tracks):
+            self.song_title.setText(self.tracks.title(self.current_index))
+            self.artist_label.setText(self.tracks.artist_name(self.current_index))
+            self.update_album_art(self.tracks[self.current_index])
+
+    def get_music_folders(self):
+        """ریشه‌های موجود کتابخانه؛ اگر هیچ‌کدام نباشد پوشه Music کاربر"""
+        roots = normalize_roots(r for r in self.library_roots if os.path.isdir(r))
+        if roots:
+            return roots
+        # پوشه پیش‌فرض ویندوز 11/10
+        music_folder = Path.home() / "Music"
+        if not music_folder.exists():
+            music_folder = Path(os.getenv('USERPROFILE') or Path.home()) / "Music"
+            music_folder.mkdir(parents=True, exist_ok=True)
+        return [str(music_folder)]
 
     def update_folder_display(self):
-        """به‌روزرسانی نمایش مسیر پوشه"""
-        folder = self.get_music_folder()
+        """به‌روزرسانی نمایش مسیر پوشه‌ها"""
+        roots = self.get_music_folders()
+        folder = roots[0]
         # نمایش مسیر کوتاه شده اگر خیلی طولانی باشد
         if len(folder) > 50:
             display_path = "..." + folder[-47:]
         else:
             display_path = folder
+        if len(roots) > 1:
+            display_path += f"  (+{len(roots) - 1})"
         self.folder_path_label.setText(display_path)
-        self.folder_path_label.setToolTip(folder)
+        self.folder_path_label.setToolTip("\n".join(roots))
 
-    def select_music_folder(self):
-        """انتخاب پوشه موسیقی جدید"""
-        folder = QFileDialog.getExistingDirectory(
+    def build_folder_menu(self):
+        self.folder_menu.clear()
+        self.folder_menu.addAction("انتخاب پوشه...", self.select_music_folder)
+        self.folder_menu.addAction("افزودن پوشه...", self.add_music_folder)
+        roots = normalize_roots(self.library_roots)
+        if len(roots) > 1:
+            self.folder_menu.addSeparator()
+            for root in roots:
+                self.folder_menu.addAction(f"حذف {root}",
+                                           lambda root=root: self.remove_music_folder(root))
+
+    def ask_music_folder(self):
+        return QFileDialog.getExistingDirectory(
             self,
             "انتخاب پوشه موسیقی",
-            self.get_music_folder(),
+            self.get_music_folders()[0],
             QFileDialog.ShowDirsOnly
         )
-        
-        if folder:
-            self.custom_music_folder = folder
-            self.update_folder_display()
-            if self.load_music_files():
-                self.save_settings()
-                
-                # نمایش پیام موفقیت
-                self.status_label.setText(f"پوشه جدید بارگذاری شد: {os.path.basename(folder)}")
-                QTimer.singleShot(3000, lambda: self.status_label.setText("آماده"))
 
-    def extract_album_art(self, file_path):
+    def set_library_roots(self, roots):
+        self.library_roots = normalize_roots(roots)
+        self.update_folder_display()
+        if self.load_music_files():
+            self.save_settings()
+            return True
+        return False
+
+    def select_music_folder(self):
+        """جایگزینی کتابخانه با یک پوشه موسیقی جدید"""
+        folder = self.ask_music_folder()
+        if folder and self.set_library_roots([folder]):
+            # نمایش پیام شروع اسکن
+            self.status_label.setText(f"در حال اسکن پوشه جدید: {os.path.basename(folder)}")
+
+    def add_music_folder(self):
+        """افزودن یک ریشه دیگر به کتابخانه"""
+        folder = self.ask_music_folder()
+        if folder and self.set_library_roots(self.library_roots + [folder]):
+            self.status_label.setText(f"در حال اسکن پوشه‌ها: {os.path.basename(folder)} اضافه شد")
+
+    def remove_music_folder(self, root):
+        self.set_library_roots([r for r in self.library_roots if os.path.abspath(r) != root])
+
+    @traced("extract_album_art", _file_arg)
+    def extract_album_art(self, file_path, art_data=None):
         try:
-            if file_path.lower().endswith('.mp3'):
-                audio = ID3(file_path)
-                for tag in audio.tags.values():
-                    if tag.FrameID.startswith('APIC'):
-                        return QPixmap.fromImage(QImage.fromData(tag.data))
-            elif file_path.lower().endswith('.flac'):
-                audio = mutagen.File(file_path)
-                if audio and audio.pictures:
-                    return QPixmap.fromImage(QImage.fromData(audio.pictures[0].data))
+            if art_data is None:
+                art_data = probe_track(file_path, with_art=True).art
+            if art_data:
+                return QPixmap.fromImage(QImage.fromData(art_data))
         except:
             pass
         return None
 
+    @traced("extract_metadata", _file_arg)
     def extract_metadata(self, file_path):
-        try:
-            if file_path.lower().endswith('.mp3'):
-                audio = EasyID3(file_path)
-            else:
-                audio = mutagen.File(file_path)
-                if not audio or not audio.tags:
-                    return None, None
-                audio = audio.tags
-            
-            title = audio.get('title', [os.path.basename(file_path)])[0]
-            artist = audio.get('artist', ['ناشناس'])[0]
-            return title, artist
-        except:
-            return None, None
+        track = probe_track(file_path)
+        return track.title, track.artist
 
+    @traced("get_audio_duration", _file_arg)
     def get_audio_duration(self, file_path):
-        try:
-            if file_path.lower().endswith('.mp3'):
-                return MP3(file_path).info.length
-            elif file_path.lower().endswith('.flac'):
-                return FLAC(file_path).info.length
-            elif file_path.lower().endswith('.wav'):
-                return WAVE(file_path).info.length
-            else:
-                audio = mutagen.File(file_path)
-                return audio.info.length if audio else 180
-        except:
-            return 180
+        return probe_track(file_path).duration
+
+    def has_album_art(self, file_path):
+        """بررسی وجود کاور داخل فایل"""
+        return probe_track(file_path).has_art
+
+    @traced("probe_file", _file_arg)
+    def probe_file(self, file_path):
+        """خواندن اطلاعات یک فایل برای ایندکس (در ترد اسکنر اجرا می‌شود)"""
+        return probe_file(file_path)
 
-    def load_music_files(self):
-        """بارگذاری فایل‌های موسیقی از پوشه"""
-        music_folder = self.get_music_folder()
+    def cancel_scan(self):
+        """لغو اسکن در حال اجرا؛ نتایج دیرهنگام آن نادیده گرفته می‌شوند"""
+        if self.scanner is not None:
+            self.scanner.cancel()
+            self.scanner = None
+        self.scan_generation += 1
+
+    @traced("load_music_files", lambda self, *a, **k: os.pathsep.join(self.get_music_folders()))
+    def load_music_files(self, reconcile=False):
+        """بارگذاری فایل‌های موسیقی از پوشه (اسکن در پس‌زمینه)
+
+        با reconcile لیست فعلی (snapshot) نگه داشته می‌شود و نتایج اسکن در
+        پایان با آن مقایسه می‌شوند.
+        """
+        roots = self.get_music_folders()
         
-        if not os.path.exists(music_folder):
-            QMessageBox.warning(self, "هشدار", 
-                f"پوشه موسیقی یافت نشد!\n\n{music_folder}\n\nلطفاً یک پوشه انتخاب کنید.")
-            return False
-            
-        extensions = ['.mp3', '.wav', '.ogg', '.flac', '.m4a', '.aac']
-        self.music_files = []
-        
-        for root, _, files in os.walk(music_folder):
-            for file in files:
-                if any(file.lower().endswith(ext) for ext in extensions):
-                    self.music_files.append(os.path.join(root, file))
-                    
-        if not self.music_files:
-            QMessageBox.information(self, "اطلاع", 
-                f"هیچ فایل موسیقی در پوشه زیر یافت نشد:\n{music_folder}\n\nفرمت‌های پشتیبانی شده: {', '.join(extensions)}")
+        if not os.path.exists(roots[0]):
+            if not self.startup_benchmark:
+                QMessageBox.warning(self, "هشدار", 
+                    f"پوشه موسیقی یافت نشد!\n\n{roots[0]}\n\nلطفاً یک پوشه انتخاب کنید.")
             return False
-            
-        self.song_list.clear()
-        self.song_durations.clear()
-        
-        for file_path in self.music_files:
-            title, artist = self.extract_metadata(file_path)
-            if not title:
-                title = os.path.basename(file_path)
-            if not artist:
-                artist = "ناشناس"
-                
-            duration = self.get_audio_duration(file_path)
-            self.song_durations[file_path] = duration
-            duration_str = self.format_time(duration)
-            
-            item_text = f"{title} - {artist}  [{duration_str}]"
-            self.song_list.addItem(item_text)
-            
-        self.status_label.setText(f"{len(self.music_files)} آهنگ بارگذاری شد")
+        
+        self.cancel_scan()
+        self.clear_watcher()
+        self.reconciling = reconcile
+        self.pending_tracks = []
+        if reconcile:
+            self.start_scan(roots)
+            return True
+        
+        # آهنگ در حال پخش از پوشه قبلی دیگر در لیست نیست
+        self.clear_library()
+        self.start_scan(roots)
+        self.status_label.setText("در حال اسکن پوشه...")
         return True
 
+    def start_scan(self, roots):
+        self.scanner = LibraryScanner(self.scan_generation, roots,
+                                      self.library_index, self.probe_file,
+                                      self.snapshot_path, self.exclude_patterns)
+        self.scanner.signals.batch_ready.connect(self.on_scan_batch)
+        self.scanner.signals.finished.connect(self.on_scan_finished)
+        QThreadPool.globalInstance().start(self.scanner)
+
+    def clear_library(self):
+        """خالی کردن لیست پخش و ایندکس‌های حافظه (آهنگ در حال پخش حفظ می‌شود)"""
+        if self.tracks and 0 <= self.current_index < len(self.tracks):
+            if not self.restore_song:
+                self.restore_song = self.tracks[self.current_index]
+        self.current_index = -1
+        self.song_model.clear()
+        self.search_index.clear()
+        self.browse.clear()
+        self.invalidate_track_paths()
+        self.sync_play_queue()
+
+    def on_scan_batch(self, generation, batch):
+        """افزودن یک دسته از نتایج اسکن به لیست پخش"""
+        if generation != self.scan_generation:
+            return
+        if self.reconciling:
+            # لیست snapshot نمایش داده شده؛ نتایج در پایان مقایسه می‌شوند
+            self.pending_tracks.extend(batch)
+            return
+        
+        start = len(self.tracks)
+        ids = self.song_model.append_rows([track[:5] for track in batch])
+        for track_id, (file_path, title, artist, album, duration, added) in zip(ids, batch):
+            self.search_index.add(track_id, file_path, title, artist, album)
+            self.browse.set(track_id, file_path, title, artist, album, duration, added)
+        self.invalidate_track_paths()
+        if self.view_is_custom() and not self.view_timer.isActive():
+            # در طول اسکن نما حداکثر چند بار در ثانیه دوباره ساخته می‌شود
+            self.view_timer.start()
+        
+        # بازیابی آخرین ترانه به محض رسیدن آن در نتایج
+        if self.restore_song and self.current_index == -1:
+            for i, (file_path, *_) in enumerate(batch):
+                if file_path == self.restore_song:
+                    self.current_index = start + i
+                    if not self.is_playing:
+                        # ادامه پخش از همان نقطه جلسه قبل
+                        self.current_position = self.settings.get("last_position", 0)
+                        self.resume_file = file_path
+                        self.resume_position = self.current_position
+                    self.select_row(self.current_index)
+                    self.restore_song = ""
+                    break
+        
+        if not self.is_playing:
+            self.status_label.setText(f"در حال اسکن... {len(self.tracks)} آهنگ")
+        self.check_startup_benchmark()
+
+    def on_scan_finished(self, generation, count, dirs):
+        """پایان اسکن پس‌زمینه"""
+        if generation != self.scan_generation:
+            return
+        self.scanner = None
+        
+        if self.reconciling:
+            self.reconciling = False
+            tracks, self.pending_tracks = self.pending_tracks, []
+            if tracks != self.snapshot_tracks:
+                # کتابخانه از جلسه قبل تغییر کرده: جایگزینی یک‌باره لیست
+                self.clear_library()
+                self.on_scan_batch(generation, tracks)
+                if self.view_is_custom():
+                    self.refresh_view()
+            self.snapshot_tracks = []
+        self.restore_song = ""
+        
+        if self.watch_enabled and dirs:
+            self.folder_watcher.addPaths(dirs)
+        self.refresh_gains()
+        self.invalidate_duplicates()
+        self.flush_open_requests()
+        
+        self.first_scan_done = True
+        
+        if not self.tracks:
+            if self.startup_benchmark:
+                # اجرای بدون کاربر: پیام مودال حلقه رویداد را نگه می‌داشت
+                self.check_startup_benchmark()
+                return
+            music_folder = "\n".join(self.get_music_folders())
+            QMessageBox.information(self, "اطلاع", 
+                f"هیچ فایل موسیقی در پوشه زیر یافت نشد:\n{music_folder}\n\nفرمت‌های پشتیبانی شده: {', '.join(AUDIO_EXTENSIONS)}")
+            self.status_label.setText("آماده")
+            return
+        
+        if not self.is_playing:
+            self.status_label.setText(f"{count} آهنگ بارگذاری شد")
+
+    def refresh_gains(self, paths=None):
+        """بارگذاری گین‌های ایندکس در پس‌زمینه: همه آهنگ‌ها پس از اسکن یا فقط paths"""
+        if not self.replay_gain:
+            return
+        if paths is None:
+            loader = GainLoader(self.library_index, roots=self.get_music_folders())
+        else:
+            loader = GainLoader(self.library_index, paths=paths)
+        loader.signals.gains_loaded.connect(self.on_gains_loaded)
+        QThreadPool.globalInstance().start(loader)
+
+    def on_gains_loaded(self, gains, missing, full):
+        if full:
+            known = dict(gains)
+            for row, file_path in enumerate(self.tracks):
+                self.tracks.set_gain(row, known.get(file_path))
+            self.apply_volume()
+            # فهرست کامل جای مسیرهای منتظر قبلی را می‌گیرد
+            self.missing_gains = missing
+            if self.gain_analyzer is not None:
+                self.gain_analyzer.clear()
+        else:
+            self.on_gains_ready(gains)
+            self.missing_gains.extend(missing)
+        self.start_gain_analysis()
+
+    def start_gain_analysis(self):
+        """تحلیل در پس‌زمینه؛ فرمت‌های غیر WAV به mixer راه‌اندازی شده نیاز دارند"""
+        if not (self.replay_gain and HAVE_NUMPY and self.mixer_ready and self.missing_gains):
+            return
+        paths, self.missing_gains = self.missing_gains, []
+        if self.gain_analyzer is not None and self.gain_analyzer.add(paths):
+            return
+        self.gain_analyzer = GainAnalyzer(paths, self.library_index)
+        self.gain_analyzer.signals.gains_ready.connect(self.on_gains_ready)
+        self.background_pool.start(self.gain_analyzer)
+
+    def on_gains_ready(self, gains):
+        for file_path, gain in gains:
+            row, found = self.tracks.find(file_path)
+            if found:
+                self.tracks.set_gain(row, gain)
+        if 0 <= self.current_index < len(self.tracks):
+            current_file = self.tracks[self.current_index]
+            if any(file_path == current_file for file_path, _ in gains):
+                self.apply_volume()
+
+    def track_volume(self, file_path):
+        """حجم صدای pygame برای یک آهنگ: حجم کاربر با گین ReplayGain
+
+        حجم pygame حداکثر ۱ است، پس گین مثبت فقط تا حجم کامل اثر دارد.
+        """
+        if not self.replay_gain:
+            return self.volume
+        row, found = self.tracks.find(file_path)
+        gain = self.tracks.gain(row) if found else None
+        if gain is None:
+            gain = 0.0
+        return min(1.0, self.volume * 10 ** (gain / 20))
+
+    def apply_volume(self):
+        if not self.mixer_ready:
+            return
+        if 0 <= self.current_index < len(self.tracks):
+            volume = self.track_volume(self.tracks[self.current_index])
+        else:
+            volume = self.volume
+        pygame.mixer.music.set_volume(volume)
+
+    def clear_watcher(self):
+        watched = self.folder_watcher.directories() + self.folder_watcher.files()
+        if watched:
+            self.folder_watcher.removePaths(watched)
+        self.changed_dirs.clear()
+        self.watch_timer.stop()
+
+    def on_directory_changed(self, folder):
+        """تغییرات پشت سر هم یک پوشه با هم اعمال می‌شوند"""
+        self.changed_dirs.add(folder)
+        self.watch_timer.start()
+
+    def on_file_changed(self, file_path):
+        """آهنگ در حال پخش در جا تغییر کرده (مثلاً تگ آن ویرایش شده)"""
+        self.on_directory_changed(os.path.dirname(file_path))
+
+    def watch_current_file(self, file_path):
+        """پاییدن فایل آهنگ در حال پخش؛ تغییر فایل‌ها زمان پوشه را عوض نمی‌کند"""
+        if not self.watch_enabled:
+            return
+        files = self.folder_watcher.files()
+        if files:
+            self.folder_watcher.removePaths(files)
+        if not is_remote_path(file_path):
+            self.folder_watcher.addPath(file_path)
+
+    def check_files(self):
+        """بررسی حجم و زمان تغییر همه فایل‌ها در پس‌زمینه (با بازگشت به پنجره)"""
+        if (not self.watch_enabled or self.startup_pending or self.scanner is not None
+                or self.file_checker is not None
+                or time.monotonic() - self.last_file_check < FILE_CHECK_INTERVAL):
+            return
+        self.last_file_check = time.monotonic()
+        self.file_checker = FileChecker(normalize_roots(self.get_music_folders()),
+                                        self.library_index, self.probe_file,
+                                        self.exclude_patterns)
+        self.file_checker.signals.changes_ready.connect(self.on_files_checked)
+        self.background_pool.start(self.file_checker)
+
+    def on_files_checked(self, updated, removed, new_dirs):
+        self.file_checker = None
+        if self.scanner is None:
+            self.on_library_changes(updated, removed, new_dirs)
+
+    def apply_directory_changes(self):
+        if self.scanner is not None:
+            # اسکن کامل در جریان است؛ بعداً دوباره تلاش می‌شود
+            self.watch_timer.start()
+            return
+        folders = sorted(self.changed_dirs)
+        self.changed_dirs.clear()
+        updater = DirectoryUpdater(folders, self.library_index, self.probe_file,
+                                   self.exclude_patterns)
+        updater.signals.changes_ready.connect(self.on_library_changes)
+        QThreadPool.globalInstance().start(updater)
+
+    def find_track(self, file_path):
+        """جستجوی دودویی مسیر در لیست مرتب پخش؛ (index, found)"""
+        return self.tracks.find(file_path)
+
+    def on_library_changes(self, updated, removed, new_dirs):
+        """اعمال تغییرات کوچک روی لیست پخش با حفظ آهنگ در حال پخش"""
+        current_file = None
+        if 0 <= self.current_index < len(self.tracks):
+            current_file = self.tracks[self.current_index]
+        
+        for file_path in removed:
+            index, found = self.find_track(file_path)
+            if found:
+                track_id = self.song_model.remove_row(index)
+                self.browse.remove(track_id)
+                self.search_index.remove(track_id)
+        
+        for file_path, title, artist, album, duration, added in updated:
+            self.art_cache.discard(file_path)
+            index, found = self.find_track(file_path)
+            if found:
+                track_id = self.song_model.update_row(index, title, artist, album, duration)
+            else:
+                track_id = self.song_model.insert_row(index, file_path, title, artist, album,
+                                                      duration)
+            self.search_index.add(track_id, file_path, title, artist, album)
+            self.browse.set(track_id, file_path, title, artist, album, duration, added)
+        
+        if updated or removed:
+            self.invalidate_track_paths()
+            if self.view_is_custom():
+                self.refresh_view()
+        if updated:
+            self.refresh_gains([u[0] for u in updated])
+        if updated or removed:
+            self.invalidate_duplicates()
+        
+        if current_file is not None:
+            index, found = self.find_track(current_file)
+            self.current_index = index if found else -1
+            if found and current_file in {u[0] for u in updated}:
+                self.total_duration = self.tracks.durations[index]
+                self.total_time_label.setText(self.format_time(self.total_duration))
+                self.song_title.setText(self.tracks.title(index))
+                self.artist_label.setText(self.tracks.artist_name(index))
+        self.sync_play_queue()
+        
+        if self.watch_enabled:
+            if new_dirs:
+                self.folder_watcher.addPaths(new_dirs)
+            gone = [d for d in self.folder_watcher.directories() if not os.path.isdir(d)]
+            if gone:
+                self.folder_watcher.removePaths(gone)
+        
+        if updated or removed:
+            self.status_label.setText(f"کتابخانه به‌روز شد: {len(self.tracks)} آهنگ")
+
+    def view_is_custom(self):
+        """آیا نمای فعلی با ترتیب پیش‌فرض پوشه‌ها فرق دارد؟"""
+        return bool(self.search_box.text() or self.view_mode_combo.currentData()
+                    or self.sort_combo.currentData() or self.sort_order_btn.isChecked()
+                    or self.hidden_ids)
+
+    def change_view_mode(self, *_):
+        """نمایش لیست گروه‌ها برای نمای هنرمند، آلبوم یا پوشه"""
+        mode = self.view_mode_combo.currentData()
+        self.group_list.setVisible(mode is not None)
+        self.refresh_view()
+
+    def refresh_view(self):
+        """بازسازی لیست گروه‌ها و نمای فعلی پس از تغییر کتابخانه"""
+        self.refresh_groups()
+        self.apply_view()
+
+    def refresh_groups(self):
+        mode = self.view_mode_combo.currentData()
+        if mode is None:
+            self.group_model.setStringList([])
+            return
+        current = self.group_list.currentIndex().row()
+        names = []
+        if mode == "playlist":
+            names = self.playlists.names()
+        else:
+            roots = self.get_music_folders()
+            for name, ids in self.view_groups(mode):
+                if mode == "folder":
+                    name = self.display_folder(name, roots)
+                names.append(f"{name}  ({len(ids)})")
+        self.group_list.selectionModel().blockSignals(True)
+        self.group_model.setStringList(names)
+        if names:
+            self.group_list.setCurrentIndex(self.group_model.index(min(max(current, 0), len(names) - 1)))
+        self.group_list.selectionModel().blockSignals(False)
+
+    def display_folder(self, folder, roots):
+        """مسیر پوشه نسبت به ریشه آن؛ با چند ریشه نام ریشه هم نمایش داده می‌شود"""
+        for root in roots:
+            if folder == root or folder.startswith(os.path.join(root, "")):
+                relative = os.path.relpath(folder, root)
+                if len(roots) == 1:
+                    return relative
+                name = os.path.basename(root)
+                return name if relative == "." else os.path.join(name, relative)
+        return folder
+
+    def toggle_sort_order(self, descending):
+        self.sort_order_btn.setText("⬇" if descending else "⬆")
+        self.apply_view()
+
+    def apply_view(self, *_):
+        """ساخت ترتیب نمایش از آرایه‌های از پیش آماده؛ ردیف‌های مدل بازسازی نمی‌شوند"""
+        self.view_timer.stop()
+        mode = self.view_mode_combo.currentData()
+        field = self.sort_combo.currentData()
+        descending = self.sort_order_btn.isChecked()
+        matches = self.search_index.search(self.search_box.text())
+        row_of_id = self.tracks.row_of_id()
+        
+        if mode == "playlist":
+            name = self.selected_playlist()
+            ids = self.resolve_playlist(name) if name else []
+            if matches is not None:
+                ids = [i for i in ids if i in matches]
+            if field is not None:
+                ids = self.browse.sorted_ids(ids, field, descending)
+            elif descending:
+                ids = ids[::-1]
+            rows = [row_of_id[i] for i in ids]
+        elif mode is not None:
+            groups = self.view_groups(mode)
+            group = self.group_list.currentIndex().row()
+            ids = groups[group][1] if 0 <= group < len(groups) else []
+            if matches is not None:
+                ids = [i for i in ids if i in matches]
+            if field is not None:
+                ids = self.browse.sorted_ids(ids, field, descending)
+                rows = [row_of_id[i] for i in ids]
+            else:
+                rows = sorted((row_of_id[i] for i in ids), reverse=descending)
+        elif field is not None:
+            ids = self.browse.order(field)
+            if matches is not None:
+                ids = [i for i in ids if i in matches]
+            rows = [row_of_id[i] for i in ids]
+            if descending:
+                rows.reverse()
+        elif matches is None:
+            rows = list(range(len(self.tracks) - 1, -1, -1)) if descending else None
+        elif len(matches) < 4096:
+            rows = sorted((row_of_id[i] for i in matches), reverse=descending)
+        else:
+            # برای نتایج بزرگ، ماسک بایتی از مرتب‌سازی سریع‌تر است
+            mask = bytearray(len(self.tracks))
+            for i in matches:
+                mask[row_of_id[i]] = 1
+            rows = list(compress(range(len(mask)), mask))
+            if descending:
+                rows.reverse()
+        
+        if self.hidden_ids and mode != "duplicates":
+            hidden = {row_of_id[i] for i in self.hidden_ids}
+            if rows is None:
+                rows = range(len(self.tracks))
+            rows = [row for row in rows if row not in hidden]
+        
+        self.song_model.set_filter(rows)
+        self.sync_play_queue()
+        if 0 <= self.current_index < len(self.tracks):
+            self.select_row(self.current_index)
+
+    def view_groups(self, mode):
+        """[(name, ids)] گروه‌های یک نما؛ گروه‌های تکراری از آخرین جستجو"""
+        if mode == "duplicates":
+            if self.duplicate_groups is None and self.duplicate_finder is None:
+                self.start_duplicate_scan()
+            return self.duplicate_groups or []
+        return self.browse.group_list(mode)
+
+    def show_duplicates(self):
+        index = self.view_mode_combo.findData("duplicates")
+        self.duplicate_groups = None
+        if self.view_mode_combo.currentIndex() != index:
+            self.view_mode_combo.setCurrentIndex(index)
+        else:
+            self.refresh_view()
+
+    def start_duplicate_scan(self):
+        """یافتن تکراری‌ها در پس‌زمینه؛ hashهای ایندکس شده دوباره خوانده نمی‌شوند"""
+        if self.scanner is not None or not self.tracks:
+            # پس از پایان اسکن دوباره شروع می‌شود
+            return
+        if self.duplicate_finder is not None:
+            self.duplicate_finder.cancel()
+        self.duplicate_finder = DuplicateFinder(self.get_music_folders(), self.library_index)
+        self.duplicate_finder.signals.finished.connect(self.on_duplicates_found)
+        self.background_pool.start(self.duplicate_finder)
+        if not self.is_playing:
+            self.status_label.setText("در حال یافتن آهنگ‌های تکراری...")
+
+    def on_duplicates_found(self, groups):
+        self.duplicate_finder = None
+        self.duplicate_groups = []
+        hidden = set()
+        for paths in groups:
+            track_ids = [i for i in map(self.tracks.get, paths) if i is not None]
+            if len(track_ids) < 2:
+                continue
+            title = self.tracks.title(self.tracks.row_of_id()[track_ids[0]])
+            self.duplicate_groups.append((title, track_ids))
+            # اولین نسخه (به ترتیب پوشه) در ترتیب پخش می‌ماند
+            hidden.update(track_ids[1:])
+        self.hidden_ids = hidden if self.hide_duplicates else set()
+        if not self.is_playing:
+            count = sum(len(track_ids) - 1 for _, track_ids in self.duplicate_groups)
+            self.status_label.setText(f"{len(self.duplicate_groups)} گروه تکراری، "
+                                      f"{count} آهنگ اضافه")
+        self.refresh_view()
+
+    def set_hide_duplicates(self, hide):
+        self.hide_duplicates = hide
+        self.save_settings()
+        if not hide:
+            self.hidden_ids = set()
+            self.refresh_view()
+        elif self.duplicate_groups is None:
+            self.start_duplicate_scan()
+        else:
+            self.hidden_ids = {i for _, track_ids in self.duplicate_groups for i in track_ids[1:]}
+            self.refresh_view()
+
+    def invalidate_duplicates(self):
+        """کتابخانه تغییر کرده؛ گروه‌ها در صورت استفاده دوباره (افزایشی) ساخته می‌شوند"""
+        in_view = self.view_mode_combo.currentData() == "duplicates"
+        if self.duplicate_groups is None and not (self.hide_duplicates or in_view):
+            return
+        self.duplicate_groups = None
+        self.hidden_ids = set()
+        self.start_duplicate_scan()
+
+    def invalidate_track_paths(self):
+        """کتابخانه تغییر کرده؛ مسیرهای لیست‌های پخش دوباره حل می‌شوند"""
+        self.playlist_ids.clear()
+        self.path_ids = None
+
+    def track_ids_by_path(self):
+        """نگاشت مسیر → شناسه آهنگ (get)؛ در ویندوز بدون حساسیت به حروف بزرگ و کوچک"""
+        if os.name != "nt":
+            return self.tracks
+        if self.path_ids is None:
+            self.path_ids = {os.path.normcase(p): i for p, i in zip(self.tracks, self.tracks.ids)}
+        return self.path_ids
+
+    def resolve_playlist(self, name):
+        """شناسه آهنگ‌های یک لیست به ترتیب (آهنگ‌های خارج از کتابخانه حذف می‌شوند)"""
+        ids = self.playlist_ids.get(name)
+        if ids is None:
+            lookup = self.track_ids_by_path()
+            normcase = os.path.normcase
+            seen, ids = set(), []
+            for file_path in self.playlists.load(name):
+                track_id = lookup.get(normcase(file_path))
+                if track_id is not None and track_id not in seen:
+                    seen.add(track_id)
+                    ids.append(track_id)
+            self.playlist_ids[name] = ids
+        return ids
+
+    def selected_playlist(self):
+        if self.view_mode_combo.currentData() != "playlist":
+            return None
+        names = self.group_model.stringList()
+        row = self.group_list.currentIndex().row()
+        return names[row] if 0 <= row < len(names) else None
+
+    def view_entries(self):
+        """آهنگ‌های نمای فعلی به صورت (path, title, duration) از داده‌های کتابخانه"""
+        order = self.song_model.visible
+        if order is None:
+            order = range(len(self.tracks))
+        tracks = self.tracks
+        for row in order:
+            yield tracks[row], f"{tracks.artist_name(row)} - {tracks.title(row)}", tracks.durations[row]
+
+    def show_playlist(self, name):
+        index = self.view_mode_combo.findData("playlist")
+        if self.view_mode_combo.currentIndex() != index:
+            self.view_mode_combo.setCurrentIndex(index)
+        else:
+            self.refresh_groups()
+        names = self.group_model.stringList()
+        if name in names:
+            self.group_list.setCurrentIndex(self.group_model.index(names.index(name)))
+        self.apply_view()
+
+    def save_view_as_playlist(self):
+        if not self.tracks:
+            return
+        text, ok = QInputDialog.getText(self, "لیست پخش جدید", "نام لیست پخش:")
+        name = playlist_name(text) if ok else ""
+        if not name:
+            return
+        if name in self.playlists.names():
+            answer = QMessageBox.question(self, "لیست پخش", f"«{name}» وجود دارد. جایگزین شود؟")
+            if answer != QMessageBox.Yes:
+                return
+        self.playlist_ids.pop(name, None)
+        count = self.playlists.save(name, list(self.view_entries()))
+        self.show_playlist(name)
+        self.status_label.setText(f"لیست پخش «{name}» با {count} آهنگ ذخیره شد")
+
+    def import_playlist(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "وارد کردن لیست پخش", self.get_music_folders()[0],
+            "لیست پخش (*.m3u *.m3u8)")
+        if not file_path:
+            return
+        try:
+            entries = list(parse_m3u(file_path))
+        except OSError as e:
+            QMessageBox.warning(self, "خطا", f"خواندن لیست پخش ممکن نشد:\n{e}")
+            return
+        name = self.playlists.unique_name(
+            playlist_name(os.path.splitext(os.path.basename(file_path))[0]) or "لیست پخش")
+        self.playlists.save(name, entries)
+        self.show_playlist(name)
+        found = len(self.resolve_playlist(name))
+        self.status_label.setText(
+            f"لیست پخش «{name}» وارد شد: {found} از {len(entries)} آهنگ در کتابخانه")
+
+    def export_playlist(self):
+        if not self.tracks:
+            return
+        default_name = self.selected_playlist() or "playlist"
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "صادر کردن لیست پخش",
+            os.path.join(self.get_music_folders()[0], default_name + ".m3u8"),
+            "لیست پخش (*.m3u8 *.m3u)")
+        if not file_path:
+            return
+        try:
+            count = write_m3u(file_path, self.view_entries())
+        except OSError as e:
+            QMessageBox.warning(self, "خطا", f"ذخیره لیست پخش ممکن نشد:\n{e}")
+            return
+        self.status_label.setText(f"{count} آهنگ در {os.path.basename(file_path)} ذخیره شد")
+
+    def delete_playlist(self):
+        name = self.selected_playlist()
+        if not name:
+            return
+        answer = QMessageBox.question(self, "حذف لیست پخش", f"لیست پخش «{name}» حذف شود؟")
+        if answer == QMessageBox.Yes:
+            self.playlists.delete(name)
+            self.playlist_ids.pop(name, None)
+            self.refresh_view()
+
+    def current_view_row(self):
+        if 0 <= self.current_index < len(self.tracks):
+            return self.song_model.view_row(self.current_index)
+        return -1
+
+    def sync_play_queue(self):
+        """ترتیب نما عوض شده؛ shuffle روی ردیف‌های جدید دوباره ساخته می‌شود"""
+        self.play_queue.set_items(self.play_queue.items, self.current_view_row())
+
+    def update_order_buttons(self):
+        self.shuffle_btn.setChecked(self.play_queue.shuffle)
+        repeat = self.play_queue.repeat
+        self.repeat_btn.setChecked(repeat != REPEAT_OFF)
+        self.repeat_btn.setText("🔂" if repeat == REPEAT_ONE else "🔁")
+        self.repeat_btn.setToolTip({REPEAT_OFF: "تکرار خاموش", REPEAT_ALL: "تکرار همه",
+                                    REPEAT_ONE: "تکرار آهنگ فعلی"}[repeat])
+
+    def set_shuffle(self, shuffle):
+        self.play_queue.set_shuffle(shuffle, self.current_view_row())
+        self.update_order_buttons()
+        self.upcoming_changed()
+
+    def cycle_repeat(self):
+        modes = (REPEAT_ALL, REPEAT_ONE, REPEAT_OFF)
+        self.play_queue.repeat = modes[(modes.index(self.play_queue.repeat) + 1) % len(modes)]
+        self.update_order_buttons()
+        self.upcoming_changed()
+
+    def upcoming_changed(self):
+        """آهنگ بعدی عوض شده: صف gapless و کپی‌های محلی دوباره تنظیم می‌شوند"""
+        self.save_settings()
+        if self.is_playing or self.is_paused:
+            self.queue_next_song()
+            self.stage_ahead()
+
+    def show_song_menu(self, pos):
+        index = self.song_list.indexAt(pos)
+        if not index.isValid():
+            return
+        file_path = self.tracks[self.song_model.source_row(index.row())]
+        menu = QMenu(self)
+        menu.addAction("پخش بعدی", lambda: self.enqueue_track(file_path, True))
+        menu.addAction("افزودن به صف پخش", lambda: self.enqueue_track(file_path, False))
+        if self.play_queue.upcoming:
+            menu.addSeparator()
+            menu.addAction(f"خالی کردن صف ({len(self.play_queue.upcoming)})", self.clear_play_queue)
+        menu.exec_(self.song_list.viewport().mapToGlobal(pos))
+
+    def enqueue_track(self, file_path, first):
+        if first:
+            self.play_queue.play_next(file_path)
+        else:
+            self.play_queue.enqueue(file_path)
+        self.status_label.setText(f"در صف: {len(self.play_queue.upcoming)} آهنگ")
+        self.upcoming_changed()
+
+    def clear_play_queue(self):
+        self.play_queue.clear_queue()
+        self.upcoming_changed()
+
+    def open_paths(self, paths, enqueue=False):
+        """باز کردن فایل‌ها یا پوشه‌های خط فرمان؛ enqueue یعنی افزودن به انتهای صف پخش"""
+        if self.isMinimized():
+            self.showNormal()
+        self.raise_()
+        self.activateWindow()
+        if not paths:
+            return
+        if self.startup_pending or self.scanner is not None:
+            # پس از پایان اسکن، تا نتیجه اسکن آهنگ‌های اضافه شده را پاک نکند
+            self.open_requests.append((paths, enqueue))
+            return
+        opener = FileOpener(paths, enqueue, self.probe_file)
+        opener.signals.opened.connect(self.on_files_opened)
+        QThreadPool.globalInstance().start(opener)
+
+    def flush_open_requests(self):
+        requests, self.open_requests = self.open_requests, []
+        for paths, enqueue in requests:
+            self.open_paths(paths, enqueue)
+
+    def on_files_opened(self, tracks, enqueue):
+        if not tracks:
+            self.status_label.setText("فایل قابل پخشی یافت نشد")
+            return
+        paths = [track[0] for track in tracks]
+        if self.scanner is not None:
+            self.open_requests.append((paths, enqueue))
+            return
+        # آهنگ‌های بیرون از کتابخانه مثل تغییرات پوشه به لیست پخش اضافه می‌شوند
+        new = {track[0]: track for track in tracks if not self.find_track(track[0])[1]}
+        if new:
+            self.on_library_changes(list(new.values()), [], [])
+        if enqueue:
+            for file_path in paths:
+                self.play_queue.enqueue(file_path)
+            self.status_label.setText(f"در صف: {len(self.play_queue.upcoming)} آهنگ")
+            if self.is_playing or self.is_paused:
+                self.upcoming_changed()
+            else:
+                self.next_song()
+            return
+        # آهنگ اول پخش می‌شود و بقیه به همان ترتیب جلوی صف می‌روند
+        for file_path in reversed(paths[1:]):
+            self.play_queue.play_next(file_path)
+        self.play_track(lambda: paths[0])
+
+    @traced("update_album_art", _file_arg)
     def update_album_art(self, file_path):
-        pixmap = self.extract_album_art(file_path)
-        if pixmap and not pixmap.isNull():
-            scaled = pixmap.scaled(200, 200, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
-            self.album_art.setPixmap(scaled)
+        """نمایش کاور از کش یا شروع بارگذاری آن در پس‌زمینه"""
+        self.art_request += 1
+        image = self.art_cache.get(file_path)
+        if image is not None:
+            self.show_album_art(image)
+            return
+        self.show_album_art(QImage())
+        self.load_album_art(file_path, self.art_request)
+
+    def load_album_art(self, file_path, request_id=0):
+        loader = AlbumArtLoader(request_id, file_path, self.art_cache)
+        loader.signals.loaded.connect(self.on_album_art_loaded)
+        QThreadPool.globalInstance().start(loader)
+
+    def on_album_art_loaded(self, request_id, file_path, image):
+        self.art_cache.put(file_path, image)
+        # نتیجه درخواست‌های قدیمی (آهنگ‌های رد شده) فقط در کش می‌ماند
+        if request_id == self.art_request:
+            self.show_album_art(image)
+
+    def show_album_art(self, image):
+        if not image.isNull():
+            self.album_art.setPixmap(QPixmap.fromImage(image))
         else:
             self.album_art.setText("🎵")
             self.album_art.setPixmap(QPixmap())
 
+    @traced("update_waveform", _file_arg)
+    def update_waveform(self, file_path):
+        """نمایش شکل موج ذخیره شده یا شروع محاسبه آن در پس‌زمینه"""
+        if self.waveform_cache is None:
+            return
+        self.waveform_request += 1
+        if self.waveform_loader is not None:
+            self.waveform_loader.cancelled.set()
+            self.waveform_loader = None
+        peaks = self.waveform_cache.load(file_path)
+        self.progress_slider.set_peaks(peaks)
+        if peaks is not None:
+            return
+        loader = WaveformLoader(self.waveform_request, file_path, self.waveform_cache)
+        loader.signals.loaded.connect(self.on_waveform_loaded)
+        self.waveform_loader = loader
+        QThreadPool.globalInstance().start(loader)
+
+    def on_waveform_loaded(self, request_id, file_path, peaks):
+        if request_id == self.waveform_request:
+            self.waveform_loader = None
+            self.progress_slider.set_peaks(peaks)
+
+    @traced("play_current_song", _current_file)
     def play_current_song(self):
-        if not (0 <= self.current_index < len(self.music_files)):
+        if not (0 <= self.current_index < len(self.tracks)):
+            return
+        if not self.mixer_ready:
+            # صدا هنوز در حال راه‌اندازی است؛ پخش پس از آماده شدن شروع می‌شود
+            self.play_when_ready = True
+            self.status_label.setText("در حال آماده‌سازی صدا...")
             return
             
         try:
-            current_file = self.music_files[self.current_index]
-            pygame.mixer.music.load(current_file)
-            pygame.mixer.music.set_volume(self.volume)
+            current_file = self.tracks[self.current_index]
+            pygame.mixer.music.load(self.playback_path(current_file))
+            pygame.mixer.music.set_volume(self.track_volume(current_file))
             
-            # اگر موقعیت ذخیره شده وجود دارد، از آنجا شروع کن
-            if hasattr(self, 'resume_position') and self.resume_position > 0:
-                pygame.mixer.music.play(start=self.resume_position)
-                delattr(self, 'resume_position')
+            # اگر موقعیت ذخیره شده برای همین آهنگ وجود دارد، از آنجا شروع کن
+            current_time = self.resume_position if self.resume_file == current_file else 0
+            self.resume_file = None
+            if current_time > 0:
+                pygame.mixer.music.play(start=current_time)
             else:
                 pygame.mixer.music.play()
             
+            self.queued_file = None
             self.is_playing = True
             self.is_paused = False
             self.play_btn.setText("⏸")
             
-            title, artist = self.extract_metadata(current_file)
-            if not title:
-                title = os.path.basename(current_file)
-            if not artist:
-                artist = "ناشناس"
-                
-            self.song_title.setText(title)
-            self.artist_label.setText(artist)
-            self.update_album_art(current_file)
-            
-            self.total_duration = self.song_durations.get(current_file, 180)
-            self.total_time_label.setText(self.format_time(self.total_duration))
-            
-            # اگر موقعیت ذخیره شده داشتیم، آن را تنظیم کن
-            if hasattr(self, 'initial_position'):
-                current_time = self.initial_position
-                delattr(self, 'initial_position')
-            else:
-                current_time = 0
-                
-            self.current_time_label.setText(self.format_time(current_time))
-            progress = int((current_time / self.total_duration) * 1000) if self.total_duration > 0 else 0
-            self.progress_slider.setValue(min(progress, 1000))
-            self.current_position = current_time
-            self.song_list.setCurrentRow(self.current_index)
-            self.status_label.setText(f"در حال پخش: {title}")
-            
-            # ذخیره تنظیمات
-            self.save_settings()
+            self.drain_end_events()
+            self.clock.start(current_time)
+            self.show_current_song(current_time)
+            self.queue_next_song()
+            self.schedule_song_end()
+            self.update_refresh_timer()
             
         except Exception as e:
             print(f"خطا در پخش: {e}")
             QMessageBox.critical(self, "خطا", "خطا در پخش فایل!")
 
+    def show_current_song(self, current_time=0):
+        """به‌روزرسانی نمایش برای آهنگ فعلی (بدون بارگذاری صدا)"""
+        current_file = self.tracks[self.current_index]
+        self.play_queue.jump(self.current_view_row(), current_file)
+        self.watch_current_file(current_file)
+        
+        # متادیتا از نتایج اسکن؛ کاور در پس‌زمینه بارگذاری می‌شود
+        title = self.tracks.title(self.current_index)
+        artist = self.tracks.artist_name(self.current_index)
+            
+        self.song_title.setText(title)
+        self.artist_label.setText(artist)
+        self.update_album_art(current_file)
+        self.update_waveform(current_file)
+        # آهنگ بعدی صف gapless هم اینجا حجم خودش را می‌گیرد
+        self.apply_volume()
+        # جابجایی در انتظار مربوط به آهنگ قبلی بود
+        self.seek_timer.stop()
+        self.seek_target = None
+        self.stage_ahead()
+        
+        self.total_duration = self.tracks.durations[self.current_index]
+        self.total_time_label.setText(self.format_time(self.total_duration))
+            
+        self.current_time_label.setText(self.format_time(current_time))
+        progress = int((current_time / self.total_duration) * 1000) if self.total_duration > 0 else 0
+        self.progress_slider.setValue(min(progress, 1000))
+        self.current_position = current_time
+        self.select_row(self.current_index)
+        self.status_label.setText(f"در حال پخش: {title}")
+        
+        # ذخیره تنظیمات
+        self.save_settings()
+
+    def queue_next_song(self):
+        """قرار دادن آهنگ بعدی در صف pygame و پیش‌بارگذاری کاور آن"""
+        if not self.gapless or not self.tracks:
+            return
+        upcoming = self.play_queue.peek()
+        if not upcoming:
+            # پایان لیست با تکرار خاموش؛ آهنگ قبلاً صف شده با پایان آهنگ فعلی متوقف می‌شود
+            self.queued_file = None
+            return
+        next_file = upcoming[0]
+        try:
+            pygame.mixer.music.queue(self.playback_path(next_file))
+        except Exception as e:
+            print(f"خطا در صف‌بندی آهنگ بعدی: {e}")
+            return
+        self.queued_file = next_file
+        if self.art_cache.get(next_file) is None:
+            self.load_album_art(next_file)
+
+    def should_stage(self, file_path):
+        if self.staging is None:
+            return False
+        return self.staging_mode == "always" or is_remote_path(file_path)
+
+    def playback_path(self, file_path):
+        """مسیری که به pygame داده می‌شود: کپی محلی اگر آماده باشد"""
+        if self.should_stage(file_path):
+            local_path = self.staging.get(file_path)
+            if local_path is not None:
+                return local_path
+        return file_path
+
+    def stage_ahead(self):
+        """شروع کپی محلی آهنگ فعلی و staging_ahead آهنگ بعدی در پس‌زمینه"""
+        if self.staging is None or not (0 <= self.current_index < len(self.tracks)):
+            return
+        if self.staging_worker is not None:
+            self.staging_worker.cancel()
+            self.staging_worker = None
+        count = min(self.staging_ahead, len(self.tracks) - 1)
+        paths = [self.tracks[self.current_index]] + self.play_queue.peek(count=count)
+        paths = [file_path for file_path in dict.fromkeys(paths) if self.should_stage(file_path)]
+        if not paths:
+            return
+        # کپی آهنگ در حال پخش و آهنگ صف شده نباید حذف شود
+        self.staging.pin(paths[:2])
+        self.staging_worker = StagingWorker(paths, self.staging)
+        self.staging_worker.signals.staged.connect(self.on_track_staged)
+        QThreadPool.globalInstance().start(self.staging_worker)
+
+    def on_track_staged(self, file_path, local_path):
+        # آهنگ صف شده از مسیر شبکه با کپی محلی جایگزین می‌شود
+        if file_path == self.queued_file and self.mixer_ready:
+            try:
+                pygame.mixer.music.queue(local_path)
+            except Exception as e:
+                print(f"خطا در صف‌بندی آهنگ بعدی: {e}")
+
+    def drain_end_events(self):
+        """تعداد رویدادهای پایان آهنگ رسیده از pygame"""
+        if not self.end_events:
+            return 0
+        return len(pygame.event.get(self.music_end_event))
+
+    def schedule_song_end(self):
+        """تنظیم تایمر برای لحظه‌ای که آهنگ فعلی باید تمام شود"""
+        self.end_timer.stop()
+        self.mark_music_pos()
+        if self.is_playing and self.total_duration > 0:
+            remaining = self.total_duration - self.clock.position()
+            self.end_timer.start(max(int(remaining * 1000) + 50, 50))
+
+    def mark_music_pos(self):
+        if self.mixer_ready:
+            self.music_pos_mark = (pygame.mixer.music.get_pos(), self.clock.position())
+
+    def music_pos_dropped(self):
+        """آیا get_pos از آخرین نمونه عقب رفته است؟ (pygame آن را با شروع آهنگ صف شده صفر می‌کند)"""
+        mark_pos, mark_clock = self.music_pos_mark
+        expected = mark_pos + (self.clock.position() - mark_clock) * 1000
+        self.mark_music_pos()
+        return self.music_pos_mark[0] < expected - POS_DROP_MS
+
+    def check_song_end(self):
+        """بررسی پایان آهنگ در زمان پیش‌بینی شده"""
+        if not self.is_playing or self.is_paused:
+            return
+        
+        if self.end_events:
+            finished = self.drain_end_events() > 0
+        elif self.queued_file is not None:
+            # با آهنگ صف شده get_busy تا آخر آن True است
+            finished = self.music_pos_dropped()
+        else:
+            finished = not pygame.mixer.music.get_busy()
+        
+        if not finished:
+            # مدت ثبت شده در تگ‌ها کمی کوتاه‌تر از صدای واقعی است
+            self.end_timer.start(50)
+            return
+        
+        overshoot = max(self.clock.position() - self.total_duration, 0)
+        if not self.end_events:
+            # get_pos پس از برگشتن، موقعیت واقعی آهنگ صف شده است
+            overshoot = max(self.music_pos_mark[0], 0) / 1000
+        if self.queued_file is not None and pygame.mixer.music.get_busy():
+            # آهنگ صف شده بدون فاصله شروع شده است
+            index, found = self.find_track(self.queued_file)
+            self.queued_file = None
+            if found:
+                self.play_queue.next(auto=True)
+                self.current_index = index
+                self.clock.start(overshoot)
+                self.show_current_song(overshoot)
+                self.queue_next_song()
+                self.schedule_song_end()
+                return
+        self.next_song(auto=True)
+
+    def update_refresh_timer(self):
+        """تایمر نمایش فقط وقتی پخش در جریان است و پنجره دیده می‌شود کار می‌کند"""
+        visible = self.isVisible() and not self.isMinimized()
+        if self.is_playing and not self.is_paused and visible:
+            if not self.progress_timer.isActive():
+                self.progress_timer.start()
+        else:
+            self.progress_timer.stop()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_refresh_timer()
+        if self.is_playing:
+            self.update_progress()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.update_refresh_timer()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange:
+            self.update_refresh_timer()
+            if self.is_playing and not self.isMinimized():
+                self.update_progress()
+        elif event.type() == QEvent.ActivationChange and self.isActiveWindow():
+            # کاربر ممکن است تگ‌ها را در برنامه دیگری ویرایش کرده باشد
+            self.check_files()
+
     def play_pause(self):
-        if not self.music_files:
+        if not self.tracks:
             QMessageBox.warning(self, "خطا", "هیچ آهنگی برای پخش وجود ندارد.")
             return
+        if not self.mixer_ready:
+            self.play_when_ready = True
+            self.status_label.setText("در حال آماده‌سازی صدا...")
+            return
             
         if self.current_index == -1:
-            self.current_index = 0
-            self.play_current_song()
+            self.next_song()
         elif self.is_playing:
             pygame.mixer.music.pause()
+            self.clock.pause()
+            self.current_position = self.clock.position()
             self.is_paused = True
             self.is_playing = False
+            self.end_timer.stop()
+            self.update_refresh_timer()
             self.play_btn.setText("▶")
             self.status_label.setText("مکث شده")
         else:
             if self.is_paused:
                 pygame.mixer.music.unpause()
+                self.clock.resume()
                 self.is_paused = False
             else:
                 self.play_current_song()
             self.is_playing = True
+            self.schedule_song_end()
+            self.update_refresh_timer()
             self.play_btn.setText("⏸")
             self.status_label.setText("در حال پخش")
 
     def stop_music(self):
-        pygame.mixer.music.stop()
+        if self.mixer_ready:
+            pygame.mixer.music.stop()
+        self.queued_file = None
         self.is_playing = False
         self.is_paused = False
+        self.clock.stop()
+        self.end_timer.stop()
+        self.update_refresh_timer()
         self.play_btn.setText("▶")
         self.progress_slider.setValue(0)
         self.current_time_label.setText("00:00")
         self.status_label.setText("متوقف شد")
 
     def prev_song(self):
-        if not self.music_files: return
-        self.stop_music()
-        self.current_index = (self.current_index - 1) % len(self.music_files)
-        self.play_current_song()
+        if not self.tracks: return
+        self.play_track(self.play_queue.previous)
 
-    def next_song(self):
-        if not self.music_files: return
-        self.stop_music()
-        self.current_index = (self.current_index + 1) % len(self.music_files)
-        self.play_current_song()
+    def next_song(self, auto=False):
+        """آهنگ بعدی از صف کاربر یا ترتیب پخش؛ auto یعنی آهنگ قبلی تمام شده"""
+        if not self.tracks: return
+        if not self.play_track(lambda: self.play_queue.next(auto)):
+            self.stop_music()
+            self.status_label.setText("پایان لیست پخش")
+
+    def play_track(self, step):
+        """پخش مسیری که step برمی‌گرداند؛ مسیرهای حذف شده از کتابخانه رد می‌شوند"""
+        for _ in range(16):
+            file_path = step()
+            if file_path is None:
+                return False
+            index, found = self.find_track(file_path)
+            if found:
+                self.stop_music()
+                self.current_index = index
+                self.play_current_song()
+                return True
+        return False
+
+    def select_row(self, row):
+        """انتخاب و نمایش یک ردیف در لیست پخش (اگر با جستجو فیلتر نشده باشد)"""
+        view_row = self.song_model.view_row(row)
+        if view_row < 0:
+            self.song_list.clearSelection()
+            return
+        index = self.song_model.index(view_row)
+        self.song_list.setCurrentIndex(index)
+        self.song_list.scrollTo(index)
 
-    def play_selected_song(self, item):
-        index = self.song_list.row(item)
-        if 0 <= index < len(self.music_files):
+    def play_selected_song(self, model_index):
+        index = self.song_model.source_row(model_index.row())
+        if 0 <= index < len(self.tracks):
             self.stop_music()
             self.current_index = index
             self.play_current_song()
@@ -592,47 +2718,119 @@ class MusicPlayer(QMainWindow):
     def change_volume(self, value):
         self.volume = value / 100.0
         self.volume_label.setText(f"{value}%")
-        if pygame.mixer.get_init():
-            pygame.mixer.music.set_volume(self.volume)
+        self.apply_volume()
 
     def update_progress(self):
-        if self.is_playing and pygame.mixer.music.get_busy() and not self.seeking:
-            try:
-                current_time = pygame.mixer.music.get_pos() / 1000.0
-                if current_time >= 0 and self.total_duration > 0:
-                    self.current_position = current_time
-                    progress = int((current_time / self.total_duration) * 1000)
-                    self.progress_slider.setValue(min(progress, 1000))
-                    self.current_time_label.setText(self.format_time(current_time))
-            except:
-                pass
-
-    def check_song_end(self):
-        if self.is_playing and not pygame.mixer.music.get_busy() and not self.is_paused:
-            if self.current_position >= self.total_duration - 1:
-                self.next_song()
+        if self.is_playing and not self.seeking and self.total_duration > 0:
+            current_time = min(self.clock.position(), self.total_duration)
+            self.current_position = current_time
+            progress = int((current_time / self.total_duration) * 1000)
+            self.progress_slider.setValue(min(progress, 1000))
+            self.current_time_label.setText(self.format_time(current_time))
 
     def start_seeking(self):
         self.seeking = True
 
     def end_seeking(self):
-        if self.is_playing and self.total_duration > 0:
-            new_position = (self.progress_slider.value() / 1000.0) * self.total_duration
-            try:
-                current_file = self.music_files[self.current_index]
-                pygame.mixer.music.load(current_file)
-                pygame.mixer.music.play(start=new_position)
-                pygame.mixer.music.set_volume(self.volume)
-                self.current_position = new_position
-                self.current_time_label.setText(self.format_time(new_position))
-            except:
-                pass
+        if self.total_duration > 0:
+            self.seek_timer.stop()
+            self.seek_target = None
+            self.seek_to((self.progress_slider.value() / 1000.0) * self.total_duration)
         self.seeking = False
 
     def update_seek_position(self, value):
         if self.total_duration > 0:
             position = (value / 1000.0) * self.total_duration
             self.current_time_label.setText(self.format_time(position))
+            # شنیدن همزمان با کشیدن نوار، مگر این فایل فقط با load جابجا شود
+            if self.seek_reload_file != self.tracks[self.current_index]:
+                self.request_seek(position)
+
+    def seek_relative(self, delta):
+        """جابجایی نسبت به موقعیت فعلی؛ فشردن‌های پشت سر هم روی هم جمع می‌شوند"""
+        if not (self.is_playing or self.is_paused) or self.seeking:
+            return
+        base = self.seek_target if self.seek_target is not None else self.clock.position()
+        self.request_seek(base + delta)
+
+    def request_seek(self, position):
+        """اولین جابجایی بلافاصله؛ بقیه تا پایان بازه throttle فقط آخرین مقصد را عوض می‌کنند"""
+        self.seek_target = position
+        if not self.seek_timer.isActive():
+            self.flush_seek()
+            self.seek_timer.start()
+
+    def on_seek_timer(self):
+        if self.seek_target is not None:
+            self.flush_seek()
+            self.seek_timer.start()
+
+    def flush_seek(self):
+        position, self.seek_target = self.seek_target, None
+        if position is not None:
+            self.seek_to(position)
+
+    @traced("seek", _current_file)
+    def seek_to(self, position):
+        """جابجایی در آهنگ فعلی؛ در حالت مکث، مکث باقی می‌ماند"""
+        if not (self.is_playing or self.is_paused) or self.total_duration <= 0:
+            return
+        if not (0 <= self.current_index < len(self.tracks)):
+            return
+        current_file = self.tracks[self.current_index]
+        position = max(0.0, min(position, self.total_duration - 1.0))
+        try:
+            if not self.set_stream_position(current_file, position):
+                self.reload_at(current_file, position)
+        except Exception as e:
+            print(f"خطا در جابجایی: {e}")
+            return
+        self.clock.seek(position)
+        self.current_position = position
+        self.current_time_label.setText(self.format_time(position))
+        if not self.seeking:
+            self.progress_slider.setValue(min(int(position / self.total_duration * 1000), 1000))
+        if self.is_playing:
+            self.schedule_song_end()
+
+    def set_stream_position(self, file_path, position):
+        """جابجایی در همان stream باز؛ False اگر decoder این فایل پشتیبانی نکند"""
+        if file_path == self.seek_reload_file:
+            return False
+        try:
+            if file_path.lower().endswith(".mp3"):
+                # set_pos در MP3 نسبت به موقعیت فعلی است
+                pygame.mixer.music.rewind()
+            pygame.mixer.music.set_pos(position)
+        except pygame.error:
+            self.seek_reload_file = file_path
+            return False
+        return True
+
+    def reload_at(self, file_path, position):
+        """روش قدیمی: بارگذاری دوباره فایل و پخش از position"""
+        pygame.mixer.music.load(self.playback_path(file_path))
+        pygame.mixer.music.play(start=position)
+        pygame.mixer.music.set_volume(self.track_volume(file_path))
+        if self.is_paused:
+            pygame.mixer.music.pause()
+        # load صف را خالی می‌کند
+        self.queued_file = None
+        self.drain_end_events()
+        self.queue_next_song()
+
+    def toggle_perf_overlay(self):
+        """نمایش overlay؛ اگر trace از خط فرمان فعال نشده فقط تا زمان نمایش ثبت می‌شود"""
+        if self.perf_overlay.isVisible():
+            self.perf_overlay.stop()
+            if not self.trace_file:
+                tracer.enable(False)
+                self.stall_detector.stop()
+            return
+        if not tracer.enabled:
+            tracer.enable()
+            self.stall_detector.start()
+        self.perf_overlay.start()
 
     def format_time(self, seconds):
         if seconds < 0:
@@ -643,16 +2841,45 @@ class MusicPlayer(QMainWindow):
 
     def closeEvent(self, event):
         """ذخیره وضعیت نهایی هنگام بستن برنامه"""
-        if self.is_playing and 0 <= self.current_index < len(self.music_files):
-            self.current_position = pygame.mixer.music.get_pos() / 1000.0
-        
-        self.stop_music()
         self.save_settings()
-        pygame.mixer.quit()
+        self.stop_music()
+        self.settings.close()
+        self.cancel_scan()
+        if self.gain_analyzer is not None:
+            self.gain_analyzer.cancel()
+        if self.staging_worker is not None:
+            self.staging_worker.cancel()
+        if self.duplicate_finder is not None:
+            self.duplicate_finder.cancel()
+        if self.file_checker is not None:
+            self.file_checker.cancel()
+        QThreadPool.globalInstance().waitForDone(2000)
+        self.background_pool.waitForDone(2000)
+        self.library_index.close()
+        if self.mixer_ready:
+            pygame.mixer.quit()
+        if self.trace_file:
+            try:
+                count = tracer.export_chrome_trace(self.trace_file)
+                print(f"trace ({count} رویداد) در {self.trace_file} ذخیره شد")
+            except OSError as e:
+                print(f"خطا در ذخیره trace: {e}")
         event.accept()
 
 
 def main():
+    if "--index" in sys.argv:
+        # ایندکس‌ساز بدون رابط گرافیکی (مثلاً از cron)
+        sys.exit(index_main(sys.argv[1:]))
+    startup_benchmark = "--startup-benchmark" in sys.argv
+    if startup_benchmark:
+        sys.argv.remove("--startup-benchmark")
+    # --trace: ثبت spanها از ابتدا و ذخیره Chrome trace هنگام بستن
+    trace_file = None
+    if "--trace" in sys.argv:
+        sys.argv.remove("--trace")
+        trace_file = str(get_app_data_dir() / "trace.json")
+        tracer.enable()
     app = QApplication(sys.argv)
     
     # مسیر مطلق آیکون
@@ -674,9 +2901,17 @@ def main():
     app.setWindowIcon(app_icon)
     app.setStyle('Fusion')
     
-    player = MusicPlayer()
+    player = MusicPlayer(startup_benchmark=startup_benchmark, trace_file=trace_file)
     player.show()
     
+    # اجراهای بعدی برنامه فایل‌هایشان را به همین پنجره می‌فرستند
+    instance_server = InstanceServer(player)
+    instance_server.files_received.connect(player.open_paths)
+    instance_server.listen()
+    request = single_instance.parse_args(sys.argv[1:])
+    if request is not None and request[0]:
+        player.open_paths(*request)
+    
     sys.exit(app.exec_())
 
 
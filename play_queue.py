@@ -0,0 +1,368 @@
+# play_queue.py - ترتیب پخش: shuffle بدون تکرار، صف کاربر، تاریخچه و حالت‌های تکرار
+import random
+from array import array
+from collections import deque
+from itertools import islice
+
+REPEAT_OFF = "off"
+REPEAT_ALL = "all"
+REPEAT_ONE = "one"
+REPEAT_MODES = (REPEAT_OFF, REPEAT_ALL, REPEAT_ONE)
+
+HISTORY_SIZE = 1000
+# حداکثر انتخاب‌های مستقیم هر دور که برای بازسازی دقیق shuffle ذخیره می‌شوند
+MAX_PLACED = 256
+
+
+class PlayQueue:
+    """ترتیب پخش روی items (دنباله مسیرها به ترتیب نما، با len و اندیس)
+
+    shuffle با Fisher–Yates تنبل انجام می‌شود: perm فقط یک آرایه int است و
+    هر next یک جابجایی O(1) را ثابت می‌کند، پس shuffle دوباره حتی برای
+    صدها هزار آهنگ فقط ساخت دو آرایه است. تا همه آهنگ‌ها پخش نشده‌اند هیچ
+    آهنگی تکرار نمی‌شود، حتی اگر ترتیب نما (جستجو، مرتب‌سازی) عوض شود.
+    وضعیت با seed و تعداد جابجایی‌ها ذخیره می‌شود و بازیابی آن فقط همان
+    جابجایی‌ها را دوباره اجرا می‌کند.
+    تاریخچه و صف کاربر مسیر نگه می‌دارند تا با تغییر نما معتبر بمانند.
+    """
+
+    def __init__(self, items=(), shuffle=False, repeat=REPEAT_ALL, seed=None):
+        self.items = items
+        self.shuffle = shuffle
+        self.repeat = repeat
+        self.seed = seed if seed is not None else random.randrange(1 << 30)
+        self.cycle = 0
+        self.pos = -1
+        self.perm = None
+        self.where = None
+        self.filled = 0
+        # تعداد خانه‌های پخش شده این دور؛ خانه‌های بعد از آن را فقط peek ثابت کرده
+        # است (pos با previous ممکن است عقب‌تر باشد)
+        self.played = 0
+        self.rng = None
+        # (خانه، position) آهنگ‌هایی که در این دور مستقیم انتخاب شده‌اند
+        self.placed = []
+        # مسیر آهنگ هر خانه ثابت شده perm، برای تشخیص تغییر نما
+        self.fixed_paths = []
+        # مسیرهای پخش شده این دور که پس از تغییر نما دوباره ثابت می‌شوند و
+        # آن‌هایی که در نمای فعلی نیستند (مثلاً با جستجو پنهان شده‌اند)
+        self.carry = None
+        self.absent = []
+        self.upcoming = deque()
+        # (path, position) آهنگ‌های پخش شده؛ back تعداد قدم‌های عقب رفته است
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self.back = 0
+        self.pending_state = None
+
+    # --- ترتیب ---
+
+    def set_items(self, items, position=-1):
+        """ترتیب نما عوض شده (یا شاید نه)؛ position خانه آهنگ فعلی در نمای جدید
+
+        اگر خانه‌های ثابت شده همان آهنگ‌ها را دارند جایگشت حفظ می‌شود؛ وگرنه
+        آهنگ‌های پخش شده این دور به نمای جدید منتقل می‌شوند (در اولین استفاده).
+        """
+        self.items = items
+        if self.perm is not None and self._perm_matches():
+            if 0 <= position < len(items):
+                self.pos = self._slot(position)
+                self._mark_played()
+            return
+        if self.perm is not None:
+            self.carry = self.absent + self.fixed_paths[:max(self.pos + 1, self.played)]
+        self.perm = None
+        self.pos = position
+
+    def _perm_matches(self):
+        """آیا خانه‌های ثابت شده هنوز همان مسیرها هستند؟ (آهنگ‌های جدید در انتها مجاز است)"""
+        items, perm = self.items, self.perm
+        if len(items) < len(perm):
+            return False
+        if self.absent:
+            # آهنگ پخش شده‌ای که پنهان بود دوباره در نما آمده است
+            absent = set(self.absent)
+            if any(items[position] in absent for position in range(len(items))):
+                return False
+        return all(items[perm[slot]] == path for slot, path in enumerate(self.fixed_paths))
+
+    def set_shuffle(self, shuffle, position=-1):
+        self.shuffle = shuffle
+        if shuffle:
+            self.seed = random.randrange(1 << 30)
+            self.cycle = 0
+        self.perm = None
+        self.carry = None
+        self.absent = []
+        self.pos = position
+
+    def _ensure_perm(self):
+        """ساخت (یا بزرگ کردن) جایگشت برای اندازه فعلی items"""
+        size = len(self.items)
+        if self.perm is not None and len(self.perm) == size:
+            return
+        if self.perm is not None and len(self.perm) < size:
+            # آهنگ‌های اضافه شده در طول اسکن به انتهای بخش پخش نشده می‌روند
+            self.perm.extend(range(len(self.perm), size))
+            self.where.extend(range(len(self.where), size))
+            return
+        current = self.pos if self.perm is None else -1
+        self.perm = array("i", range(size))
+        self.where = array("i", range(size))
+        self.filled = 0
+        self.played = 0
+        self.placed = []
+        self.fixed_paths = []
+        self.pos = -1
+        carry, self.carry = self.carry, None
+        state, self.pending_state = self.pending_state, None
+        if carry is None or self.rng is None:
+            self.rng = random.Random(self.seed * 1000003 + self.cycle)
+        if carry:
+            # نما عوض شده: آهنگ‌های پخش شده این دور در نمای جدید دوباره ثابت
+            # می‌شوند و ادامه دور از همان rng است
+            positions = {}
+            for position in range(size):
+                positions.setdefault(self.items[position], position)
+            self.absent = []
+            for path in carry:
+                position = positions.get(path)
+                if position is None:
+                    self.absent.append(path)
+                elif self.where[position] >= self.filled:
+                    self._place(position)
+                    self.pos = self.filled - 1
+        elif state is not None and state.get("size") == size:
+            # همان جابجایی‌های جلسه قبل، به همراه انتخاب‌های مستقیم کاربر
+            placed = {slot: position for slot, position in state.get("placed", ())}
+            for _ in range(min(state.get("played", 0), size)):
+                position = placed.get(self.filled)
+                if position is not None and 0 <= position < size:
+                    self._place(position)
+                else:
+                    self._fix()
+                self.pos = self.filled - 1
+        self.played = self.filled
+        if 0 <= current < size:
+            self.pos = self._place(current)
+            self._mark_played()
+
+    def _mark_played(self):
+        if self.shuffle and self.pos + 1 > self.played:
+            self.played = self.pos + 1
+
+    def _fix(self):
+        """یک قدم Fisher–Yates: آهنگ تصادفی بعدی از بخش پخش نشده"""
+        perm, where, i = self.perm, self.where, self.filled
+        j = self.rng.randrange(i, len(perm))
+        a, b = perm[i], perm[j]
+        perm[i], perm[j] = b, a
+        where[b], where[a] = i, j
+        self.filled = i + 1
+        self.fixed_paths.append(self.items[b])
+        return b
+
+    def _place(self, position):
+        """شماره خانه perm برای position؛ آهنگ پخش نشده به خانه بعد از pos منتقل می‌شود
+
+        خانه‌هایی که فقط peek ثابت کرده هنوز پخش نشده‌اند؛ این خانه‌ها به بخش
+        پخش نشده برمی‌گردند تا پریدن به آهنگ دیگر آن‌ها را از دور جا نیندازد.
+        خانه‌های پخش شده (تا played) حتی پس از previous ثابت می‌مانند.
+        """
+        slot = self.where[position]
+        if slot < self.filled:
+            return slot
+        keep = max(self.pos + 1, self.played)
+        if keep < self.filled:
+            self.filled = keep
+            del self.fixed_paths[self.filled:]
+            self.placed = [entry for entry in self.placed if entry[0] < self.filled]
+        perm, where, i = self.perm, self.where, self.filled
+        other = perm[i]
+        perm[i], perm[slot] = position, other
+        where[position], where[other] = i, slot
+        self.filled = i + 1
+        self.fixed_paths.append(self.items[position])
+        if len(self.placed) < MAX_PLACED:
+            self.placed.append((i, position))
+        return i
+
+    def _order_step(self, step, wrap):
+        """position بعدی (یا قبلی) در ترتیب پخش بدون تغییر pos؛ None در انتها"""
+        size = len(self.items)
+        if not size:
+            return None
+        if not self.shuffle:
+            target = self.pos + step
+            if 0 <= target < size:
+                return target
+            return target % size if wrap else None
+        self._ensure_perm()
+        target = self.pos + step
+        if step < 0:
+            return self.perm[target] if target >= 0 else None
+        if target < self.filled:
+            return self.perm[target]
+        if self.filled < size:
+            return self._fix()
+        if not wrap:
+            return None
+        # همه پخش شده‌اند: دور جدید با همان آرایه و seed بعدی
+        self.cycle += 1
+        self.rng = random.Random(self.seed * 1000003 + self.cycle)
+        self.filled = 0
+        self.played = 0
+        self.placed = []
+        self.fixed_paths = []
+        self.absent = []
+        self.pos = -1
+        return self._fix()
+
+    def _slot(self, position):
+        if not self.shuffle:
+            return position
+        self._ensure_perm()
+        return self._place(position)
+
+    # --- پخش ---
+
+    def current(self):
+        if self.history and self.back < len(self.history):
+            return self.history[-1 - self.back][0]
+        return None
+
+    def jump(self, position, path=None):
+        """آهنگ path (در خانه position نما، یا -1) در حال پخش است
+
+        برای آهنگی که خود صف انتخاب کرده فقط جای فعلی به‌روز می‌شود؛ انتخاب
+        مستقیم کاربر به تاریخچه اضافه می‌شود.
+        """
+        if 0 <= position < len(self.items):
+            path = self.items[position]
+            self.pos = self._slot(position)
+            self._mark_played()
+        elif self.shuffle and path is not None and path != self.current():
+            # آهنگ خارج از نما (مثلاً آهنگ بعدی آماده شده پیش از جستجو)؛ وقتی
+            # دوباره در نما بیاید در این دور تکرار نمی‌شود
+            hidden = self.carry if self.carry is not None else self.absent
+            if path not in hidden:
+                hidden.append(path)
+        if path is not None and path != self.current():
+            self._record(path, position)
+
+    def _record(self, path, position):
+        # انتخاب جدید پس از عقب رفتن، شاخه جلوی تاریخچه را حذف می‌کند
+        while self.back > 0:
+            self.history.pop()
+            self.back -= 1
+        self.history.append((path, position))
+
+    def peek(self, auto=True, count=1):
+        """آهنگ‌های بعدی بدون جلو رفتن (برای صف gapless و کپی محلی)"""
+        result = []
+        if auto and self.repeat == REPEAT_ONE and self.current() is not None:
+            return [self.current()] * count
+        for i in range(1, min(self.back, count) + 1):
+            result.append(self.history[-1 - self.back + i][0])
+        result.extend(islice(self.upcoming, count - len(result)))
+        if self.shuffle:
+            # تا ساخت جایگشت pos ردیف نماست، نه خانه perm
+            self._ensure_perm()
+        saved_pos, saved_cycle = self.pos, self.cycle
+        wrap = self.repeat != REPEAT_OFF or not auto
+        while len(result) < count:
+            position = self._order_step(1, wrap)
+            if position is None:
+                break
+            # دور جدید shuffle فقط وقتی شروع می‌شود که آهنگ بعدی در دور فعلی نباشد
+            wrap = wrap and not self.shuffle
+            result.append(self.items[position])
+            self.pos = self._slot(position) if self.shuffle else position
+        # اگر دور جدید shuffle شروع شده، آهنگ بعدی اولین خانه آن است
+        self.pos = saved_pos if self.cycle == saved_cycle else -1
+        return result
+
+    def next(self, auto=False):
+        """مسیر آهنگ بعدی یا None (پایان لیست با تکرار خاموش)
+
+        auto یعنی آهنگ قبلی تمام شده است؛ فقط در این حالت تکرار تک آهنگ
+        و توقف در پایان لیست اعمال می‌شود.
+        """
+        if auto and self.repeat == REPEAT_ONE and self.current() is not None:
+            return self.current()
+        if self.back > 0:
+            self.back -= 1
+            path, position = self.history[-1 - self.back]
+            if position >= 0 and position < len(self.items) and self.items[position] == path:
+                self.pos = self._slot(position)
+            return path
+        if self.upcoming:
+            path = self.upcoming.popleft()
+            self._record(path, -1)
+            return path
+        position = self._order_step(1, self.repeat != REPEAT_OFF or not auto)
+        if position is None:
+            return None
+        self.pos = self._slot(position) if self.shuffle else position
+        self._mark_played()
+        self._record(self.items[position], position)
+        return self.items[position]
+
+    def previous(self):
+        """آهنگ قبلی از تاریخچه، یا آهنگ قبلی ترتیب پخش"""
+        if self.back + 1 < len(self.history):
+            self.back += 1
+            path, position = self.history[-1 - self.back]
+            if position >= 0 and position < len(self.items) and self.items[position] == path:
+                self.pos = self._slot(position)
+            return path
+        position = self._order_step(-1, True)
+        if position is None:
+            return None
+        self.pos = self._slot(position) if self.shuffle else position
+        # آهنگ قدیمی‌تر از ابتدای تاریخچه: به ابتدای آن اضافه می‌شود
+        if len(self.history) < HISTORY_SIZE:
+            self.history.appendleft((self.items[position], position))
+            self.back = len(self.history) - 1
+        return self.items[position]
+
+    # --- صف کاربر ---
+
+    def enqueue(self, path):
+        self.upcoming.append(path)
+
+    def play_next(self, path):
+        self.upcoming.appendleft(path)
+
+    def dequeue(self):
+        return self.upcoming.popleft() if self.upcoming else None
+
+    def clear_queue(self):
+        self.upcoming.clear()
+
+    # --- ذخیره ---
+
+    def state(self):
+        """وضعیت قابل ذخیره در تنظیمات؛ ترتیب shuffle از روی seed بازسازی می‌شود"""
+        state = {"shuffle": self.shuffle, "repeat": self.repeat}
+        if self.shuffle and self.perm is not None:
+            state.update(seed=self.seed, cycle=self.cycle, size=len(self.perm),
+                         played=self.filled, placed=self.placed)
+        elif self.shuffle and self.pending_state is not None:
+            # جایگشت هنوز ساخته نشده؛ وضعیت قبلی دست نخورده می‌ماند
+            state = dict(self.pending_state, repeat=self.repeat)
+        return state
+
+    def restore(self, state):
+        """بازیابی shuffle جلسه قبل؛ جایگشت در اولین استفاده از روی seed ساخته می‌شود"""
+        if not isinstance(state, dict):
+            return
+        self.repeat = state.get("repeat", self.repeat)
+        if self.repeat not in REPEAT_MODES:
+            self.repeat = REPEAT_ALL
+        self.shuffle = bool(state.get("shuffle", False))
+        if self.shuffle:
+            self.seed = int(state.get("seed", self.seed))
+            self.cycle = int(state.get("cycle", 0))
+            self.pending_state = state
+            self.perm = None
+            self.pos = -1
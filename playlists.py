@@ -0,0 +1,168 @@
+# playlists.py - لیست‌های پخش M3U/M3U8 (خواندن خط به خط، نوشتن اتمی)
+import os
+import re
+from urllib.parse import unquote, urlparse
+
+PLAYLIST_EXTENSIONS = (".m3u8", ".m3u")
+
+_INVALID_NAME_RE = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def _resolve(base, line):
+    """مسیر مطلق و نرمال یک خط لیست پخش"""
+    if "://" in line:
+        url = urlparse(line)
+        if url.scheme != "file":
+            return None
+        line = unquote(url.path)
+        if os.name == "nt" and line[:1] == "/" and line[2:3] == ":":
+            line = line[1:]
+    elif os.sep == "/" and "\\" in line:
+        # لیست‌های ساخته شده در ویندوز
+        line = line.replace("\\", "/")
+    if not os.path.isabs(line):
+        line = os.path.join(base, line)
+    # مسیرهای تمیز (حالت معمول) بدون normpath
+    if os.sep == "/" and "/." not in line and "//" not in line:
+        return line
+    return os.path.normpath(line)
+
+
+def parse_m3u(path):
+    """خروجی (path, title, duration) برای هر آهنگ، بدون نگه داشتن کل فایل در حافظه
+
+    مسیرهای نسبی نسبت به پوشه خود فایل لیست حل می‌شوند. title و duration
+    از خط #EXTINF قبلی هستند (یا None). آدرس‌های اینترنتی نادیده گرفته می‌شوند.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    title = duration = None
+    # BOM و فایل‌های قدیمی غیر UTF-8 خواندن را متوقف نمی‌کنند
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line[0] == "#":
+                if line.startswith("#EXTINF:"):
+                    info, _, name = line[8:].partition(",")
+                    try:
+                        duration = float(info.split(None, 1)[0]) if info else None
+                    except ValueError:
+                        duration = None
+                    if duration is not None and duration < 0:
+                        duration = None
+                    title = name.strip() or None
+                continue
+            file_path = _resolve(base, line)
+            if file_path is not None:
+                yield file_path, title, duration
+            title = duration = None
+
+
+def read_m3u_paths(path):
+    """فقط مسیرهای یک لیست پخش (سریع‌ترین حالت، برای لیست‌های ذخیره شده)"""
+    base = os.path.dirname(os.path.abspath(path))
+    paths = []
+    append = paths.append
+    # خط‌های مطلق و تمیز (همه لیست‌های ذخیره شده خود برنامه) بدون پردازش اضافه
+    fast = os.sep == "/"
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line[0] == "#":
+                continue
+            if fast and line[0] == "/" and "/." not in line and "//" not in line \
+                    and "\\" not in line:
+                append(line)
+                continue
+            file_path = _resolve(base, line)
+            if file_path is not None:
+                append(file_path)
+    return paths
+
+
+def write_m3u(path, entries, relative=True):
+    """نوشتن [(path, title, duration)] به صورت M3U گسترش یافته با UTF-8
+
+    با relative آهنگ‌های داخل پوشه فایل لیست با مسیر نسبی نوشته می‌شوند.
+    """
+    base = os.path.join(os.path.dirname(os.path.abspath(path)), "")
+    tmp_path = f"{path}.tmp"
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+        f.write("#EXTM3U\n")
+        for file_path, title, duration in entries:
+            if title or duration:
+                seconds = int(round(duration)) if duration else -1
+                f.write(f"#EXTINF:{seconds},{title or os.path.basename(file_path)}\n")
+            if relative and file_path.startswith(base):
+                file_path = file_path[len(base):]
+            f.write(file_path + "\n")
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def playlist_name(text):
+    """نام قابل استفاده به عنوان نام فایل"""
+    return _INVALID_NAME_RE.sub("_", text).strip(" .")
+
+
+class PlaylistStore:
+    """لیست‌های پخش نام‌دار به صورت فایل‌های m3u8 در یک پوشه
+
+    مسیرهای هر لیست تا تغییر فایل آن در حافظه نگه داشته می‌شوند.
+    """
+
+    def __init__(self, folder):
+        self.folder = str(folder)
+        os.makedirs(self.folder, exist_ok=True)
+        self.cache = {}
+
+    def path(self, name):
+        return os.path.join(self.folder, name + ".m3u8")
+
+    def names(self):
+        try:
+            files = os.listdir(self.folder)
+        except OSError:
+            return []
+        names = [name[:-5] for name in files if name.endswith(".m3u8")]
+        return sorted(names, key=str.casefold)
+
+    def load(self, name):
+        """مسیرهای آهنگ‌های یک لیست به ترتیب"""
+        path = self.path(name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.cache.pop(name, None)
+            return []
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self.cache.get(name)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        paths = read_m3u_paths(path)
+        self.cache[name] = (stamp, paths)
+        return paths
+
+    def save(self, name, entries):
+        """ذخیره [(path, title, duration)] با مسیرهای مطلق؛ تعداد آهنگ‌ها را برمی‌گرداند"""
+        self.cache.pop(name, None)
+        return write_m3u(self.path(name), entries, relative=False)
+
+    def delete(self, name):
+        self.cache.pop(name, None)
+        try:
+            os.remove(self.path(name))
+        except OSError:
+            pass
+
+    def unique_name(self, name):
+        """نامی که هنوز استفاده نشده (name، name (2)، ...)"""
+        existing = {n.casefold() for n in self.names()}
+        candidate, number = name, 2
+        while candidate.casefold() in existing:
+            candidate = f"{name} ({number})"
+            number += 1
+        return candidate
@@ -0,0 +1,121 @@
+# search_index.py - ایندکس جستجوی سریع روی عنوان، هنرمند، آلبوم و نام فایل
+import os
+import re
+import bisect
+from collections import OrderedDict
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    """کلمات نرمال شده (حروف کوچک، بدون علائم) یک متن"""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.casefold())
+
+
+class SearchIndex:
+    """ایندکس معکوس کلمه → شناسه آهنگ با جستجوی پیشوندی
+
+    شناسه‌ها را TrackStore می‌دهد و ایندکس مسیرها را نگه نمی‌دارد. کلمات به
+    صورت مرتب نگه داشته می‌شوند تا همه کلمات با یک پیشوند با دو جستجوی
+    دودویی پیدا شوند. هر کلمه یک بار ذخیره و بین همه آهنگ‌ها مشترک است.
+    """
+
+    CACHE_SIZE = 64
+
+    def __init__(self):
+        self.tokens_of = []      # id -> tuple کلمات
+        self.postings = {}       # token -> set(id)
+        self.vocabulary = {}     # token -> همان رشته مشترک
+        self.sorted_tokens = []
+        self.tokens_dirty = False
+        self.cache = OrderedDict()
+
+    def add(self, track_id, path, *fields):
+        """افزودن یا به‌روزرسانی آهنگ track_id"""
+        tokens = set(tokenize(os.path.splitext(os.path.basename(path))[0]))
+        for field in fields:
+            tokens.update(tokenize(field))
+
+        if track_id >= len(self.tokens_of):
+            self.tokens_of.extend([()] * (track_id + 1 - len(self.tokens_of)))
+        self._unlink(track_id)
+
+        vocabulary = self.vocabulary
+        shared = []
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                self.postings[token] = {track_id}
+                vocabulary[token] = token
+                self.tokens_dirty = True
+            else:
+                ids.add(track_id)
+                token = vocabulary[token]
+            shared.append(token)
+        self.tokens_of[track_id] = tuple(shared)
+        self.cache.clear()
+
+    def remove(self, track_id):
+        if track_id >= len(self.tokens_of):
+            return
+        self._unlink(track_id)
+        self.tokens_of[track_id] = ()
+        self.cache.clear()
+
+    def _unlink(self, track_id):
+        for token in self.tokens_of[track_id]:
+            ids = self.postings[token]
+            ids.discard(track_id)
+            if not ids:
+                del self.postings[token]
+                del self.vocabulary[token]
+                self.tokens_dirty = True
+
+    def clear(self):
+        self.__init__()
+
+    def _prefix_ids(self, prefix):
+        """همه شناسه‌هایی که کلمه‌ای با این پیشوند دارند"""
+        result = self.cache.get(prefix)
+        if result is not None:
+            self.cache.move_to_end(prefix)
+            return result
+
+        if self.tokens_dirty:
+            self.sorted_tokens = sorted(self.postings)
+            self.tokens_dirty = False
+        start = bisect.bisect_left(self.sorted_tokens, prefix)
+        end = bisect.bisect_left(self.sorted_tokens, prefix + "\U0010ffff", start)
+
+        if end - start == 1:
+            result = self.postings[self.sorted_tokens[start]]
+        else:
+            postings = self.postings
+            result = set().union(*[postings[token] for token in self.sorted_tokens[start:end]])
+
+        self.cache[prefix] = result
+        if len(self.cache) > self.CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return result
+
+    def search(self, query):
+        """شناسه آهنگ‌هایی که همه کلمات query (به صورت پیشوند) را دارند
+
+        برای query خالی None برمی‌گرداند (یعنی بدون فیلتر). مجموعه برگشتی
+        ممکن است از کش باشد و نباید تغییر داده شود.
+        """
+        words = tokenize(query)
+        if not words:
+            return None
+        # کلمات طولانی‌تر معمولاً نتیجه کمتری دارند؛ اشتراک از کوچک‌ترین شروع می‌شود
+        sets = sorted((self._prefix_ids(word) for word in set(words)), key=len)
+        if len(sets) == 1:
+            return sets[0]
+        result = set(sets[0])
+        for ids in sets[1:]:
+            result.intersection_update(ids)
+            if not result:
+                break
+        return result
@@ -0,0 +1,97 @@
+# settings_store.py - ذخیره تنظیمات با تأخیر، به صورت اتمی و در ترد پس‌زمینه
+import os
+import json
+import threading
+
+
+class SettingsStore:
+    """نگهداری تنظیمات در حافظه و نوشتن آن‌ها روی دیسک در پس‌زمینه
+
+    چند تغییر پشت سر هم در یک نوشتن ادغام می‌شوند (پرچم dirty + تأخیر).
+    نوشتن در فایل موقت، fsync و سپس جایگزینی اتمی انجام می‌شود تا قطع
+    برنامه در میانه نوشتن فایل قبلی را خراب نکند.
+    """
+
+    def __init__(self, path, delay=1.0):
+        self.path = path
+        self.delay = delay
+        self.dirty = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.writer = threading.Thread(target=self._run, name="settings-writer", daemon=True)
+        self.data = self.load()
+        self.writer.start()
+
+    def load(self):
+        """خواندن تنظیمات؛ فایل خراب کنار گذاشته می‌شود تا دوباره بازنویسی نشود"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                return data
+            raise ValueError("settings root is not an object")
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"خطا در خواندن تنظیمات ({self.path}): {e}")
+            try:
+                os.replace(self.path, self.path + ".corrupt")
+            except OSError:
+                pass
+            return {}
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def update(self, values):
+        """اعمال تغییرات در حافظه؛ نوشتن روی دیسک بعداً در پس‌زمینه انجام می‌شود"""
+        with self.condition:
+            if all(self.data.get(k) == v for k, v in values.items()):
+                return
+            self.data.update(values)
+            self.dirty = True
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.dirty and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                # تغییرات بعدی در بازه تأخیر با همین نوشتن ادغام می‌شوند
+                self.condition.wait(self.delay)
+                if self.closed:
+                    return
+                snapshot = dict(self.data)
+                self.dirty = False
+            self._write(snapshot)
+
+    def _write(self, data):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            if hasattr(os, 'O_DIRECTORY'):
+                # ماندگاری خود عمل جایگزینی (لینوکس/مک)
+                fd = os.open(os.path.dirname(self.path) or ".", os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+        except OSError as e:
+            print(f"خطا در ذخیره تنظیمات: {e}")
+
+    def close(self):
+        """توقف ترد نویسنده و نوشتن تغییرات باقی‌مانده (هنگام بستن برنامه)"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+            pending = dict(self.data) if self.dirty else None
+            self.dirty = False
+        self.writer.join(timeout=5)
+        if pending is not None:
+            self._write(pending)
@@ -0,0 +1,66 @@
+# single_instance.py - ارسال فایل‌های اجرای دوم برنامه به نمونه در حال اجرا
+#
+# این ماژول فقط از کتابخانه استاندارد استفاده می‌کند تا اجرای دوم بدون وارد
+# کردن Qt، pygame و mutagen در چند ده میلی‌ثانیه تمام شود. سمت سرور
+# (QLocalServer) در music_player است و به همین نام گوش می‌دهد.
+import os
+
+ENQUEUE_FLAG = "--enqueue"
+# هر فیلد با NUL تمام می‌شود (در مسیر فایل نمی‌آید) و NUL اضافه پایان پیام است؛
+# json لازم نیست چون وارد کردن آن خودش چند میلی‌ثانیه طول می‌کشد
+_SEP = b"\0"
+END = _SEP * 2
+
+
+def server_name():
+    """نام سوکت محلی برای کاربر فعلی (named pipe در ویندوز، فایل سوکت در یونیکس)"""
+    if os.name == "nt":
+        return "SimpleMusicPlayer-" + (os.environ.get("USERNAME") or "user")
+    folder = os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("TMPDIR") or "/tmp"
+    return os.path.join(folder, f"simplemusicplayer-{os.getuid()}.sock")
+
+
+def encode_message(paths, enqueue=False):
+    fields = ["enqueue" if enqueue else "play"] + list(paths)
+    return b"".join(os.fsencode(field) + _SEP for field in fields) + _SEP
+
+
+def decode_message(data):
+    """(paths, enqueue) از پیام کامل (تا END)، یا None برای پیام نامعتبر"""
+    fields = data.split(END, 1)[0].split(_SEP)
+    mode = fields[0]
+    if mode not in (b"play", b"enqueue"):
+        return None
+    return [os.fsdecode(field) for field in fields[1:] if field], mode == b"enqueue"
+
+
+def parse_args(args):
+    """(paths, enqueue) از آرگومان‌های خط فرمان، یا None اگر گزینه دیگری باشد"""
+    enqueue = ENQUEUE_FLAG in args
+    paths = [arg for arg in args if arg != ENQUEUE_FLAG]
+    if any(arg.startswith("--") for arg in paths):
+        # --index، --trace و ... اجرای مستقل هستند
+        return None
+    return [os.path.abspath(p) for p in paths], enqueue
+
+
+def forward(args, timeout=0.5):
+    """ارسال آرگومان‌ها به نمونه در حال اجرا؛ True یعنی این اجرا باید خارج شود"""
+    parsed = parse_args(args)
+    if parsed is None:
+        return False
+    data = encode_message(*parsed)
+    try:
+        if os.name == "nt":
+            with open("\\\\.\\pipe\\" + server_name(), "wb", buffering=0) as pipe:
+                pipe.write(data)
+        else:
+            import socket
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout)
+                sock.connect(server_name())
+                sock.sendall(data)
+    except OSError:
+        # نمونه‌ای در حال اجرا نیست (یا فایل سوکت از اجرای قبلی مانده است)
+        return False
+    return True
@@ -0,0 +1,179 @@
+# staging.py - کپی محلی آهنگ‌های روی درایو شبکه (کش LRU با سقف حجم)
+import os
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
+
+STAGING_CHUNK = 1024 * 1024
+
+# نوع فایل‌سیستم‌های شبکه در /proc/mounts
+_REMOTE_FS = frozenset(("cifs", "smb3", "smbfs", "nfs", "nfs4", "afs", "9p", "ceph",
+                        "fuse.sshfs", "fuse.rclone", "davfs", "fuse.davfs2"))
+
+_mounts = None
+
+
+def _linux_mounts():
+    """[(mount_point, fstype)] به ترتیب طول نزولی (طولانی‌ترین پیشوند اول)"""
+    global _mounts
+    if _mounts is None:
+        mounts = []
+        try:
+            with open("/proc/self/mounts", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) >= 3:
+                        # فاصله در مسیر mount به صورت \040 نوشته می‌شود
+                        mounts.append((fields[1].replace("\\040", " "), fields[2]))
+        except OSError:
+            pass
+        mounts.sort(key=lambda m: len(m[0]), reverse=True)
+        _mounts = mounts
+    return _mounts
+
+
+def is_remote_path(path):
+    """آیا فایل روی درایو شبکه است (SMB/NFS/...)؛ در صورت شک False"""
+    if os.name == "nt":
+        if path.startswith(("\\\\", "//")):
+            return True
+        drive = os.path.splitdrive(path)[0]
+        if not drive:
+            return False
+        import ctypes
+        DRIVE_REMOTE = 4
+        return ctypes.windll.kernel32.GetDriveTypeW(drive + "\\") == DRIVE_REMOTE
+    if sys.platform.startswith("linux"):
+        for mount_point, fstype in _linux_mounts():
+            if path == mount_point or path.startswith(mount_point.rstrip("/") + "/"):
+                return fstype in _REMOTE_FS
+    return False
+
+
+class StagingCache:
+    """کپی محلی فایل‌ها با کلید مسیر، حجم و زمان تغییر؛ حذف LRU با سقف max_bytes
+
+    ترتیب LRU با زمان تغییر فایل‌های محلی بین اجراها حفظ می‌شود. فایل‌های
+    pin شده (آهنگ فعلی و صف شده) حذف نمی‌شوند. open_source برای خواندن از
+    مبدأ است و در آزمایش با یک پوشه کند جایگزین می‌شود.
+    """
+
+    def __init__(self, folder, max_bytes, open_source=open):
+        self.folder = str(folder)
+        self.max_bytes = max_bytes
+        self.open_source = open_source
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.pinned = set()
+        self._lock = threading.Lock()
+        os.makedirs(self.folder, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        files = []
+        for entry in os.scandir(self.folder):
+            try:
+                if entry.name.endswith(".tmp"):
+                    # کپی نیمه‌کاره اجرای قبلی
+                    os.remove(entry.path)
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, entry.name, st.st_size))
+        for _, name, size in sorted(files):
+            self.entries[name] = size
+            self.total_bytes += size
+
+    def _name(self, file_path, st):
+        identity = f"{file_path}|{st.st_size}|{st.st_mtime}"
+        digest = hashlib.sha1(identity.encode("utf-8", "surrogatepass")).hexdigest()
+        return digest + os.path.splitext(file_path)[1].lower()
+
+    def get(self, file_path):
+        """مسیر کپی محلی کامل یا None"""
+        try:
+            name = self._name(file_path, os.stat(file_path))
+        except OSError:
+            return None
+        with self._lock:
+            if name not in self.entries:
+                return None
+            self.entries.move_to_end(name)
+        local_path = os.path.join(self.folder, name)
+        try:
+            os.utime(local_path)
+        except OSError:
+            with self._lock:
+                self.total_bytes -= self.entries.pop(name, 0)
+            return None
+        return local_path
+
+    def pin(self, paths):
+        """کپی‌های این مسیرهای اصلی تا pin بعدی حذف نمی‌شوند"""
+        names = set()
+        for file_path in paths:
+            try:
+                names.add(self._name(file_path, os.stat(file_path)))
+            except OSError:
+                pass
+        with self._lock:
+            self.pinned = names
+
+    def stage(self, file_path, cancelled=None):
+        """کپی فایل به پوشه محلی (اگر قبلاً کپی نشده)؛ مسیر محلی یا None"""
+        local_path = self.get(file_path)
+        if local_path is not None:
+            return local_path
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        if st.st_size > self.max_bytes:
+            return None
+        name = self._name(file_path, st)
+        local_path = os.path.join(self.folder, name)
+        tmp_path = f"{local_path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            self._evict(st.st_size)
+        try:
+            with self.open_source(file_path, "rb") as src, open(tmp_path, "wb") as dst:
+                while True:
+                    if cancelled is not None and cancelled.is_set():
+                        raise InterruptedError
+                    chunk = src.read(STAGING_CHUNK)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+            os.replace(tmp_path, local_path)
+        except (OSError, InterruptedError) as e:
+            if not isinstance(e, InterruptedError):
+                print(f"خطا در کپی محلی آهنگ: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return None
+        with self._lock:
+            if name not in self.entries:
+                self.entries[name] = st.st_size
+                self.total_bytes += st.st_size
+            self._evict(0)
+        return local_path
+
+    def _evict(self, incoming):
+        """حذف قدیمی‌ترین کپی‌ها تا incoming بایت جا باز شود (با قفل صدا زده می‌شود)"""
+        for name in list(self.entries):
+            if self.total_bytes + incoming <= self.max_bytes:
+                break
+            if name in self.pinned:
+                continue
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # در ویندوز فایل باز در حال پخش قابل حذف نیست
+                continue
+            self.total_bytes -= self.entries.pop(name)
@@ -0,0 +1,90 @@
+# test_library.py - ایندکس کتابخانه و اسکن بدون Qt
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from library import LibraryIndex, LibraryScan
+
+
+def probe_text(file_path):
+    """probe ساختگی: محتوای فایل عنوان آهنگ است"""
+    with open(file_path, encoding="utf-8") as f:
+        return f.read(), "artist", "", 1.0, False, None
+
+
+def record(path, title="t"):
+    return (path, 1, 1.0, title, "a", "", 10.0, 0, 0.0, None)
+
+
+def test_folder_range_includes_non_bmp_names(tmp_path):
+    index = LibraryIndex(tmp_path / "library.db")
+    lib = os.path.join(str(tmp_path), "lib")
+    inside = [os.path.join(lib, "🎵 song.mp3"), os.path.join(lib, "𠜎", "a.mp3"),
+              os.path.join(lib, "￿.mp3")]
+    outside = [os.path.join(str(tmp_path), "lib2", "b.mp3"), lib + "🎵.mp3"]
+    index.store([record(p) for p in inside + outside])
+    index.store_dirs({lib: 1.0, os.path.join(lib, "𠜎"): 2.0, lib + "🎵": 3.0})
+    try:
+        assert sorted(index.load_folder(lib)) == sorted(inside)
+        gains, missing = index.load_gains(lib)
+        assert sorted(missing) == sorted(inside)
+        assert sorted(index.load_fingerprints(lib)) == sorted(inside)
+        assert index.load_dirs(lib) == {lib: 1.0, os.path.join(lib, "𠜎"): 2.0}
+        index.remove_dirs([lib])
+        assert index.load_dirs(lib) == {}
+        assert index.load_dirs(lib + "🎵") == {lib + "🎵": 3.0}
+    finally:
+        index.close()
+
+
+def test_warm_scan_sees_files_changed_in_place(tmp_path):
+    lib = tmp_path / "lib"
+    (lib / "album").mkdir(parents=True)
+    song = lib / "album" / "song.mp3"
+    song.write_text("old title", encoding="utf-8")
+    (lib / "album" / "gone.mp3").write_text("gone", encoding="utf-8")
+    index = LibraryIndex(tmp_path / "library.db")
+    try:
+        first = LibraryScan(str(lib), index, probe_text)
+        first.run()
+        assert first.parsed == 2
+        
+        # ویرایش تگ در جا: حجم و زمان فایل عوض می‌شود ولی زمان پوشه نه
+        folder_mtime = os.stat(lib / "album").st_mtime
+        song.write_text("new title!", encoding="utf-8")
+        os.utime(song, (folder_mtime + 10, folder_mtime + 10))
+        os.utime(lib / "album", (folder_mtime, folder_mtime))
+        
+        warm = LibraryScan(str(lib), index, probe_text)
+        warm.run()
+        assert warm.parsed == 1
+        titles = {os.path.basename(t[0]): t[1] for t in warm.tracks}
+        assert titles == {"gone.mp3": "gone", "song.mp3": "new title!"}
+        assert index.load_folder(str(lib))[str(song)][2] == "new title!"
+    finally:
+        index.close()
+
+
+def test_warm_scan_applies_changed_excludes(tmp_path):
+    lib = tmp_path / "lib"
+    (lib / "a").mkdir(parents=True)
+    (lib / "b").mkdir()
+    for name in ("a/x1.mp3", "a/live_x2.mp3", "b/y.mp3"):
+        (lib / name).write_text(name, encoding="utf-8")
+    index = LibraryIndex(tmp_path / "library.db")
+    
+    def scan(exclude):
+        library_scan = LibraryScan(str(lib), index, probe_text, exclude=exclude)
+        library_scan.run()
+        paths = sorted(os.path.relpath(t[0], lib).replace(os.sep, "/") for t in library_scan.tracks)
+        return paths, library_scan.parsed
+    
+    try:
+        assert scan([]) == (["a/live_x2.mp3", "a/x1.mp3", "b/y.mp3"], 3)
+        assert scan(["live_*"]) == (["a/x1.mp3", "b/y.mp3"], 0)
+        assert scan(["*/b/*"]) == (["a/live_x2.mp3", "a/x1.mp3"], 1)
+        assert sorted(index.load_folder(str(lib / "b"))) == []
+        assert scan([]) == (["a/live_x2.mp3", "a/x1.mp3", "b/y.mp3"], 1)
+    finally:
+        index.close()
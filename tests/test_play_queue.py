@@ -0,0 +1,133 @@
+# test_play_queue.py - ترتیب shuffle بدون تکرار در یک دور
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from play_queue import PlayQueue, REPEAT_ALL, REPEAT_OFF
+
+
+def paths(count):
+    return [f"/music/{i:03d}.mp3" for i in range(count)]
+
+
+def play(queue, count):
+    return [queue.next(auto=True) for _ in range(count)]
+
+
+def test_peek_does_not_skip_end_of_cycle():
+    items = paths(10)
+    queue = PlayQueue(items, shuffle=True, repeat=REPEAT_ALL, seed=1)
+    played = play(queue, 8)
+    queue.peek(count=5)
+    played += play(queue, 2)
+    assert sorted(played) == items
+
+
+def test_set_items_with_same_items_keeps_cycle():
+    items = paths(10)
+    queue = PlayQueue(items, shuffle=True, repeat=REPEAT_OFF, seed=2)
+    played = play(queue, 5)
+    queue.set_items(items, items.index(played[-1]))
+    played += play(queue, 5)
+    assert sorted(played) == items
+    assert queue.next(auto=True) is None
+
+
+def test_set_items_with_new_order_keeps_played_tracks():
+    items = paths(10)
+    queue = PlayQueue(items, shuffle=True, repeat=REPEAT_OFF, seed=3)
+    played = play(queue, 5)
+    view = list(reversed(items))
+    queue.set_items(view, view.index(played[-1]))
+    played += play(queue, 5)
+    assert sorted(played) == items
+    assert queue.next(auto=True) is None
+
+
+def test_jump_after_peek_keeps_peeked_tracks():
+    items = paths(10)
+    queue = PlayQueue(items, shuffle=True, repeat=REPEAT_OFF, seed=4)
+    played = play(queue, 3)
+    peeked = queue.peek(count=3)
+    chosen = next(p for p in items if p not in played and p not in peeked)
+    queue.jump(items.index(chosen))
+    played.append(chosen)
+    while True:
+        path = queue.next(auto=True)
+        if path is None:
+            break
+        played.append(path)
+    assert sorted(played) == items
+
+
+def test_jump_after_previous_keeps_played_tracks():
+    items = paths(10)
+    queue = PlayQueue(items, shuffle=True, repeat=REPEAT_OFF, seed=4)
+    played = play(queue, 5)
+    queue.previous()
+    chosen = next(p for p in items if p not in played)
+    queue.jump(items.index(chosen))
+    played.append(chosen)
+    while True:
+        path = queue.next(auto=True)
+        if path is None:
+            break
+        played.append(path)
+    assert sorted(played) == items
+
+
+def test_peek_right_after_shuffle_keeps_peeked_tracks():
+    items = paths(10)
+    queue = PlayQueue(items, repeat=REPEAT_OFF, seed=6)
+    queue.set_shuffle(True, position=7)
+    queue.peek(count=3)
+    played = [items[7]]
+    while True:
+        path = queue.next(auto=True)
+        if path is None:
+            break
+        played.append(path)
+    assert sorted(played) == items
+
+
+def test_filtered_view_keeps_hidden_played_tracks():
+    items = paths(10)
+    queue = PlayQueue(items, shuffle=True, repeat=REPEAT_OFF, seed=7)
+    played = play(queue, 5)
+    current = played[-1]
+    queue.set_items([current], 0)
+    queue.peek(count=2)
+    queue.set_items(items, items.index(current))
+    played += play(queue, 5)
+    assert sorted(played) == items
+    assert queue.next(auto=True) is None
+
+
+def test_track_played_outside_view_is_not_repeated():
+    items = paths(10)
+    queue = PlayQueue(items, shuffle=True, repeat=REPEAT_OFF, seed=8)
+    played = play(queue, 3)
+    preloaded = queue.peek()[0]
+    view = [path for path in items if path != preloaded]
+    queue.set_items(view, view.index(played[-1]))
+    queue.jump(-1, preloaded)
+    played.append(preloaded)
+    queue.set_items(items, items.index(preloaded))
+    while True:
+        path = queue.next(auto=True)
+        if path is None:
+            break
+        played.append(path)
+    assert sorted(played) == items
+
+
+def test_restore_replays_same_order():
+    items = paths(20)
+    queue = PlayQueue(items, shuffle=True, repeat=REPEAT_ALL, seed=5)
+    played = play(queue, 4)
+    queue.jump(items.index(next(p for p in items if p not in played)))
+    play(queue, 3)
+    restored = PlayQueue(items)
+    restored.restore(queue.state())
+    assert restored.peek(count=13) == queue.peek(count=13)
@@ -0,0 +1,131 @@
+# tracing.py - اندازه‌گیری زمان مراحل حساس برنامه و خروجی Chrome trace
+import os
+import json
+import time
+import threading
+from collections import deque
+from functools import wraps
+
+# نتیجه هر span: (name, start_ns, duration_ns, thread_id, path)
+MAX_SPANS = 20000
+SLOW_SPAN_MS = 30
+
+
+class Tracer:
+    """ثبت spanها در حافظه؛ وقتی غیرفعال است فقط یک بررسی پرچم هزینه دارد
+
+    deque.append در CPython اتمی است، پس تردهای اسکنر و کاور بدون قفل
+    ثبت می‌کنند. spanهای کند و توقف‌های event loop جداگانه برای نمایش در
+    overlay نگه داشته می‌شوند.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.origin = time.perf_counter_ns()
+        self.spans = deque(maxlen=MAX_SPANS)
+        self.slow = deque(maxlen=50)
+        self.stalls = deque(maxlen=MAX_SPANS)
+        self.threads = {}
+        self.slow_ms = SLOW_SPAN_MS
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def clear(self):
+        self.spans.clear()
+        self.slow.clear()
+        self.stalls.clear()
+
+    def record(self, name, start_ns, end_ns, path=None):
+        thread = threading.current_thread()
+        if thread.ident not in self.threads:
+            self.threads[thread.ident] = thread.name
+        duration = end_ns - start_ns
+        span = (name, start_ns, duration, thread.ident, path)
+        self.spans.append(span)
+        if duration >= self.slow_ms * 1_000_000:
+            self.slow.append(span)
+
+    def record_stall(self, start_ns, end_ns):
+        """event loop بین start و end به رویدادها پاسخ نداده است"""
+        stall = ("event-loop stall", start_ns, end_ns - start_ns,
+                 threading.main_thread().ident, None)
+        self.stalls.append(stall)
+        self.slow.append(stall)
+
+    def span(self, name, path=None):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, path)
+
+    def export_chrome_trace(self, path):
+        """ذخیره در قالب Trace Event (قابل باز کردن در chrome://tracing یا Perfetto)"""
+        pid = os.getpid()
+        events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                   "args": {"name": name}} for tid, name in list(self.threads.items())]
+        for category, spans in (("span", list(self.spans)), ("stall", list(self.stalls))):
+            for name, start, duration, tid, file_path in spans:
+                event = {"name": name, "cat": category, "ph": "X", "pid": pid, "tid": tid,
+                         "ts": (start - self.origin) / 1000, "dur": duration / 1000}
+                if file_path:
+                    event["args"] = {"path": file_path}
+                events.append(event)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return len(events)
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "path", "start")
+
+    def __init__(self, tracer, name, path):
+        self.tracer = tracer
+        self.name = name
+        self.path = path
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, time.perf_counter_ns(), self.path)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+tracer = Tracer()
+
+
+def traced(name, path=None):
+    """دکوراتور span؛ path تابعی است که از همان آرگومان‌ها مسیر فایل را می‌سازد"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                file_path = None
+                if path is not None:
+                    try:
+                        file_path = path(*args, **kwargs)
+                    except Exception:
+                        pass
+                tracer.record(name, start, time.perf_counter_ns(), file_path)
+        return wrapper
+    return decorator
@@ -0,0 +1,144 @@
+# track_store.py - داده‌های آهنگ‌های لیست پخش به صورت ستونی و فشرده
+import os
+import bisect
+import math
+from array import array
+
+from library import track_sort_key
+
+_SEPARATORS = tuple(sep for sep in (os.sep, os.altsep, "/") if sep)
+
+
+class TrackStore:
+    """همه آهنگ‌های لیست پخش به ترتیب پوشه؛ هر ستون یک آرایه یا لیست
+
+    مسیر هر آهنگ به صورت (شماره پوشه، نام فایل) نگه داشته می‌شود و رشته پوشه
+    بین همه آهنگ‌های آن مشترک است. هنرمند و آلبوم یک بار در strings ذخیره و
+    با شماره ارجاع داده می‌شوند و عنوانی که همان نام فایل است ذخیره نمی‌شود.
+    store[row] مسیر کامل را می‌سازد، پس store مثل لیست مسیرها به ترتیب پوشه
+    (و برای bisect) قابل استفاده است. شناسه هر آهنگ همان شناسه SearchIndex و
+    BrowseIndex است و با جابجایی ردیف‌ها تغییر نمی‌کند.
+    """
+
+    def __init__(self):
+        self.folders = []           # شماره → پوشه همراه با جداکننده انتهایی
+        self.folder_ids = {}
+        self.strings = [""]         # شماره → هنرمند یا آلبوم
+        self.string_ids = {"": 0}
+        self.folder = array("I")
+        self.names = []
+        self.titles = []            # None یعنی عنوان همان نام فایل است
+        self.artist = array("I")
+        self.album = array("I")
+        self.durations = array("f")
+        self.gains = array("f")     # NaN یعنی گین نامعلوم
+        self.ids = array("i")       # ردیف → شناسه
+        self.next_id = 0
+        self.id_rows = None         # شناسه → ردیف؛ پس از درج یا حذف دوباره ساخته می‌شود
+
+    def clear(self):
+        self.__init__()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, row):
+        return self.folders[self.folder[row]] + self.names[row]
+
+    def __iter__(self):
+        folders = self.folders
+        for folder, name in zip(self.folder, self.names):
+            yield folders[folder] + name
+
+    # --- خواندن ---
+
+    def title(self, row):
+        title = self.titles[row]
+        return self.names[row] if title is None else title
+
+    def artist_name(self, row):
+        return self.strings[self.artist[row]]
+
+    def album_name(self, row):
+        return self.strings[self.album[row]]
+
+    def gain(self, row):
+        gain = self.gains[row]
+        return None if math.isnan(gain) else gain
+
+    def find(self, file_path):
+        """جستجوی دودویی مسیر؛ (row, found)"""
+        row = bisect.bisect_left(self, track_sort_key(file_path), key=track_sort_key)
+        return row, row < len(self) and self[row] == file_path
+
+    def get(self, file_path, default=None):
+        """شناسه آهنگ یک مسیر (مثل dict مسیر → شناسه)"""
+        row, found = self.find(file_path)
+        return self.ids[row] if found else default
+
+    def row_of_id(self):
+        """آرایه شناسه → ردیف (‎-1 برای آهنگ حذف شده)"""
+        if self.id_rows is None or len(self.id_rows) < self.next_id:
+            rows = array("i", [-1]) * self.next_id
+            for row, track_id in enumerate(self.ids):
+                rows[track_id] = row
+            self.id_rows = rows
+        return self.id_rows
+
+    # --- تغییر ---
+
+    def _share(self, table, index, text):
+        number = index.get(text)
+        if number is None:
+            number = index[text] = len(table)
+            table.append(text)
+        return number
+
+    def _split(self, file_path):
+        cut = max(file_path.rfind(sep) for sep in _SEPARATORS) + 1
+        return (self._share(self.folders, self.folder_ids, file_path[:cut]),
+                file_path[cut:])
+
+    def append(self, file_path, title, artist, album, duration):
+        """افزودن به انتهای لیست؛ شناسه آهنگ جدید را برمی‌گرداند"""
+        return self.insert(len(self), file_path, title, artist, album, duration)
+
+    def insert(self, row, file_path, title, artist, album, duration):
+        folder, name = self._split(file_path)
+        track_id = self.next_id
+        self.next_id += 1
+        at_end = row == len(self)
+        self.folder.insert(row, folder)
+        self.names.insert(row, name)
+        self.titles.insert(row, None if title == name else title)
+        self.artist.insert(row, self._share(self.strings, self.string_ids, artist or ""))
+        self.album.insert(row, self._share(self.strings, self.string_ids, album or ""))
+        self.durations.insert(row, duration)
+        self.gains.insert(row, math.nan)
+        self.ids.insert(row, track_id)
+        if at_end and self.id_rows is not None and len(self.id_rows) == track_id:
+            # افزودن به انتها ردیف بقیه را جابجا نمی‌کند
+            self.id_rows.append(row)
+        else:
+            self.id_rows = None
+        return track_id
+
+    def update(self, row, title, artist, album, duration):
+        name = self.names[row]
+        self.titles[row] = None if title == name else title
+        self.artist[row] = self._share(self.strings, self.string_ids, artist or "")
+        self.album[row] = self._share(self.strings, self.string_ids, album or "")
+        self.durations[row] = duration
+        return self.ids[row]
+
+    def set_gain(self, row, gain):
+        self.gains[row] = math.nan if gain is None else gain
+
+    def delete(self, row):
+        """حذف یک ردیف؛ شناسه آن را برمی‌گرداند (شناسه دوباره استفاده نمی‌شود)"""
+        track_id = self.ids[row]
+        for column in (self.folder, self.names, self.titles, self.artist, self.album,
+                       self.durations, self.gains, self.ids):
+            del column[row]
+        self.id_rows = None
+        return track_id
@@ -0,0 +1,274 @@
+# waveform.py - خواندن بلوکی صدا و پیک‌های شکل موج نوار پیشرفت (NumPy و کش روی دیسک)
+import os
+import wave
+import hashlib
+import importlib.util
+from collections import namedtuple
+
+# numpy اختیاری است و مثل pygame فقط هنگام اولین تحلیل بارگذاری می‌شود؛
+# بدون آن نوار پیشرفت ساده نمایش داده می‌شود
+HAVE_NUMPY = importlib.util.find_spec("numpy") is not None
+
+WAVEFORM_BINS = 1000
+
+# سقف فریم‌های هر بلوک دیکد (حدود ۶ ثانیه)؛ حافظه ثابت حتی برای فایل‌های طولانی
+BLOCK_FRAMES = 1 << 18
+
+_CACHE_MAGIC = b"WF1\0"
+
+# pygame فقط کل فایل را یکجا دیکد می‌کند؛ فرمت‌های غیر MP3 بزرگ‌تر از این
+# (حدود ۱۲ دقیقه استریو 44.1 kHz) تحلیل نمی‌شوند تا حافظه چند کارگر منفجر نشود
+MAX_DECODE_BYTES = 128 * 1024 * 1024
+
+# MP3 در تکه‌هایی به این مدت (از ابتدای یک فریم) جداگانه دیکد می‌شود
+MP3_CHUNK_SECONDS = 30
+
+
+# منبع صدای خام: blocks(n) بایت‌های حداکثر n فریم درهم را پشت سر هم می‌دهد؛
+# file_channels کانال‌های خود فایل است (mixer صدای مونو را استریو می‌کند)
+AudioSource = namedtuple("AudioSource",
+                         "frames rate channels dtype offset scale blocks file_channels")
+
+
+def _wav_source(file_path):
+    """WAV با خواندن بلوکی از خود فایل"""
+    import numpy as np
+    w = wave.open(file_path, "rb")
+    width = w.getsampwidth()
+    if width not in (1, 2, 4):
+        w.close()
+        return None
+    dtype, offset = {1: (np.uint8, 128), 2: (np.int16, 0), 4: (np.int32, 0)}[width]
+    scale = float(1 << (8 * width - 1))
+
+    def blocks(block_frames):
+        with w:
+            while True:
+                data = w.readframes(block_frames)
+                if not data:
+                    return
+                yield data
+    return AudioSource(w.getnframes(), w.getframerate(), w.getnchannels(), dtype, offset,
+                       scale, blocks, w.getnchannels())
+
+
+def _mp3_frame_start(data, start, reference=None):
+    """اندیس اولین سرآیند معتبر فریم MP3 از start به بعد، یا -1
+
+    reference (بایت دوم و بیت‌های نرخ نمونه فریم اول) سرآیندهای جعلی داخل
+    داده صدا را رد می‌کند؛ این‌ها در طول یک فایل ثابت هستند.
+    """
+    i = data.find(b"\xff", start)
+    while 0 <= i < len(data) - 3:
+        b1, b2 = data[i + 1], data[i + 2]
+        if (b1 & 0xE0 == 0xE0 and b1 & 0x18 != 0x08 and b1 & 0x06
+                and b2 & 0xF0 not in (0x00, 0xF0) and b2 & 0x0C != 0x0C
+                and (reference is None or reference == (b1, b2 & 0x0C))):
+            return i
+        i = data.find(b"\xff", i + 1)
+    return -1
+
+
+def _id3_size(data):
+    """حجم تگ ID3v2 ابتدای فایل (سرآیند فریم‌ها پس از آن شروع می‌شود)"""
+    if len(data) < 10 or not data.startswith(b"ID3"):
+        return 0
+    size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | data[9] & 0x7F
+    return size + (20 if data[5] & 0x10 else 10)
+
+
+def _mp3_chunks(file_path, chunk_bytes):
+    """بایت‌های فایل MP3 در تکه‌هایی که هر کدام با یک فریم کامل شروع می‌شوند"""
+    with open(file_path, "rb") as f:
+        pending = f.read(max(chunk_bytes, 64 * 1024))
+        skip = _id3_size(pending)
+        while len(pending) < skip + 4:
+            more = f.read(chunk_bytes)
+            if not more:
+                break
+            pending += more
+        first = _mp3_frame_start(pending, skip)
+        reference = (pending[first + 1], pending[first + 2] & 0x0C) if first >= 0 else None
+        while pending:
+            more = f.read(chunk_bytes)
+            if not more:
+                yield pending
+                return
+            cut = _mp3_frame_start(more, 0, reference)
+            if cut < 0:
+                pending += more
+                continue
+            yield pending + more[:cut]
+            pending = more[cut:]
+
+
+def _mixer_source(file_path):
+    """دیکد سایر فرمت‌ها با pygame به فرمت mixer؛ پردازش باز هم بلوکی است
+
+    MP3 تکه به تکه دیکد می‌شود و حافظه آن به طول آهنگ بستگی ندارد؛ بقیه
+    فرمت‌ها یکجا و فقط تا MAX_DECODE_BYTES.
+    """
+    import io
+    import numpy as np
+    import pygame
+    import mutagen
+    init = pygame.mixer.get_init()
+    if not init:
+        return None
+    rate, size, channels = init
+    dtype = {8: np.uint8, -8: np.int8, 16: np.uint16, -16: np.int16, 32: np.float32}.get(size)
+    if dtype is None:
+        return None
+    itemsize = np.dtype(dtype).itemsize
+    frame_bytes = itemsize * channels
+    offset = 1 << (8 * itemsize - 1) if size in (8, 16) else 0
+    scale = 1.0 if size == 32 else float(1 << (8 * itemsize - 1))
+    info = getattr(mutagen.File(file_path), "info", None)
+    length = getattr(info, "length", 0) or 0
+    bitrate = getattr(info, "bitrate", 0) or 0
+
+    if file_path.lower().endswith(".mp3") and length and bitrate:
+        chunk_bytes = bitrate // 8 * MP3_CHUNK_SECONDS
+
+        def decoded():
+            for chunk in _mp3_chunks(file_path, chunk_bytes):
+                try:
+                    yield pygame.mixer.Sound(file=io.BytesIO(chunk)).get_raw()
+                except pygame.error:
+                    # تکه‌ای که دیکد نشد (فریم خراب) رد می‌شود
+                    continue
+        frames = int(length * rate)
+    else:
+        if length * rate * frame_bytes > MAX_DECODE_BYTES:
+            return None
+        raw = pygame.mixer.Sound(file_path).get_raw()
+
+        def decoded():
+            yield raw
+        frames = len(raw) // frame_bytes
+
+    def blocks(block_frames):
+        # بلوک‌ها دقیقاً block_frames فریم هستند، حتی بین مرز تکه‌های MP3
+        step = block_frames * frame_bytes
+        pending = b""
+        for raw in decoded():
+            view = memoryview(raw)
+            start = 0
+            if pending:
+                start = step - len(pending)
+                pending += view[:start]
+                if len(pending) < step:
+                    continue
+                yield pending
+                pending = b""
+            end = start + (len(view) - start) // step * step
+            for block in range(start, end, step):
+                yield view[block:block + step]
+            pending = bytes(view[end:])
+        if pending:
+            yield pending
+    file_channels = getattr(info, "channels", 0) or channels
+    return AudioSource(frames, rate, channels, dtype, offset, scale, blocks, file_channels)
+
+
+def open_audio(file_path):
+    """AudioSource یک فایل یا None (فرمت پشتیبانی نشده یا mixer راه‌اندازی نشده)"""
+    try:
+        source = _wav_source(file_path) if file_path.lower().endswith(".wav") else None
+        return source or _mixer_source(file_path)
+    except Exception:
+        return None
+
+
+def compute_peaks(file_path, bins=WAVEFORM_BINS, cancelled=None):
+    """(mins, maxs) به صورت آرایه int8 با حداکثر bins ستون، یا None
+
+    صدا بلوک به بلوک خوانده و هر بلوک با min/max برداری روی ستون‌های
+    هم‌اندازه خلاصه می‌شود. cancelled (threading.Event) تحلیل را متوقف می‌کند.
+    """
+    import numpy as np
+    source = open_audio(file_path)
+    if source is None:
+        return None
+    frames, _, channels, dtype, offset, scale, blocks, _ = source
+    if frames <= 0:
+        return None
+
+    bin_frames = -(-frames // bins)
+    # min/max یک ستون به ترتیب کانال‌ها وابسته نیست: نمونه‌های درهم هر ستون
+    # یک ردیف ماتریس هستند و با یک reduce برداری خلاصه می‌شوند
+    bin_samples = bin_frames * channels
+    mins, maxs = [], []
+    pending = None
+    for data in blocks(bin_frames * max(1, BLOCK_FRAMES // bin_frames)):
+        if cancelled is not None and cancelled.is_set():
+            return None
+        samples = np.frombuffer(data, dtype=dtype)
+        if pending is not None:
+            # بلوک کوتاه‌تر از انتظار با بقیه ستون ادغام می‌شود
+            samples = np.concatenate((pending, samples))
+            pending = None
+        usable = len(samples) - len(samples) % bin_samples
+        if usable < len(samples):
+            pending = samples[usable:]
+        if usable:
+            matrix = samples[:usable].reshape(-1, bin_samples)
+            mins.append(matrix.min(axis=1))
+            maxs.append(matrix.max(axis=1))
+    if pending is not None and len(pending):
+        mins.append(pending.min(keepdims=True))
+        maxs.append(pending.max(keepdims=True))
+    if not mins:
+        return None
+
+    def normalize(values):
+        values = (np.concatenate(values).astype(np.float32) - offset) / scale
+        return np.clip(np.round(values * 127), -127, 127).astype(np.int8)
+    return normalize(mins), normalize(maxs)
+
+
+class WaveformCache:
+    """پیک‌ها روی دیسک (حدود ۲ کیلوبایت برای هر آهنگ) با کلید مسیر، حجم و زمان تغییر"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(self.folder, exist_ok=True)
+
+    def disk_path(self, file_path):
+        try:
+            st = os.stat(file_path)
+            identity = f"{file_path}|{st.st_size}|{st.st_mtime}"
+        except OSError:
+            return None
+        digest = hashlib.sha1(identity.encode("utf-8", "surrogatepass")).hexdigest()
+        return os.path.join(self.folder, f"{digest}.wf")
+
+    def load(self, file_path):
+        """پیک‌های ذخیره شده یا None"""
+        path = self.disk_path(file_path)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if not data.startswith(_CACHE_MAGIC) or len(data) % 2:
+            return None
+        import numpy as np
+        values = np.frombuffer(data, dtype=np.int8, offset=len(_CACHE_MAGIC))
+        half = len(values) // 2
+        return values[:half], values[half:]
+
+    def store(self, file_path, peaks):
+        path = self.disk_path(file_path)
+        if path is None:
+            return
+        mins, maxs = peaks
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(_CACHE_MAGIC + mins.tobytes() + maxs.tobytes())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"خطا در ذخیره شکل موج: {e}")